@@ -0,0 +1,90 @@
+# benchmarks/bench_aggregates.py
+"""
+Compare, pour des questions analytiques (« coût moyen d'hébergement à X »),
+la voie des agrégats (store en colonnes de db_manager) à la recherche RAG
+(search_db, k documents) : latence médiane et erreur relative de la moyenne
+transmise à Gemini par rapport à la valeur exacte calculée par pandas.
+
+Usage : python -m benchmarks.bench_aggregates --rows 5000 [--embeddings labse]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fake_clients import use_hashing_embeddings
+from benchmarks.synthetic_data import write_travel_csv
+from rag_core import db_manager
+from rag_core.embeddings import get_embedding_service
+
+ACCOMMODATION_COST = re.compile(r"Hébergement: [^(]+\(Coût: ([\d.]+)\)")
+MEAN_PATTERN = re.compile(r"Coût d'hébergement : moyenne ([\d ]+)")
+
+
+def run(n_rows: int, k: int, seed: int = 42) -> list[dict]:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rag-aggregates-") as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs(db_manager.DATA_PATH, exist_ok=True)
+            write_travel_csv(db_manager.CSV_FILE_PATH, n_rows, seed=seed)
+            vectorstore, _ = db_manager.ingest_csv_streaming(db_manager.CSV_FILE_PATH, incremental=False, resume=False)
+            cleaned = db_manager.clean_and_combine_data(pd.read_csv(db_manager.CSV_FILE_PATH))
+            truth = pd.to_numeric(cleaned["Accommodation cost"], errors="coerce").groupby(cleaned["Destination"]).mean()
+            service = get_embedding_service()
+            db_manager.get_travel_stats()
+
+            paths = {"agregats": ([], []), "recherche": ([], [])}
+            for destination, expected in truth.items():
+                query = f"Quel est le coût moyen d'hébergement à {destination.split(',')[0]} ?"
+
+                latencies, errors = paths["agregats"]
+                start = time.perf_counter()
+                answer = db_manager.answer_aggregate_question(query)
+                latencies.append(time.perf_counter() - start)
+                mean = MEAN_PATTERN.search(answer.facts) if answer else None
+                errors.append(abs(float(mean.group(1).replace(" ", "")) - expected) / expected if mean else 1.0)
+
+                latencies, errors = paths["recherche"]
+                vector = service.encode([query])[0]
+                start = time.perf_counter()
+                result = db_manager.search_db(query, vectorstore, k=k, query_vector=vector)
+                latencies.append(time.perf_counter() - start)
+                # Moyenne que Gemini pourrait au mieux déduire des voyages du contexte (résumés
+                # d'origine : le contexte compact est un tableau)
+                costs = [float(c) for doc, _ in result.hits for c in ACCOMMODATION_COST.findall(doc.page_content)]
+                errors.append(abs(np.mean(costs) - expected) / expected if costs else 1.0)
+        finally:
+            os.chdir(cwd)
+
+    return [
+        {"path": path, "queries": len(latencies), "latency_us": statistics.median(latencies) * 1e6,
+         "mean_rel_error": float(np.mean(errors))}
+        for path, (latencies, errors) in paths.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--embeddings", choices=["hashing", "labse"], default="hashing")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.embeddings == "hashing":
+        use_hashing_embeddings(get_embedding_service())
+
+    print(f"{'voie':<10} {'requêtes':>9} {'latence (µs)':>13} {'erreur relative':>16}")
+    for r in run(args.rows, args.k, args.seed):
+        print(f"{r['path']:<10} {r['queries']:>9} {r['latency_us']:>13.0f} {r['mean_rel_error']:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
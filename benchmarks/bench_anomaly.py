@@ -0,0 +1,108 @@
+# benchmarks/bench_anomaly.py
+"""
+Compare les scorers d'anomalies (Isolation Forest, plus proches voisins, centroïdes) :
+temps d'entraînement, latence par requête et précision / rappel de la détection
+hors-sujet sur des requêtes du domaine et hors domaine, avec les embeddings d'un dataset synthétique. Les seuils knn /
+centroïdes sont calibrés sur CALIBRATION_QUERIES, distinctes des requêtes évaluées.
+
+Usage : python -m benchmarks.bench_anomaly --docs 5000 [--embeddings labse]
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.fake_clients import use_hashing_embeddings
+from benchmarks.synthetic_data import generate_travel_dataframe
+from rag_core import db_manager
+from rag_core.anomaly_detector import CALIBRATION_QUERIES
+from rag_core.anomaly_scorers import make_scorer
+from rag_core.embeddings import get_embedding_service
+
+IN_DOMAIN_QUERIES = [
+    "Je cherche un hôtel à Paris pour une semaine",
+    "Quel est le coût moyen d'un voyage à Bali ?",
+    "Combien coûte un vol pour Tokyo ?",
+    "Voyage en train vers Londres",
+    "Quels voyages en resort à Phuket ?",
+    "I want to book a flight to New York",
+    "What is the cheapest accommodation in Rome?",
+    "Trip to Sydney with a hostel",
+    "Séjour de 10 jours à Marrakech dans un riad",
+    "Prix du transport en bus pour Berlin",
+    "Airbnb à Amsterdam pour deux semaines",
+    "Voyageur américain à Cancun",
+]
+OUT_OF_DOMAIN_QUERIES = [
+    "Donne-moi la recette du couscous",
+    "Qui a gagné le match de football hier ?",
+    "Comment installer Python sur Windows ?",
+    "Explique la théorie de la relativité",
+    "Quel est le meilleur smartphone en 2024 ?",
+    "How do I fix a memory leak in C++?",
+    "Write a poem about the ocean",
+    "What is the capital gains tax rate?",
+    "Comment soigner un rhume rapidement ?",
+    "Traduire 'bonjour' en allemand",
+    "Résous l'équation x² + 3x - 4 = 0",
+    "Quel temps fera-t-il demain ?",
+]
+SCORERS = ["isolation_forest", "knn", "centroids"]
+
+
+def run(n_docs: int, seed: int = 42) -> list[dict]:
+    service = get_embedding_service()
+    documents = db_manager.build_documents(
+        db_manager.clean_and_combine_data(generate_travel_dataframe(n_docs, seed=seed))
+    )
+    embeddings = service.encode_documents([doc.page_content for doc in documents])
+    queries = service.encode(IN_DOMAIN_QUERIES + OUT_OF_DOMAIN_QUERIES)
+    calibration_vectors = service.encode(list(CALIBRATION_QUERIES))
+    # Vérité terrain : True = hors sujet
+    truth = np.array([False] * len(IN_DOMAIN_QUERIES) + [True] * len(OUT_OF_DOMAIN_QUERIES))
+
+    results = []
+    for name in SCORERS:
+        start = time.perf_counter()
+        scorer = make_scorer(name).fit(embeddings, calibration_vectors)
+        fit_s = time.perf_counter() - start
+
+        latencies = []
+        for vector in queries:
+            start = time.perf_counter()
+            scorer.score(vector.reshape(1, -1))
+            latencies.append(time.perf_counter() - start)
+
+        predicted = scorer.is_anomaly(queries)
+        true_positives = int(np.sum(predicted & truth))
+        results.append({
+            "scorer": name,
+            "fit_s": fit_s,
+            "query_latency_ms": statistics.median(latencies) * 1000,
+            "threshold": float(scorer.threshold),
+            "precision": true_positives / max(int(predicted.sum()), 1),
+            "recall": true_positives / int(truth.sum()),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--embeddings", choices=["hashing", "labse"], default="hashing")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.embeddings == "hashing":
+        use_hashing_embeddings(get_embedding_service())
+
+    print(f"{'scorer':<18} {'fit (s)':>8} {'requête (ms)':>13} {'seuil':>7} {'précision':>10} {'rappel':>7}")
+    for r in run(args.docs, args.seed):
+        print(f"{r['scorer']:<18} {r['fit_s']:>8.2f} {r['query_latency_ms']:>13.3f} {r['threshold']:>7.3f} "
+              f"{r['precision']:>10.2f} {r['recall']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_context.py
+"""
+Compare le prompt de génération d'origine (instruction longue, k résumés complets)
+au prompt compact (instruction courte, tableau dédupliqué sous budget de tokens) :
+tokens du prompt (estimés, et facturés par Gemini avec --gemini), voyages transmis
+au modèle et latence de génération, sur les mêmes requêtes.
+
+Usage : python -m benchmarks.bench_context --rows 5000 [--embeddings labse] [--gemini]
+  sans --gemini, la génération est simulée (FakeGeminiClient, latence nulle).
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_clients import FakeGeminiClient, use_hashing_embeddings
+from benchmarks.run_suite import build_queries
+from benchmarks.synthetic_data import write_travel_csv
+from rag_core import context_packer, db_manager, llm_utils
+from rag_core.embeddings import get_embedding_service
+
+# Variantes comparées : (nom, COMPACT_CONTEXT_ENABLED)
+MODES = [("complet", False), ("compact", True)]
+
+
+def run(n_rows: int, n_queries: int, k: int, client, seed: int = 42) -> list[dict]:
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rag-context-") as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs(db_manager.DATA_PATH, exist_ok=True)
+            write_travel_csv(db_manager.CSV_FILE_PATH, n_rows, seed=seed)
+            vectorstore, _ = db_manager.ingest_csv_streaming(db_manager.CSV_FILE_PATH, incremental=False, resume=False)
+            service = get_embedding_service()
+            queries = build_queries(n_queries, seed)
+            vectors = {q: service.encode([q])[0] for q in queries}
+
+            for mode, compact in MODES:
+                context_packer.COMPACT_CONTEXT_ENABLED = compact
+                estimated, billed, hits, latencies = [], [], [], []
+                for query in queries:
+                    result = db_manager.search_db(query, vectorstore, k=context_packer.candidate_count(k),
+                                                  query_vector=vectors[query])
+                    if not result:
+                        continue
+                    usage = llm_utils.UsageGeneration()
+                    start = time.perf_counter()
+                    llm_utils.generer_reponse_rag(client, query, result.context, usage=usage)
+                    latencies.append(time.perf_counter() - start)
+                    estimated.append(llm_utils.estimer_tokens_prompt(query, result.context))
+                    if usage.tokens_prompt:
+                        billed.append(usage.tokens_prompt)
+                    hits.append(len(result.hits))
+                results.append({
+                    "mode": mode, "queries": len(estimated),
+                    "prompt_estime": statistics.median(estimated) if estimated else 0,
+                    "prompt_facture": statistics.median(billed) if billed else None,
+                    "hits": statistics.mean(hits) if hits else 0.0,
+                    "latency_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+                })
+        finally:
+            os.chdir(cwd)
+            context_packer.COMPACT_CONTEXT_ENABLED = True
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--embeddings", choices=["hashing", "labse"], default="hashing")
+    parser.add_argument("--gemini", action="store_true", help="Génération par Gemini (GEMINI_API_KEY)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.embeddings == "hashing":
+        use_hashing_embeddings(get_embedding_service())
+    client = llm_utils.get_gemini_client() if args.gemini else FakeGeminiClient(latency_s=0.0)
+
+    print(f"{'prompt':<9} {'requêtes':>9} {'tokens estimés':>15} {'tokens facturés':>16} "
+          f"{'voyages':>8} {'latence (ms)':>13}")
+    for r in run(args.rows, args.queries, args.k, client, args.seed):
+        billed = f"{r['prompt_facture']:.0f}" if r["prompt_facture"] is not None else "-"
+        print(f"{r['mode']:<9} {r['queries']:>9} {r['prompt_estime']:>15.0f} {billed:>16} "
+              f"{r['hits']:>8.1f} {r['latency_ms']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
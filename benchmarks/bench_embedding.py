@@ -0,0 +1,74 @@
+# benchmarks/bench_embedding.py
+"""
+Débit d'encodage LaBSE (documents/s) pour la construction de l'index, selon le
+nombre de processus d'encodage, la taille de lot et le nombre de threads torch.
+Avec --with-chroma, mesure aussi le pipeline complet encodage + écriture Chroma
+(producteur/consommateur) dans une base temporaire.
+
+Usage : python -m benchmarks.bench_embedding --docs 5000 --workers 1 2 4 8
+"""
+
+import argparse
+import tempfile
+import time
+
+from langchain_community.vectorstores import Chroma
+
+from benchmarks.synthetic_data import generate_travel_dataframe
+from rag_core import db_manager
+from rag_core.embeddings import EMBEDDING_BATCH_SIZE, EmbeddingService
+
+
+def _documents(n_docs: int, seed: int):
+    df = db_manager.clean_and_combine_data(generate_travel_dataframe(n_docs, seed=seed, missing_rate=0.0))
+    return db_manager.build_documents(df)
+
+
+def run(n_docs: int, workers: list[int], batch_size: int, num_threads: int,
+        with_chroma: bool, seed: int = 42) -> list[dict]:
+    documents = _documents(n_docs, seed)
+    texts = [doc.page_content for doc in documents]
+    ids = db_manager.assign_document_ids(documents)
+
+    results = []
+    for n_workers in workers:
+        service = EmbeddingService(batch_size=batch_size, workers=n_workers, num_threads=num_threads)
+        # Chargement du modèle et démarrage du pool hors mesure
+        service.load()
+        service.encode_documents(texts[:n_workers * batch_size])
+
+        start = time.perf_counter()
+        service.encode_documents(texts)
+        encode_s = time.perf_counter() - start
+        result = {"workers": n_workers, "encode_docs_per_s": len(texts) / encode_s}
+
+        if with_chroma:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                collection = Chroma(persist_directory=tmp_dir, embedding_function=service)._collection
+                start = time.perf_counter()
+                db_manager._upsert_documents(collection, ids, documents, embeddings=service)
+                result["index_docs_per_s"] = len(texts) / (time.perf_counter() - start)
+
+        service.close_pool()
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=0, help="threads torch par processus (0 = défaut)")
+    parser.add_argument("--with-chroma", action="store_true")
+    args = parser.parse_args()
+
+    for r in run(args.docs, args.workers, args.batch_size, args.threads, args.with_chroma):
+        line = f"workers={r['workers']:<3} encodage: {r['encode_docs_per_s']:>9,.1f} docs/s"
+        if "index_docs_per_s" in r:
+            line += f"   encodage+Chroma: {r['index_docs_per_s']:>9,.1f} docs/s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
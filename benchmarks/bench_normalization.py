@@ -0,0 +1,82 @@
+# benchmarks/bench_normalization.py
+"""
+Compare la latence de l'étape de normalisation : pré-traitement local
+(nl_processor) vs appel Gemini, sur un échantillon de requêtes multilingues.
+Affiche le taux de contournement et la latence moyenne attendue avec / sans
+le chemin local. Les mesures Gemini ne sont faites que si GEMINI_API_KEY est défini.
+
+Usage : python -m benchmarks.bench_normalization [--gemini]
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from rag_core import llm_utils, nl_processor
+
+SAMPLE_QUERIES = [
+    "Je cherche un hôtel à Paris pour une semaine.",
+    "Quel est le coût moyen d'un voyage à Bali ?",
+    "Combien coûte un vol pour Tokyo en juillet ?",
+    "Bonjour, je voudrais partir à Londres en train svp",
+    "Quels voyages en resort sont disponibles à Phuket ?",
+    "I want to book a flight to Paris.",
+    "What is the average cost of a hotel in Tokyo?",
+    "How much does a trip to New York cost for 7 days?",
+    "Which trips to Sydney are the cheapest?",
+    "Je cherche des infos sur la visa pour Dubaï.",
+    "نحب نسافر لتونس في الصيف.",
+    "ما هو سعر الفندق في باريس؟",
+    "nheb nsafer l bali chnowa a9al soum",
+    "9adech ya9ra voyage l paris?",
+    "HOTEL PAS CHER PARIS!!!!",
+    "hôtel Paris",
+    "trip bali ???",
+    "cooool voyage a dubai plzzzz",
+]
+
+
+def _mesurer(fn, requetes):
+    latences, resultats = [], []
+    for requete in requetes:
+        debut = time.perf_counter()
+        resultats.append(fn(requete))
+        latences.append(time.perf_counter() - debut)
+    return latences, resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gemini", action="store_true", help="mesure aussi la normalisation Gemini")
+    args = parser.parse_args()
+
+    latences_locales, resultats = _mesurer(nl_processor.normalisation_locale, SAMPLE_QUERIES)
+    contournees = [r is not None for r in resultats]
+    taux = sum(contournees) / len(SAMPLE_QUERIES)
+
+    print(f"{'requête':<55} {'local (µs)':>11}  chemin")
+    for requete, latence, resultat in zip(SAMPLE_QUERIES, latences_locales, resultats):
+        chemin = "local" if resultat is not None else f"Gemini ({nl_processor.detect_language(requete).raison})"
+        print(f"{requete[:55]:<55} {latence * 1e6:>11.1f}  {chemin}")
+    print(f"\nTaux de contournement : {taux:.0%}  |  latence locale médiane : "
+          f"{statistics.median(latences_locales) * 1e6:.1f} µs")
+
+    load_dotenv()
+    if args.gemini and "GEMINI_API_KEY" in os.environ:
+        client = llm_utils.get_gemini_client()
+        latences_gemini, _ = _mesurer(lambda q: llm_utils.traiter_requete_multilingue(client, q), SAMPLE_QUERIES)
+        moyenne_gemini = statistics.mean(latences_gemini)
+        # Latence attendue avec contournement : Gemini uniquement pour les requêtes non contournées
+        moyenne_mixte = statistics.mean(
+            local + (0 if contourne else gemini)
+            for local, gemini, contourne in zip(latences_locales, latences_gemini, contournees)
+        )
+        print(f"Gemini seul : {moyenne_gemini * 1000:.0f} ms/requête  |  "
+              f"avec chemin local : {moyenne_mixte * 1000:.0f} ms/requête")
+
+
+if __name__ == "__main__":
+    main()
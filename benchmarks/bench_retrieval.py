@@ -0,0 +1,102 @@
+# benchmarks/bench_retrieval.py
+"""
+Compare les voies de recherche de db_manager.search_db sur un dataset synthétique :
+dense seule (LaBSE), hybride (fusion RRF dense + BM25) et hybride avec routeur
+des références exactes. Mesure la latence médiane et le taux de réussite à k
+(document attendu parmi les k résultats) pour des requêtes par Trip ID, par nom
+de voyageur, et pour des requêtes descriptives (latence seulement).
+
+Usage : python -m benchmarks.bench_retrieval --rows 5000 [--embeddings labse]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fake_clients import use_hashing_embeddings
+from benchmarks.run_suite import build_queries
+from benchmarks.synthetic_data import write_travel_csv
+from rag_core import db_manager
+from rag_core.embeddings import get_embedding_service
+from rag_core.lexical_index import TRAVELER_NAME_PATTERN
+
+# Voies comparées : (nom, HYBRID_SEARCH_ENABLED, LEXICAL_ROUTER_ENABLED)
+MODES = [("dense", False, False), ("hybride", True, False), ("hybride+routeur", True, True)]
+
+
+def entity_queries(vectorstore, n_queries: int, seed: int = 42) -> list[tuple[str, str, str]]:
+    """[(type, requête, fragment attendu dans un résultat)] tirées des documents indexés."""
+    documents = vectorstore._collection.get(include=['documents'])["documents"]
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in rng.choice(len(documents), size=min(n_queries, len(documents)), replace=False):
+        content = documents[i]
+        trip_id = content.split(".")[0].replace("Voyage ID ", "")
+        queries.append(("trip_id", f"Donne-moi les détails du voyage ID {trip_id}", f"Voyage ID {trip_id}."))
+        name = TRAVELER_NAME_PATTERN.search(content)
+        if name:
+            queries.append(("nom", f"Quels voyages a faits {name.group(1)} ?", f"Voyageur: {name.group(1)} ("))
+    return queries
+
+
+def run(n_rows: int, n_queries: int, k: int, seed: int = 42) -> list[dict]:
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rag-retrieval-") as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs(db_manager.DATA_PATH, exist_ok=True)
+            write_travel_csv(db_manager.CSV_FILE_PATH, n_rows, seed=seed)
+            vectorstore, _ = db_manager.ingest_csv_streaming(db_manager.CSV_FILE_PATH, incremental=False, resume=False)
+            service = get_embedding_service()
+            entities = entity_queries(vectorstore, n_queries, seed)
+            generic = build_queries(n_queries, seed)
+            vectors = {q: service.encode([q])[0] for _, q, _ in entities}
+            vectors.update({q: service.encode([q])[0] for q in generic})
+
+            for mode, hybrid, router in MODES:
+                db_manager.HYBRID_SEARCH_ENABLED, db_manager.LEXICAL_ROUTER_ENABLED = hybrid, router
+                db_manager.search_db("préchauffage", vectorstore, k=k, query_vector=vectors[generic[0]])
+                for kind in ("trip_id", "nom", "descriptive"):
+                    cases = ([(q, None) for q in generic] if kind == "descriptive"
+                             else [(q, expected) for t, q, expected in entities if t == kind])
+                    latencies, hits = [], 0
+                    for query, expected in cases:
+                        start = time.perf_counter()
+                        result = db_manager.search_db(query, vectorstore, k=k, query_vector=vectors[query])
+                        latencies.append(time.perf_counter() - start)
+                        hits += expected is not None and any(expected in doc.page_content for doc, _ in result.hits)
+                    results.append({
+                        "mode": mode, "type": kind, "queries": len(cases),
+                        "latency_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+                        "hit_rate": hits / len(cases) if kind != "descriptive" and cases else None,
+                    })
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--embeddings", choices=["hashing", "labse"], default="hashing")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.embeddings == "hashing":
+        use_hashing_embeddings(get_embedding_service())
+
+    print(f"{'voie':<17} {'requêtes':<12} {'n':>5} {'latence (ms)':>13} {'réussite@' + str(args.k):>11}")
+    for r in run(args.rows, args.queries, args.k, args.seed):
+        hit_rate = f"{r['hit_rate']:.2f}" if r["hit_rate"] is not None else "-"
+        print(f"{r['mode']:<17} {r['type']:<12} {r['queries']:>5} {r['latency_ms']:>13.2f} {hit_rate:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_snapshot.py
+"""
+Compare les formats de l'instantané compact des vecteurs (float16, int8) au
+float32 d'origine : taille sur disque / en mémoire, temps d'écriture depuis
+Chroma, latence d'une recherche exacte et précision (erreur de quantification,
+cosinus minimal, rappel@k par rapport à la recherche exacte en float32).
+
+Usage : python -m benchmarks.bench_snapshot --docs 20000 [--embeddings labse]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+from benchmarks.fake_clients import use_hashing_embeddings
+from benchmarks.synthetic_data import generate_travel_dataframe
+from rag_core import db_manager
+from rag_core.embedding_snapshot import EmbeddingSnapshot, check_accuracy, write_snapshot
+from rag_core.embeddings import get_embedding_service
+
+DTYPES = ["float16", "int8"]
+
+
+def run(n_docs: int, k: int = 10, n_queries: int = 100, seed: int = 42) -> list[dict]:
+    service = get_embedding_service()
+    documents = db_manager.build_documents(
+        db_manager.clean_and_combine_data(generate_travel_dataframe(n_docs, seed=seed))
+    )
+    embeddings = service.encode_documents([doc.page_content for doc in documents]).astype(np.float32)
+    ids = [str(uuid.uuid4()) for _ in documents]
+
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"bench-{uuid.uuid4().hex[:8]}")
+    for start in range(0, len(ids), db_manager.INDEX_BATCH_SIZE):
+        stop = start + db_manager.INDEX_BATCH_SIZE
+        collection.add(ids=ids[start:stop], embeddings=embeddings[start:stop])
+    # Référence dans l'ordre de lecture de la collection (celui de l'instantané)
+    order = {doc_id: row for row, doc_id in enumerate(ids)}
+    reference = None
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="rag-snapshot-") as workdir:
+        for dtype in DTYPES:
+            directory = f"{workdir}/{dtype}"
+            start = time.perf_counter()
+            write_snapshot(collection, directory, dtype=dtype)
+            write_s = time.perf_counter() - start
+
+            snapshot = EmbeddingSnapshot.open(directory)
+            if reference is None:
+                reference = embeddings[[order[str(doc_id)] for doc_id in snapshot.ids]]
+            accuracy = check_accuracy(snapshot, reference, n_queries=n_queries, k=k, seed=seed)
+
+            latencies = []
+            for row in range(0, len(reference), max(1, len(reference) // 50)):
+                start = time.perf_counter()
+                snapshot.search(reference[row], k)
+                latencies.append(time.perf_counter() - start)
+            results.append({**accuracy, "write_s": write_s,
+                            "search_ms": statistics.median(latencies) * 1000})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--embeddings", choices=["hashing", "labse"], default="hashing")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.embeddings == "hashing":
+        use_hashing_embeddings(get_embedding_service())
+
+    recall_key = f"recall_at_{args.k}"
+    print(f"{'format':<8} {'Mo':>8} {'Mo float32':>11} {'écriture (s)':>13} {'recherche (ms)':>15} "
+          f"{'erreur max':>11} {'cos min':>8} {'rappel@' + str(args.k):>10}")
+    for r in run(args.docs, args.k, args.queries, args.seed):
+        print(f"{r['dtype']:<8} {r['bytes'] / 2**20:>8.1f} {r['float32_bytes'] / 2**20:>11.1f} "
+              f"{r['write_s']:>13.2f} {r['search_ms']:>15.2f} {r['max_abs_error']:>11.2e} "
+              f"{r['min_cosine']:>8.5f} {r[recall_key]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/fake_clients.py
+"""
+Doublures locales pour les benchmarks hors ligne :
+- FakeGeminiClient : remplace genai.Client (models / aio.models, génération
+  simple et en flux) avec une latence configurable et un usage_metadata ;
+- HashingEmbeddingModel : remplace le SentenceTransformer LaBSE par un
+  encodage déterministe (n-grammes de caractères hachés, 768 dimensions),
+  sans téléchargement de modèle.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Dimension des vecteurs LaBSE
+EMBEDDING_DIMENSION = 768
+
+
+class FakeResponse:
+    """Réponse au format google-genai : .text et .usage_metadata."""
+
+    def __init__(self, text: str, prompt_tokens: int, candidates_tokens: int):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=candidates_tokens
+        )
+
+
+class FakeGeminiClient:
+    """
+    Client Gemini factice. Chaque appel attend `latency_s` (± `jitter` en proportion) ;
+    en flux, le premier fragment arrive après `first_token_s` et la réponse est
+    découpée en `chunks` fragments. Les prompts de normalisation renvoient la requête
+    brute, les prompts RAG une réponse construite à partir du premier document du contexte.
+    Les tokens du prompt comptent l'instruction système, comme l'API réelle.
+    """
+
+    def __init__(self, latency_s: float = 0.3, first_token_s: float = 0.1, chunks: int = 8,
+                 jitter: float = 0.0, seed: int = 42):
+        self.latency_s = latency_s
+        self.first_token_s = first_token_s
+        self.chunks = max(1, chunks)
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+    def _delay(self, base: float) -> float:
+        with self._lock:
+            self.calls += 1
+            factor = 1.0 + self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 1.0
+        return max(0.0, base * factor)
+
+    @staticmethod
+    def _answer(contents: str, config=None) -> FakeResponse:
+        raw = re.search(r'REQUÊTE BRUTE : "(.*)"', contents, re.DOTALL)
+        if raw:
+            text = raw.group(1).strip()
+        else:
+            # Premier document : format complet « [1] ... » ou première ligne du tableau compact
+            first_doc = re.search(r"\[1\] (.*)|^(\d[^|\n]*\|.*)$", contents, re.MULTILINE)
+            text = ("Voici une proposition adaptée à votre demande : "
+                    + (first_doc.group(1) or first_doc.group(2) if first_doc else "aucune information disponible."))
+        prompt = (getattr(config, "system_instruction", None) or "") + contents
+        return FakeResponse(text, prompt_tokens=len(prompt) // 4, candidates_tokens=len(text) // 4)
+
+    def _split(self, response: FakeResponse) -> list[FakeResponse]:
+        words = response.text.split(" ")
+        size = max(1, -(-len(words) // self.chunks))
+        parts = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        chunks = [FakeResponse(part, 0, 0) for part in parts]
+        # Le dernier fragment porte le décompte de tokens, comme l'API réelle
+        chunks[-1].usage_metadata = response.usage_metadata
+        return chunks
+
+
+class _FakeModels:
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    def generate_content(self, model: str, contents: str, config=None) -> FakeResponse:
+        time.sleep(self._client._delay(self._client.latency_s))
+        return self._client._answer(contents, config)
+
+    def generate_content_stream(self, model: str, contents: str, config=None):
+        chunks = self._client._split(self._client._answer(contents, config))
+        time.sleep(self._client._delay(self._client.first_token_s))
+        remaining = max(0.0, self._client.latency_s - self._client.first_token_s) / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(remaining)
+            yield chunk
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    async def generate_content(self, model: str, contents: str, config=None) -> FakeResponse:
+        await asyncio.sleep(self._client._delay(self._client.latency_s))
+        return self._client._answer(contents, config)
+
+    async def generate_content_stream(self, model: str, contents: str, config=None):
+        client = self._client
+        chunks = client._split(client._answer(contents, config))
+
+        async def stream():
+            await asyncio.sleep(client._delay(client.first_token_s))
+            remaining = max(0.0, client.latency_s - client.first_token_s) / len(chunks)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(remaining)
+                yield chunk
+
+        return stream()
+
+
+class HashingEmbeddingModel:
+    """Remplaçant déterministe de SentenceTransformer.encode (même interface, vecteurs normalisés)."""
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION):
+        self.vectorizer = HashingVectorizer(
+            n_features=dimension, analyzer="char_wb", ngram_range=(3, 4),
+            alternate_sign=False, norm="l2"
+        )
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = True,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        return self.vectorizer.transform(list(sentences)).toarray().astype(np.float32)
+
+
+def use_hashing_embeddings(service) -> None:
+    """Branche HashingEmbeddingModel dans un EmbeddingService (sans charger LaBSE)."""
+    service._model = HashingEmbeddingModel()
+    service.workers = 1
@@ -0,0 +1,273 @@
+# benchmarks/run_suite.py
+"""
+Suite de benchmarks de bout en bout, reproductible et hors ligne.
+
+Dans un répertoire de travail temporaire : génère un dataset synthétique, puis
+mesure l'ingestion (lignes/s), le chargement de l'index, l'entraînement du
+détecteur, la latence p50 / p99 d'une requête et le débit avec plusieurs
+utilisateurs simultanés. Gemini est remplacé par FakeGeminiClient ; LaBSE par
+un encodage haché (--embeddings hashing, par défaut) ou le vrai modèle (labse).
+Les résultats sont enregistrés en JSON avec le commit git courant.
+
+Usage :
+  python -m benchmarks.run_suite --rows 5000 --queries 200 --users 1 4 16
+  python -m benchmarks.run_suite --compare benchmarks/results/A.json benchmarks/results/B.json
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_normalization import SAMPLE_QUERIES
+from benchmarks.fake_clients import FakeGeminiClient, use_hashing_embeddings
+from benchmarks.synthetic_data import ACCOMMODATIONS, DESTINATIONS, TRANSPORTS, write_travel_csv
+from rag_core import db_manager, resources
+from rag_core.anomaly_detector import ANOMALY_MODEL_DIR, AnomalyDetector
+from rag_core.embeddings import get_embedding_service
+from rag_core.gemini_pool import PooledGeminiClient
+from rag_core.pipeline import RAGPipeline
+from rag_core.query_cache import QueryCache
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+QUERY_TEMPLATES = [
+    "Je cherche un {acc} à {dest} en {trans}.",
+    "Quel est le coût moyen d'un voyage à {dest} ?",
+    "What is the price of a {acc} in {dest}?",
+    "I want to travel to {dest} by {trans}.",
+    "nheb nsafer l {dest} fi {acc}",
+]
+
+
+def build_queries(n_queries: int, seed: int = 42) -> list[str]:
+    """Requêtes de test reproductibles (modèles FR / EN / Derja + échantillon multilingue)."""
+    rng = np.random.default_rng(seed)
+    queries = list(SAMPLE_QUERIES)
+    while len(queries) < n_queries:
+        queries.append(rng.choice(QUERY_TEMPLATES).format(
+            acc=rng.choice(ACCOMMODATIONS).lower(),
+            dest=rng.choice(DESTINATIONS).split(",")[0],
+            trans=rng.choice(TRANSPORTS).lower(),
+        ))
+    return queries[:n_queries]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _uncached(shared: resources.SharedResources) -> resources.SharedResources:
+    """Ressources avec un cache de réponses inactif (chaque requête parcourt tout le pipeline)."""
+    return dataclasses.replace(shared, query_cache=QueryCache(max_entries=0))
+
+
+# --- Scénarios ---
+
+def bench_ingest(csv_path: str, n_rows: int) -> tuple[dict, object]:
+    start = time.perf_counter()
+    db, stats = db_manager.ingest_csv_streaming(csv_path, incremental=False, resume=False)
+    elapsed = time.perf_counter() - start
+    return {"rows": n_rows, "seconds": elapsed, "rows_per_s": n_rows / elapsed, "indexed": stats.get("added")}, db
+
+
+def bench_index_load() -> dict:
+    resources.invalidate_shared_resources()
+    start = time.perf_counter()
+    vectorstore = db_manager.load_existing_vector_store()
+    count = vectorstore._collection.count()
+    return {"seconds": time.perf_counter() - start, "vectors": count}
+
+
+def bench_detector(vectorstore) -> tuple[dict, AnomalyDetector]:
+    shutil.rmtree(ANOMALY_MODEL_DIR, ignore_errors=True)
+    start = time.perf_counter()
+    AnomalyDetector(vectorstore)
+    fit_s = time.perf_counter() - start
+
+    # Second chargement : artefact sauvegardé, sans ré-entraînement
+    start = time.perf_counter()
+    detector = AnomalyDetector(vectorstore)
+    return {"fit_seconds": fit_s, "artifact_load_seconds": time.perf_counter() - start,
+            "scorer": detector.scorer_name}, detector
+
+
+def bench_query_latency(shared: resources.SharedResources, client, queries: list[str]) -> dict:
+    shared = _uncached(shared)
+    totals, stages, statuts = [], {}, {}
+    for query in queries:
+        result = RAGPipeline(shared, client).run(query)
+        totals.append(result.durees.get("total", 0.0))
+        statuts[result.statut] = statuts.get(result.statut, 0) + 1
+        for stage, duration in result.durees.items():
+            stages.setdefault(stage, []).append(duration)
+    return {
+        "queries": len(queries),
+        "p50_s": _percentile(totals, 50),
+        "p99_s": _percentile(totals, 99),
+        "mean_s": statistics.fmean(totals) if totals else 0.0,
+        "stages_mean_s": {stage: statistics.fmean(values) for stage, values in sorted(stages.items())},
+        "statuts": statuts,
+    }
+
+
+def bench_concurrency(shared: resources.SharedResources, client, queries: list[str], users: int) -> dict:
+    shared = _uncached(shared)
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(users)
+        latencies = []
+
+        async def one(query: str):
+            async with semaphore:
+                result = await RAGPipeline(shared, client).arun(query)
+                latencies.append(result.durees.get("total", 0.0))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in queries))
+        return time.perf_counter() - start, latencies
+
+    elapsed, latencies = asyncio.run(run_all())
+    return {
+        "users": users,
+        "queries": len(queries),
+        "seconds": elapsed,
+        "queries_per_s": len(queries) / elapsed,
+        "p50_s": _percentile(latencies, 50),
+        "p99_s": _percentile(latencies, 99),
+    }
+
+
+# --- Exécution et comparaison ---
+
+def git_commit() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                                  cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run(args) -> dict:
+    # Client factice derrière le même pool que get_gemini_client (limiteur, nouveaux essais, coalescence)
+    client = PooledGeminiClient([FakeGeminiClient(
+        latency_s=args.gemini_latency, first_token_s=args.gemini_first_token,
+        jitter=args.gemini_jitter, seed=args.seed
+    )], rpm=args.gemini_rpm)
+    service = get_embedding_service()
+    if args.embeddings == "hashing":
+        use_hashing_embeddings(service)
+    else:
+        service.load()
+
+    queries = build_queries(args.queries, seed=args.seed)
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        # Les chemins de rag_core (data/, vectorstore/) sont relatifs au répertoire courant
+        os.chdir(workdir)
+        try:
+            os.makedirs(db_manager.DATA_PATH, exist_ok=True)
+            csv_path = write_travel_csv(db_manager.CSV_FILE_PATH, args.rows, seed=args.seed)
+
+            results["ingest"], vectorstore = bench_ingest(csv_path, args.rows)
+            results["index_load"] = bench_index_load()
+            results["detector"], _ = bench_detector(vectorstore)
+
+            shared = resources.get_shared_resources()
+            if shared.detector.refit_thread is not None:
+                shared.detector.refit_thread.join()
+            results["query_latency"] = bench_query_latency(shared, client, queries)
+            results["concurrency"] = [bench_concurrency(shared, client, queries, users) for users in args.users]
+        finally:
+            resources.invalidate_shared_resources()
+            os.chdir(cwd)
+
+    return {
+        **git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "results": results,
+    }
+
+
+def _flatten(value, prefix: str = "") -> dict:
+    if isinstance(value, dict):
+        return {k: v for key, item in value.items() for k, v in _flatten(item, f"{prefix}{key}.").items()}
+    if isinstance(value, list):
+        return {k: v for i, item in enumerate(value) for k, v in _flatten(item, f"{prefix}{i}.").items()}
+    return {prefix.rstrip("."): value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def compare(path_a: str, path_b: str):
+    """Affiche l'évolution des mesures numériques entre deux fichiers de résultats."""
+    with open(path_a, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(path_b, encoding="utf-8") as f:
+        b = json.load(f)
+    print(f"A = {str(a.get('commit'))[:8]}  B = {str(b.get('commit'))[:8]}")
+    flat_a, flat_b = _flatten(a["results"]), _flatten(b["results"])
+    for key in sorted(set(flat_a) & set(flat_b)):
+        va, vb = flat_a[key], flat_b[key]
+        delta = f"{(vb - va) / va:+.1%}" if va else "n/a"
+        print(f"{key:<45} {va:>12.4g} {vb:>12.4g} {delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--embeddings", choices=["hashing", "labse"], default="hashing")
+    parser.add_argument("--gemini-latency", type=float, default=0.3)
+    parser.add_argument("--gemini-first-token", type=float, default=0.1)
+    parser.add_argument("--gemini-jitter", type=float, default=0.2)
+    parser.add_argument("--gemini-rpm", type=float, default=0, help="Quota simulé (requêtes/min, 0 = illimité)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut : benchmarks/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("A.json", "B.json"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{(report['commit'] or 'nogit')[:8]}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    r = report["results"]
+    print(f"Ingestion        : {r['ingest']['rows_per_s']:.0f} lignes/s ({r['ingest']['seconds']:.1f} s)")
+    print(f"Chargement index : {r['index_load']['seconds'] * 1000:.0f} ms ({r['index_load']['vectors']} vecteurs)")
+    print(f"Détecteur        : entraînement {r['detector']['fit_seconds']:.2f} s, "
+          f"chargement {r['detector']['artifact_load_seconds'] * 1000:.0f} ms")
+    print(f"Requête          : p50 {r['query_latency']['p50_s'] * 1000:.0f} ms, "
+          f"p99 {r['query_latency']['p99_s'] * 1000:.0f} ms")
+    for c in r["concurrency"]:
+        print(f"{c['users']:>3} utilisateurs : {c['queries_per_s']:.1f} requêtes/s "
+              f"(p50 {c['p50_s'] * 1000:.0f} ms, p99 {c['p99_s'] * 1000:.0f} ms)")
+    print(f"Résultats : {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/synthetic_data.py
+
+import numpy as np
+import pandas as pd
+
+# Colonnes du "Travel details dataset.csv" attendues par db_manager.clean_and_combine_data
+CSV_COLUMNS = [
+    "Trip ID", "Destination", "Start date", "End date", "Duration (days)",
+    "Traveler name", "Traveler age", "Traveler gender", "Traveler nationality",
+    "Accommodation type", "Accommodation cost", "Transportation type", "Transportation cost",
+]
+
+DESTINATIONS = [
+    "London, UK", "Phuket, Thailand", "Bali, Indonesia", "New York, USA", "Tokyo, Japan",
+    "Paris, France", "Sydney, Australia", "Rio de Janeiro, Brazil", "Amsterdam, Netherlands",
+    "Dubai, United Arab Emirates", "Cancun, Mexico", "Barcelona, Spain", "Honolulu, Hawaii",
+    "Berlin, Germany", "Marrakech, Morocco", "Edinburgh, Scotland", "Rome, Italy",
+    "Cape Town, South Africa", "Seoul, South Korea", "Tunis, Tunisia",
+]
+ACCOMMODATIONS = ["Hotel", "Resort", "Villa", "Airbnb", "Hostel", "Riad", "Guesthouse", "Vacation rental"]
+TRANSPORTS = ["Flight", "Train", "Plane", "Bus", "Car rental", "Ferry", "Subway"]
+NATIONALITIES = ["American", "Canadian", "Korean", "British", "Vietnamese", "Australian",
+                 "Brazilian", "Dutch", "Emirati", "Mexican", "Spanish", "Chinese", "German",
+                 "Moroccan", "Scottish", "Indian", "Italian", "South African", "Tunisian", "French"]
+FIRST_NAMES = ["John", "Jane", "David", "Sarah", "Kim", "Michael", "Emily", "Lucas", "Laura",
+               "Mohamed", "Amira", "Youssef", "Chen", "Olivia", "Nina", "Carlos", "Ana", "Sami"]
+LAST_NAMES = ["Smith", "Johnson", "Lee", "Brown", "Nguyen", "Garcia", "Martin", "Ben Ali",
+              "Trabelsi", "Rossi", "Schmidt", "Wang", "Dubois", "Silva", "Haddad"]
+
+
+def _format_costs(rng: np.random.Generator, amounts: np.ndarray) -> np.ndarray:
+    """Reproduit les formats hétérogènes du dataset réel : '1200', '$1,200', '1200 USD', vide."""
+    plain = amounts.astype(str)
+    dollars = np.array([f"${a:,}" for a in amounts.tolist()], dtype=object)
+    usd = np.char.add(plain, " USD").astype(object)
+    style = rng.integers(0, 10, size=len(amounts))
+    costs = np.where(style < 5, plain, np.where(style < 8, dollars, usd)).astype(object)
+    costs[style == 9] = None
+    return costs
+
+
+def generate_travel_dataframe(n_rows: int, seed: int = 42, missing_rate: float = 0.02) -> pd.DataFrame:
+    """Génère un DataFrame synthétique au schéma du dataset de voyage (avec valeurs manquantes)."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, n_rows), unit="D")
+    duration = rng.integers(2, 21, n_rows)
+    end = start + pd.to_timedelta(duration, unit="D")
+
+    df = pd.DataFrame({
+        "Trip ID": np.arange(1, n_rows + 1),
+        "Destination": rng.choice(DESTINATIONS, n_rows),
+        "Start date": start.strftime("%-m/%-d/%Y"),
+        "End date": end.strftime("%-m/%-d/%Y"),
+        "Duration (days)": duration.astype(float),
+        "Traveler name": np.char.add(np.char.add(rng.choice(FIRST_NAMES, n_rows), " "),
+                                     rng.choice(LAST_NAMES, n_rows)),
+        "Traveler age": rng.integers(18, 75, n_rows).astype(float),
+        "Traveler gender": rng.choice(["Male", "Female"], n_rows),
+        "Traveler nationality": rng.choice(NATIONALITIES, n_rows),
+        "Accommodation type": rng.choice(ACCOMMODATIONS, n_rows),
+        "Accommodation cost": _format_costs(rng, rng.integers(100, 9000, n_rows)),
+        "Transportation type": rng.choice(TRANSPORTS, n_rows),
+        "Transportation cost": _format_costs(rng, rng.integers(20, 3000, n_rows)),
+    }, columns=CSV_COLUMNS)
+
+    # Valeurs manquantes éparses (comme dans le CSV réel)
+    for col in ["Destination", "Duration (days)", "Traveler age", "Traveler name", "Accommodation type"]:
+        mask = rng.random(n_rows) < missing_rate
+        df[col] = df[col].astype(object)
+        df.loc[mask, col] = None
+    return df
+
+
+def write_travel_csv(path: str, n_rows: int, seed: int = 42) -> str:
+    """Écrit un CSV synthétique au chemin donné et retourne ce chemin."""
+    generate_travel_dataframe(n_rows, seed=seed).to_csv(path, index=False)
+    return path
@@ -1,115 +1,262 @@
-import streamlit as st
+# chatbot.py (Fonction main)
+
 import os
+from typing import TYPE_CHECKING
+
+import streamlit as st
 from dotenv import load_dotenv
 # Charger les variables d'environnement
 load_dotenv()
-# Importation des utilitaires LLM (Gemini) depuis le module
-from rag_core import llm_utils 
-from rag_core.anomaly_detector import AnomalyDetector
-# --- Les futures imports pour le RAG (db_manager) viendront ici ---
-from rag_core import db_manager 
-
-# def main():
-#     """
-#     Fonction principale de l'application Streamlit.
-#     Gère l'interface utilisateur et le flux de traitement de la requête.
-#     """
-    
-#     # 1. Configuration de la page
-#     st.set_page_config(
-#         page_title="Agent Commercial de Voyage IA - RAG",
-#         page_icon="🤖",
-#         layout="wide" # Utilise toute la largeur de l'écran
-#     )
-
-#     st.title("✈️ Votre Agent Commercial de Voyage IA Multilingue")
-#     st.markdown("""
-#     Bienvenue ! Posez votre question concernant les voyages, en **Français**, en **Anglais**, en **Arabe** ou en **Dialecte Tunisien** (Derja).
-#     """)
-
-# # --- SIDEBAR : Configuration ---
-#     with st.sidebar:
-#         st.header("⚙️ Configuration du Système")
-        
-#         st.markdown("### 📊 Étape 3 : Préparer le Dataset")
-#         st.info("""
-#         Chargez vos documents de voyage depuis le dossier `data/` 
-#         et créez la base vectorielle ChromaDB.
-        
-#         ⏱️ Première exécution : peut prendre 5-10 minutes 
-#         (téléchargement du modèle LaBSE ~500 MB)
-#         """)
-        
-#         # BOUTON POUR LANCER L'ÉTAPE 3
-#         if st.button("🚀 Préparer le Dataset", type="primary", use_container_width=True):
-#             db_manager.pipeline_complet_preparation_dataset()
 
+# Modules légers uniquement : la page s'affiche sans attendre scikit-learn, Chroma,
+# google-genai ni LaBSE, chargés en arrière-plan par rag_core.startup
+from rag_core import metrics, nl_processor, startup
+
+if TYPE_CHECKING:
+    from rag_core.pipeline import PipelineResult, RAGPipeline
+    from rag_core.query_cache import CachedAnswer
+
+# Client léger : si défini, le pipeline est exécuté par le service HTTP (python -m rag_core.api)
+RAG_API_URL = os.getenv("RAG_API_URL", "").rstrip("/")
+RAG_API_TIMEOUT_S = float(os.getenv("RAG_API_TIMEOUT_S", "120"))
+
+def afficher_reponse_en_cache(reponse: "CachedAnswer", niveau: str):
+    """Affiche une réponse servie par le cache (sans appel Gemini ni recherche)."""
+    st.success(f"⚡ Réponse servie depuis le cache ({niveau}).")
+    st.code(reponse.requete_normalisee, language='text')
+    with st.expander("Contexte utilisé"):
+        st.code(reponse.contexte, language='markdown')
+    st.success("🤖 Réponse de l'Agent IA :")
+    st.markdown(reponse.reponse)
+
+def etat_service_api() -> bool:
+    """Interroge /ready du service RAG distant."""
+    import httpx
+    try:
+        return httpx.get(f"{RAG_API_URL}/ready", timeout=5).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+def interroger_service_api(requete_client: str, locale: bool):
+    """Mode client léger : délègue tout le pipeline au service HTTP et affiche son résultat."""
+    import httpx
+    with st.spinner("⏳ Traitement de la requête par le service RAG..."):
+        try:
+            response = httpx.post(
+                f"{RAG_API_URL}/query",
+                json={"query": requete_client, "locale": locale},
+                timeout=RAG_API_TIMEOUT_S
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            st.error(f"Service RAG indisponible ({RAG_API_URL}) : {e}")
+            return
+    resultat = response.json()
+
+    statut = resultat["statut"]
+    if statut == "erreur_normalisation":
+        st.error("La normalisation de la requête a échoué.")
+        return
+    if statut == "cache":
+        st.success(f"⚡ Réponse servie depuis le cache ({resultat['cache']}).")
+    st.code(resultat["requete_normalisee"], language='text')
+    if resultat["score_anomalie"] is not None:
+        st.info(f"Score d'anomalie pour la requête : {resultat['score_anomalie']:.2f} (Seuil : {resultat['seuil_anomalie']:.2f})")
+    if statut == "hors_sujet":
+        st.error("🚫 SUJET HORS-CONTRÔLE : Votre requête est jugée hors sujet par le système. Veuillez vous concentrer uniquement sur les destinations, coûts, ou types de voyages présents dans notre dataset.")
+        return
+    if statut == "sans_contexte":
+        st.warning("⚠️ Aucun contexte pertinent trouvé.")
+        return
+    if resultat["filtres"]:
+        st.caption(f"Filtres appliqués : {resultat['filtres']}")
+    with st.expander("Contexte utilisé"):
+        st.code(resultat["contexte"], language='markdown')
+    st.success("🤖 Réponse de l'Agent IA :")
+    st.markdown(resultat["reponse"])
+
+def afficher_panneau_metriques():
+    """Panneau de débogage : latences par étape, cache, Gemini (métriques du processus ou du service)."""
+    if RAG_API_URL:
+        import httpx
+        try:
+            instantane = httpx.get(f"{RAG_API_URL}/metrics", params={"format": "json"}, timeout=5).json()
+        except httpx.HTTPError as e:
+            st.caption(f"Métriques du service indisponibles : {e}")
+            return
+    else:
+        instantane = metrics.REGISTRY.to_dict()
+
+    def en_ms(valeur):
+        return round(valeur * 1000, 1) if valeur is not None else None
+
+    etapes = instantane["histograms"].get("stage_seconds", [])
+    if etapes:
+        st.markdown("**Latence par étape (ms)**")
+        st.dataframe([
+            {"étape": h["labels"]["stage"], "n": h["count"], "p50": en_ms(h["p50"]),
+             "p95": en_ms(h["p95"]), "moyenne": en_ms(h["mean"])}
+            for h in etapes
+        ], hide_index=True, use_container_width=True)
+    else:
+        st.caption("Aucune requête mesurée pour l'instant.")
+
+    for nom, titre in (("chroma_query_seconds", "Chroma"), ("gemini_seconds", "Gemini"),
+                       ("embedding_seconds", "Encodage LaBSE")):
+        for h in instantane["histograms"].get(nom, []):
+            etiquettes = ", ".join(f"{k}={v}" for k, v in h["labels"].items())
+            st.caption(f"{titre} {etiquettes} : n={h['count']}, p50={en_ms(h['p50'])} ms, p95={en_ms(h['p95'])} ms")
+    for h in instantane["histograms"].get("gemini_tokens", []):
+        st.caption(f"Tokens Gemini {h['labels']['operation']}/{h['labels']['type']} : moyenne {h['mean']:.0f}")
+
+    consultations = instantane["counters"].get("query_cache_lookups_total", [])
+    for niveau in ("exact", "semantique"):
+        hits = sum(c["value"] for c in consultations if c["labels"] == {"niveau": niveau, "resultat": "hit"})
+        total = sum(c["value"] for c in consultations if c["labels"].get("niveau") == niveau)
+        if total:
+            st.caption(f"Cache {niveau} : {hits / total:.0%} de succès ({int(total)} consultations)")
+
+    with st.expander("Export Prometheus / JSON"):
+        if RAG_API_URL:
+            st.json(instantane)
+        else:
+            st.code(metrics.REGISTRY.to_prometheus(), language='text')
+
+@st.fragment(run_every=1.0)
+def afficher_prechargement():
+    """Progression du préchargement, rafraîchie chaque seconde ; relance la page une fois terminé."""
+    prechargement = startup.get_warmup()
+    if prechargement.done:
+        st.rerun()
+    etapes = ", ".join(f"{etape} {duree:.1f} s" for etape, duree in prechargement.durations.items())
+    st.info(
+        f"⏳ Préchargement en arrière-plan du modèle, de l'index et du détecteur "
+        f"(étape : {prechargement.current_step or 'démarrage'})... {etapes}"
+    )
 
+def afficher_etapes_pipeline(pipeline: "RAGPipeline", resultat: "PipelineResult"):
+    """
+    Exécute le pipeline RAG étape par étape en affichant chacune d'elles.
+    `resultat` est complété au fil des étapes (statut, contexte, réponse) pour
+    que l'appelant puisse clore la requête avec pipeline.finish, quelle que
+    soit l'étape à laquelle elle s'arrête.
+    """
+    from rag_core import llm_utils
+    from rag_core.embeddings import QueryContext
 
+    requete_client = resultat.requete
 
-#     st.divider()
-# # Afficher l'état de la base vectorielle
-#     st.markdown("### 📈 État du Système")
-#     if os.path.exists("vectorstore/chroma_db"):
-#         st.success("✅ Base vectorielle créée")
-#     else:
-#         st.warning("⚠️ Base non créée")
-#     st.divider()
+    # --- ÉTAPE 1 : Préparation ---
+    st.info(f"Requête initiale : **{requete_client}**")
 
+    # Cache niveau 1 : même requête brute déjà traitée (aucun appel Gemini ni recherche)
+    reponse_en_cache = pipeline.lookup_exact(requete_client)
+    if reponse_en_cache:
+        pipeline.from_cache(resultat, reponse_en_cache, "exact")
+        afficher_reponse_en_cache(reponse_en_cache, "requête identique")
+        return
 
+    st.divider()
 
-#     # 2. Zone de Saisie de la Requête Client
-#     requete_client = st.text_area(
-#         "Entrez votre requête ici :",
-#         height=150,
-#         placeholder="Ex: نحب نسافر لتونس في الصيف. | I want to book a flight to Paris. | Je cherche des infos sur la visa pour Dubaï."
-#     )
+    # --- ÉTAPE 2 : Traitement Multilingue et Normalisation ---
+    # Français / anglais propre : normalisation locale ; arabe, Derja ou requête bruitée : Gemini
+    with st.spinner("⏳ Étape 2: Traduction et normalisation de la requête..."):
+        resultat.requete_normalisee, resultat.normalisation = pipeline.normalize(requete_client)
+    requete_normalisee = resultat.requete_normalisee
 
-#     # 3. Bouton de Soumission et Déclenchement du Pipeline
-#     if st.button("Chercher l'Information", type="primary"):
-        
-#         # Vérification de l'input
-#         if not requete_client:
-#             st.warning("Veuillez entrer une requête pour commencer.")
-#             return # Arrêter l'exécution si la requête est vide
-            
-#         # --- ÉTAPE 1 : Préparation ---
-#         st.info(f"Requête initiale : **{requete_client}**")
-        
-#         # Initialisation du client Gemini (la fonction vérifie la clé API)
-#         gemini_client = llm_utils.get_gemini_client()
-        
-#         st.divider()
-        
-#         # --- ÉTAPE 2 : Traitement Multilingue et Normalisation ---
-#         with st.spinner("⏳ Étape 2: Traduction et normalisation de la requête (Gemini)..."):
-#             requete_normalisee = llm_utils.traiter_requete_multilingue(
-#                 gemini_client, requete_client
-#             )
+    if not requete_normalisee:
+        resultat.statut = "erreur_normalisation"
+        return
 
-#         if requete_normalisee:
-#             st.success("✅ ÉTAPE 2 RÉUSSIE : Requête normalisée (en Français) :")
-#             st.code(requete_normalisee, language='text')
+    if resultat.normalisation == "locale":
+        st.success("✅ ÉTAPE 2 RÉUSSIE : Requête exploitable directement (normalisation locale, sans Gemini) :")
+    else:
+        st.success("✅ ÉTAPE 2 RÉUSSIE : Requête normalisée (en Français) :")
+    st.code(requete_normalisee, language='text')
+
+    # Cache niveau 2 : question normalisée sémantiquement équivalente
+    # Un seul encodage LaBSE par requête, partagé par le cache, le détecteur et la recherche
+    contexte_requete = QueryContext(requete_normalisee)
+    pipeline.embed(contexte_requete)
+    reponse_en_cache = pipeline.lookup_semantic(contexte_requete, requete_client)
+    if reponse_en_cache:
+        pipeline.from_cache(resultat, reponse_en_cache, "semantique")
+        afficher_reponse_en_cache(reponse_en_cache, "question similaire")
+        return
 
-            
-            
+    st.divider()
 
-# if __name__ == "__main__":
-#     main()
-# chatbot.py (Fonction main)
+    # --- NOUVEAU BLOC : Contrôle du Sujet (Isolation Forest) ---
+    st.markdown("### 🔎 Contrôle de Pertinence du Sujet")
+    with st.spinner("⏳ Vérification du sujet de la requête (Isolation Forest)..."):
+        is_outlier = pipeline.apply_anomaly(resultat, *pipeline.check_anomaly(contexte_requete))
+    st.info(f"Score d'anomalie pour la requête : {resultat.score_anomalie:.2f} (Seuil : {resultat.seuil_anomalie:.2f})")
 
-import streamlit as st
-import os
-from dotenv import load_dotenv
-# Charger les variables d'environnement
-load_dotenv()
+    if is_outlier:
+        # Si l'anomalie est détectée, nous arrêtons le RAG et affichons le message
+        st.error("🚫 SUJET HORS-CONTRÔLE : Votre requête est jugée hors sujet par le système. Veuillez vous concentrer uniquement sur les destinations, coûts, ou types de voyages présents dans notre dataset.")
+        return
+    else:
+        st.success("✅ Sujet pertinent détecté. Lancement du RAG.")
+    # --------------------------------------------------------
 
-# Importation des utilitaires LLM (Gemini)
-from rag_core import llm_utils 
-# Importation du gestionnaire de base de données (RAG Indexing)
-from rag_core import db_manager 
-# NOUVEAU : Importation du Détecteur d'Anomalies
-from rag_core.anomaly_detector import AnomalyDetector 
+    st.divider()
+
+    # --- ÉTAPE 3 : Statistiques du dataset (questions analytiques) ou Recherche RAG ---
+    if pipeline.apply_aggregate(resultat, pipeline.aggregate(contexte_requete)):
+        st.markdown("### 📊 ÉTAPE 3 : Statistiques du Dataset")
+        st.success("✅ Question analytique : réponse calculée sur l'ensemble des voyages (sans recherche).")
+        st.code(resultat.contexte, language='markdown')
+    else:
+        st.markdown("### 🔍 ÉTAPE 3 : Recherche de Contexte")
+        with st.spinner("⏳ Recherche de contexte pertinent dans la base de données..."):
+            resultat_recherche = pipeline.retrieve(contexte_requete)
+
+        if not pipeline.apply_search(resultat, resultat_recherche):
+            st.warning("⚠️ Aucun contexte pertinent trouvé. La réponse sera générale ou basée sur un contexte vide.")
+            # Si aucun contexte, on pourrait fallback sur une réponse LLM pure
+            return
+
+        st.success("✅ Contexte(s) récupéré(s) :")
+        if resultat_recherche.filters:
+            st.caption(f"Filtres appliqués : {resultat_recherche.filters}")
+        st.code(resultat.contexte, language='markdown')
+        st.caption("Scores de similarité : " + ", ".join(
+            f"{score:.2f}" for _, score in resultat_recherche.hits
+        ))
+    contexte_trouve = resultat.contexte
+
+    st.divider()
+
+    # --- ÉTAPE 4 : Génération Augmentée (Generation) ---
+    st.markdown("### 💬 ÉTAPE 4 : Génération Augmentée")
+
+    # Affichage token par token : l'utilisateur voit la réponse dès le premier fragment
+    st.success("🤖 Réponse de l'Agent IA :")
+    latence = llm_utils.LatenceGeneration()
+    with metrics.timed("generation", pipeline.trace):
+        reponse_finale = st.write_stream(llm_utils.generer_reponse_rag_stream(
+            pipeline.client,
+            requete_normalisee,
+            contexte_trouve,
+            latence,
+            pipeline.usage
+        ))
+    resultat.reponse = reponse_finale
+    if not latence.terminee:
+        resultat.statut = "erreur_generation"
+
+    if reponse_finale:
+        tokens_prompt = pipeline.usage.tokens_prompt or resultat.tokens["prompt_estime"]
+        st.caption(
+            f"⏱️ Premier token : {latence.premier_token_s or 0:.2f} s — "
+            f"réponse complète : {latence.total_s:.2f} s — prompt : {tokens_prompt} tokens"
+        )
+        # Une réponse interrompue (texte partiel + message d'erreur) n'est pas mise en cache
+        if latence.terminee:
+            pipeline.remember(requete_client, contexte_requete, contexte_trouve, reponse_finale)
+    else:
+        st.error("La génération de la réponse finale a échoué.")
 
 def main():
     """
@@ -129,6 +276,11 @@ def main():
     Bienvenue ! Posez votre question concernant les voyages, en **Français**, en **Anglais**, en **Arabe** ou en **Dialecte Tunisien** (Derja).
     """)
 
+    # Préchargement du modèle, de l'index et du détecteur (une fois par serveur, inutile
+    # en client léger) : la page est servie pendant le chargement
+    prechargement = None if RAG_API_URL else startup.start_warmup()
+    en_prechargement = prechargement is not None and startup.RAG_WARMUP_ENABLED and not prechargement.done
+
 # --- SIDEBAR : Configuration et Initialisation ---
     with st.sidebar:
         st.header("⚙️ Configuration du Système")
@@ -138,35 +290,70 @@ def main():
         Chargez vos documents de voyage et créez la base vectorielle ChromaDB.
         """)
         
+        mode_incremental = st.checkbox(
+            "Mode incrémental (ne ré-indexer que les lignes nouvelles ou modifiées)",
+            value=True
+        )
+
         # BOUTON POUR LANCER L'ÉTAPE 3
         if st.button("🚀 Préparer le Dataset", type="primary", use_container_width=True):
-            vectorstore = db_manager.pipeline_complet_preparation_dataset()
+            from rag_core import db_manager, resources
+            vectorstore = db_manager.pipeline_complet_preparation_dataset(incremental=mode_incremental)
             
-            # Stockage de la base vectorielle et du détecteur dans l'état de session Streamlit
-            if vectorstore:
-                st.session_state['vectorstore'] = vectorstore
-                # NOUVEAU : Initialiser le détecteur après la création de la base
-                st.session_state['anomaly_detector'] = AnomalyDetector(vectorstore)
+            # Publication de la nouvelle base et de son détecteur pour toutes les sessions
+            # (le service RAG distant la recharge seul grâce au marqueur de version de l'index)
+            if vectorstore and not RAG_API_URL:
+                resources.publish_vector_store(vectorstore)
+
+        st.markdown("### 🌐 Normalisation des Requêtes")
+        normalisation_locale = st.toggle(
+            "Normalisation locale rapide (FR/EN sans Gemini)",
+            value=nl_processor.LOCAL_NORMALIZATION_ENABLED
+        )
+        if not RAG_API_URL and not en_prechargement:
+            from rag_core import llm_utils
+            st.caption(
+                f"Requêtes traitées localement : {llm_utils.taux_contournement():.0%} "
+                f"({llm_utils.NORMALISATION_STATS['locale']} locales / {llm_utils.NORMALISATION_STATS['gemini']} Gemini)"
+            )
+
+        st.markdown("### 🐞 Débogage")
+        if st.toggle("Afficher les métriques du pipeline", value=False):
+            afficher_panneau_metriques()
 
 
     st.divider()
     
 # --- Chargement et Affichage de l'État du Système ---
 
-    # Tenter de charger l'index RAG et le détecteur au premier chargement de la page
-    if 'vectorstore' not in st.session_state and os.path.exists(db_manager.VECTOR_STORE_PATH):
-        with st.spinner("⏳ Chargement de l'index de voyage existant..."):
-            vectorstore = db_manager.load_existing_vector_store()
-            st.session_state['vectorstore'] = vectorstore
-            
-            if vectorstore:
-                st.session_state['anomaly_detector'] = AnomalyDetector(vectorstore) # Initialisation du détecteur
-    
-    # Afficher l'état de la base vectorielle
-    if st.session_state.get('vectorstore'):
-        st.success("✅ Base vectorielle & Détecteur d'anomalies chargés.")
+    # Récupérer l'index RAG et le détecteur partagés (chargés une seule fois par serveur,
+    # rechargés uniquement si la version de l'index sur disque a changé)
+    if RAG_API_URL:
+        # Client léger : le modèle et l'index sont chargés par le service, pas par Streamlit
+        shared = None
+        if etat_service_api():
+            st.success(f"✅ Service RAG prêt ({RAG_API_URL}).")
+        else:
+            st.warning(f"⚠️ Service RAG non prêt ({RAG_API_URL}).")
+    elif en_prechargement:
+        # L'état de la base s'affichera à la fin du préchargement
+        shared = None
+        afficher_prechargement()
     else:
-        st.warning("⚠️ Base de données non créée. Veuillez cliquer sur 'Préparer le Dataset'.")
+        from rag_core import resources
+        if resources.is_current():
+            shared = resources.get_shared_resources()
+        else:
+            with st.spinner("⏳ Chargement de l'index de voyage existant..."):
+                shared = resources.get_shared_resources()
+
+        # Afficher l'état de la base vectorielle
+        if shared:
+            st.success("✅ Base vectorielle & Détecteur d'anomalies chargés.")
+        else:
+            st.warning("⚠️ Base de données non créée. Veuillez cliquer sur 'Préparer le Dataset'.")
+        if prechargement.error:
+            st.caption(f"Préchargement interrompu : {prechargement.error}")
 
     st.divider()
 
@@ -182,8 +369,19 @@ def main():
     # 3. Bouton de Soumission et Déclenchement du Pipeline
     if st.button("Chercher l'Information", type="primary"):
         
+        if RAG_API_URL and requete_client:
+            interroger_service_api(requete_client, normalisation_locale)
+            return
+
+        # Requête envoyée pendant le préchargement : on attend la fin de l'étape en cours
+        if en_prechargement and requete_client:
+            with st.spinner("⏳ Fin du préchargement (modèle, index, détecteur)..."):
+                prechargement.wait()
+            from rag_core import resources
+            shared = resources.get_shared_resources()
+
         # Vérification des prérequis RAG
-        if not st.session_state.get('vectorstore'):
+        if not shared:
             st.error("Impossible de chercher : la base de données vectorielle n'est pas chargée.")
             return
 
@@ -192,79 +390,21 @@ def main():
             st.warning("Veuillez entrer une requête pour commencer.")
             return 
             
-        # --- ÉTAPE 1 : Préparation ---
-        st.info(f"Requête initiale : **{requete_client}**")
-        
+        # Déjà importés par le préchargement (ou à la première requête si RAG_WARMUP=0)
+        from rag_core import llm_utils
+        from rag_core.pipeline import PipelineResult, RAGPipeline
+
         # Initialisation du client Gemini (la fonction vérifie la clé API)
         gemini_client = llm_utils.get_gemini_client()
-        
-        st.divider()
-        
-        # --- ÉTAPE 2 : Traitement Multilingue et Normalisation ---
-        with st.spinner("⏳ Étape 2: Traduction et normalisation de la requête (Gemini)..."):
-            requete_normalisee = llm_utils.traiter_requete_multilingue(
-                gemini_client, requete_client
-            )
-
-        if requete_normalisee:
-            st.success("✅ ÉTAPE 2 RÉUSSIE : Requête normalisée (en Français) :")
-            st.code(requete_normalisee, language='text')
-            
-            st.divider()
-
-            # --- NOUVEAU BLOC : Contrôle du Sujet (Isolation Forest) ---
-            st.markdown("### 🔎 Contrôle de Pertinence du Sujet")
-            detector = st.session_state['anomaly_detector']
-            
-            with st.spinner("⏳ Vérification du sujet de la requête (Isolation Forest)..."):
-                is_outlier = detector.is_anomaly(requete_normalisee)
-                
-            if is_outlier:
-                # Si l'anomalie est détectée, nous arrêtons le RAG et affichons le message
-                st.error("🚫 SUJET HORS-CONTRÔLE : Votre requête est jugée hors sujet par le système. Veuillez vous concentrer uniquement sur les destinations, coûts, ou types de voyages présents dans notre dataset.")
-                return 
-            else:
-                st.success("✅ Sujet pertinent détecté. Lancement du RAG.")
-            # --------------------------------------------------------
-            
-            st.divider()
-            
-            # --- ÉTAPE 3 : Recherche RAG (Retrieval) ---
-            st.markdown("### 🔍 ÉTAPE 3 : Recherche de Contexte")
-            vectorstore = st.session_state['vectorstore']
-            
-            with st.spinner("⏳ Recherche de contexte pertinent dans la base de données..."):
-                contexte_trouve = db_manager.search_db(
-                    requete_normalisee, 
-                    vectorstore,
-                    k=3
-                )
-            
-            if contexte_trouve:
-                st.success("✅ Contexte(s) récupéré(s) :")
-                st.code(contexte_trouve, language='markdown')
-
-                st.divider()
-
-                # --- ÉTAPE 4 : Génération Augmentée (Generation) ---
-                st.markdown("### 💬 ÉTAPE 4 : Génération Augmentée")
-                
-                with st.spinner("⏳ Génération de la réponse finale avec Gemini..."):
-                    reponse_finale = llm_utils.generer_reponse_rag(
-                        gemini_client, 
-                        requete_normalisee, 
-                        contexte_trouve
-                    )
-                
-                if reponse_finale:
-                    st.success("🤖 Réponse de l'Agent IA :")
-                    st.markdown(reponse_finale) 
-                else:
-                    st.error("La génération de la réponse finale a échoué.")
-            else:
-                 st.warning("⚠️ Aucun contexte pertinent trouvé. La réponse sera générale ou basée sur un contexte vide.")
-                # Si aucun contexte, on pourrait fallback sur une réponse LLM pure
-
+        # Étapes du pipeline RAG (sans interface), affichées une à une ; la requête est close
+        # (compteur par statut, durée totale, trace) quelle que soit l'étape où elle s'arrête
+        pipeline = RAGPipeline(shared, gemini_client, k=3, locale=normalisation_locale)
+        resultat = PipelineResult(requete=requete_client)
+        try:
+            with metrics.timed("total", pipeline.trace):
+                afficher_etapes_pipeline(pipeline, resultat)
+        finally:
+            pipeline.finish(resultat)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,77 +1,251 @@
 # rag_core/anomaly_detector.py
 
+import hashlib
+import os
+import threading
+from typing import TYPE_CHECKING
+
+import joblib
 import numpy as np
-import streamlit as st
-from sklearn.ensemble import IsolationForest
-from langchain_community.embeddings import HuggingFaceBgeEmbeddings 
-from langchain_community.vectorstores import Chroma
 
+from rag_core import db_manager, notifications
+from rag_core.anomaly_scorers import ANOMALY_SCORER, AnomalyScorer, NearestNeighbourScorer, make_scorer
+from rag_core.db_manager import VECTOR_STORE_PATH
+from rag_core.embedding_snapshot import EmbeddingSnapshot, load_collection_embeddings
 # Le modèle doit être le même que celui utilisé pour la vectorisation
-EMBEDDING_MODEL_NAME = "sentence-transformers/LaBSE" 
+from rag_core.embeddings import get_embedding_service
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+# --- Artefact du modèle entraîné (à côté de la base vectorielle) ---
+ANOMALY_MODEL_DIR = os.path.join(os.path.dirname(VECTOR_STORE_PATH), "anomaly_model")
+ANOMALY_MODEL_FILE = os.path.join(ANOMALY_MODEL_DIR, "model.joblib")
+# À incrémenter si le contenu de l'artefact change
+ANOMALY_ARTIFACT_VERSION = 4
+
+# Requêtes du domaine servant à calibrer le seuil des scorers knn / centroïdes
+CALIBRATION_QUERIES = (
+    "Je voudrais partir une semaine à Lisbonne, quel hébergement me conseillez-vous ?",
+    "Quel est le prix d'un billet d'avion pour Rio de Janeiro ?",
+    "Un séjour en hôtel à Dubaï pour un couple",
+    "Combien coûte une location de voiture à Los Angeles ?",
+    "Voyage de deux semaines en Thaïlande avec un petit budget",
+    "Je cherche une auberge de jeunesse à Barcelone",
+    "Quels voyages ont été faits à Séoul en train ?",
+    "Coût total d'un voyage de 5 jours au Cap",
+    "Un voyageur de 30 ans qui part à Hawaï",
+    "Durée moyenne des séjours à Édimbourg",
+    "Trip to Paris for a week in a hotel",
+    "How much does a flight to Bangkok cost?",
+    "Looking for a vacation rental in Bali",
+    "Cheapest transportation options to Tokyo",
+    "Which trips went to Cape Town by plane?",
+    "Accommodation costs for a stay in Sydney",
+    "Voyage en ferry vers la Grèce",
+    "Séjour en Airbnb à New York pour 8 jours",
+    "Hébergement en resort à Cancun, quel budget ?",
+    "Transport en bus pour aller à Rome",
+)
+
+
+def _calibration_hash(queries) -> str:
+    """Empreinte des requêtes de calibration (le seuil enregistré en dépend)."""
+    return hashlib.sha256("\0".join(queries).encode("utf-8")).hexdigest()
+
+def _sklearn_version() -> str:
+    """Version de scikit-learn enregistrée avec l'artefact (import différé, ~2 s)."""
+    import sklearn
+
+    return sklearn.__version__
 
 class AnomalyDetector:
     """
     Détecte les requêtes utilisateurs sémantiquement hors-sujet par rapport 
     à la base de connaissances indexée.
+
+    Le score est délégué à un AnomalyScorer interchangeable (Isolation Forest par
+    défaut, ou similarité aux plus proches voisins / centroïdes, cf. ANOMALY_SCORER).
+    Le scorer entraîné est sauvegardé sur disque avec la version de l'index
+    et n'est ré-entraîné que si une nouvelle version est publiée.
+    Les vecteurs de la base (`embeddings_data`) sont ceux de l'instantané compact
+    de db_manager, projeté en mémoire et partagé entre processus.
+    Le seuil des scorers knn / centroïdes est calibré sur `calibration_queries`,
+    des requêtes du domaine (CALIBRATION_QUERIES par défaut).
     """
-    def __init__(self, vectorstore: Chroma):
-        # 1. Récupération de TOUS les vecteurs de la DB
+    def __init__(self, vectorstore: "Chroma", background_refit: bool = False,
+                 scorer_name: str = ANOMALY_SCORER, calibration_queries=None):
         self.vectorstore = vectorstore
-        self.embeddings_data = self._load_all_embeddings()
-        
-        # 2. Initialisation et Entraînement de l'Isolation Forest
-        self.model = IsolationForest(
-            contamination='auto', # La contamination est la proportion d'anomalies
-            random_state=42
-        )
-        # Entraînement sur la totalité des vecteurs de la base de voyage (le sujet principal)
-        self.model.fit(self.embeddings_data)
-        st.success("🌲 Modèle Isolation Forest prêt pour la détection d'anomalies.")
+        self.scorer_name = scorer_name
+        self.calibration_queries = tuple(calibration_queries or CALIBRATION_QUERIES)
+        self._refit_lock = threading.Lock()
+        self.refit_thread = None
+
+        # 1. Empreinte de la collection (version de l'index + nombre de vecteurs)
+        self.fingerprint = self._collection_fingerprint()
+
+        # 2. Chargement de l'artefact sauvegardé si la collection n'a pas changé
+        artifact = self._load_artifact()
+        if artifact is not None and not self._attach_snapshot(artifact):
+            artifact = None
+        if (artifact is not None and artifact["fingerprint"] == self.fingerprint
+                and artifact["scorer_name"] == scorer_name
+                and artifact["calibration_hash"] == _calibration_hash(self.calibration_queries)):
+            self.scorer = artifact["scorer"]
+            notifications.success(f"🌲 Détecteur d'anomalies ({scorer_name}) chargé depuis le disque.")
+        elif artifact is not None and background_refit:
+            # L'ancien modèle continue de servir pendant le ré-entraînement
+            self.scorer = artifact["scorer"]
+            self.refit_thread = threading.Thread(target=self.refit, name="anomaly-refit", daemon=True)
+            self.refit_thread.start()
+            notifications.info(f"🌲 Collection modifiée : ré-entraînement du détecteur ({scorer_name}) en arrière-plan.")
+        else:
+            self.refit()
+            notifications.success(f"🌲 Détecteur d'anomalies ({scorer_name}) prêt.")
+
+    def refit(self):
+        """Entraîne le scorer sur tous les vecteurs de la base puis sauvegarde l'artefact."""
+        with self._refit_lock:
+            # 1. Récupération de TOUS les vecteurs de la DB (instantané compact si à jour)
+            fingerprint = self._collection_fingerprint()
+            snapshot = self._open_snapshot(fingerprint["count"], write_missing=True)
+            if snapshot is not None:
+                training_data, embeddings_data = snapshot.to_float32(), snapshot.vectors
+            else:
+                training_data = embeddings_data = self._load_all_embeddings()
+
+            # 2. Entraînement sur la totalité des vecteurs de la base de voyage (le sujet principal),
+            #    seuil calibré sur des requêtes du domaine pour les scorers qui en ont besoin
+            scorer = make_scorer(self.scorer_name)
+            calibration_vectors = (self.get_embeddings_function().encode(list(self.calibration_queries))
+                                   if scorer.requires_calibration else None)
+            scorer.fit(training_data, calibration_vectors)
+
+            # knn : la référence devient l'instantané projeté en mémoire (la copie float32 est
+            # libérée). Sans instantané, l'artefact est tout de même sauvegardé : seul un scorer
+            # knn, dont la référence n'est pas enregistrée, sera ré-entraîné au prochain démarrage
+            if snapshot is not None:
+                scorer.attach_reference(snapshot)
+            self._save_artifact(scorer, len(embeddings_data), fingerprint)
+
+            # Bascule vers le nouveau modèle (les requêtes en cours gardent l'ancien)
+            self.scorer = scorer
+            self.embeddings_data = embeddings_data
+            self.fingerprint = fingerprint
+
+    # --- Persistance ---
+
+    def _collection_fingerprint(self) -> dict:
+        """
+        Empreinte de la collection : version publiée de l'index (db_manager.publish_index_version,
+        renouvelée à chaque ingestion qui modifie la base) et nombre de vecteurs, sans relire la collection.
+        """
+        return {"count": self.vectorstore._collection.count(), "index_version": db_manager.get_index_version()}
+
+    def _load_artifact(self) -> dict | None:
+        """Charge l'artefact sauvegardé s'il existe et est compatible, sinon None."""
+        if not os.path.exists(ANOMALY_MODEL_FILE):
+            return None
+        try:
+            # Les matrices numpy du scorer sont projetées en mémoire, pas copiées
+            artifact = joblib.load(ANOMALY_MODEL_FILE, mmap_mode='r')
+        except Exception as e:
+            notifications.warning(f"Artefact du détecteur illisible, ré-entraînement : {e}")
+            return None
+        if (artifact.get("artifact_version") != ANOMALY_ARTIFACT_VERSION
+                or artifact.get("sklearn_version") != _sklearn_version()):
+            return None
+        return artifact
+
+    def _open_snapshot(self, n_samples: int, write_missing: bool = False) -> EmbeddingSnapshot | None:
+        """
+        Instantané compact des vecteurs de la version courante de l'index (sans copie).
+        Avec `write_missing`, il est (ré)écrit s'il manque, par exemple pour un index
+        construit avant son introduction.
+        """
+        snapshot = db_manager.open_embedding_snapshot()
+        if (snapshot is None or len(snapshot) != n_samples) and write_missing and n_samples:
+            db_manager.write_embedding_snapshot(self.vectorstore._collection, db_manager.get_index_version())
+            snapshot = db_manager.open_embedding_snapshot()
+        return snapshot if snapshot is not None and len(snapshot) == n_samples else None
+
+    def _attach_snapshot(self, artifact: dict) -> bool:
+        """
+        Rattache l'instantané compact (vecteurs en mémoire partagée, sans copie) au scorer
+        chargé. Retourne False si l'instantané manque alors que le scorer en a besoin.
+        """
+        snapshot = self._open_snapshot(artifact["n_samples"])
+        if snapshot is None:
+            self.embeddings_data = np.array([])
+            return not isinstance(artifact["scorer"], NearestNeighbourScorer) or artifact["scorer"].n_centroids > 0
+        artifact["scorer"].attach_reference(snapshot)
+        self.embeddings_data = snapshot.vectors
+        return True
+
+    def _save_artifact(self, scorer: AnomalyScorer, n_samples: int, fingerprint: dict):
+        """Sauvegarde atomiquement le modèle et son empreinte (les vecteurs restent dans l'instantané)."""
+        os.makedirs(ANOMALY_MODEL_DIR, exist_ok=True)
+        try:
+            tmp_model = ANOMALY_MODEL_FILE + ".tmp"
+            joblib.dump({
+                "artifact_version": ANOMALY_ARTIFACT_VERSION,
+                "sklearn_version": _sklearn_version(),
+                "fingerprint": fingerprint,
+                "n_samples": n_samples,
+                "scorer_name": self.scorer_name,
+                "calibration_hash": _calibration_hash(self.calibration_queries),
+                "scorer": scorer,
+            }, tmp_model)
+            os.replace(tmp_model, ANOMALY_MODEL_FILE)
+        except OSError as e:
+            notifications.warning(f"Impossible de sauvegarder le modèle du détecteur : {e}")
 
     def _load_all_embeddings(self) -> np.ndarray:
         """Extrait tous les vecteurs de la collection ChromaDB de manière sécurisée."""
         collection = self.vectorstore._collection
 
         try:
-            results = collection.get(include=['embeddings'])
+            # Lecture paginée directement en float32 (sans liste Python de toute la collection)
+            embeddings = load_collection_embeddings(collection)
         except Exception as e:
-            st.error(f"Erreur lors de la récupération des embeddings : {e}")
+            notifications.error(f"Erreur lors de la récupération des embeddings : {e}")
             return np.array([])
 
-        embeddings = results.get('embeddings')
-
         # ✅ Vérification sécurisée
-        if embeddings is None or len(embeddings) == 0:
-            st.error("⚠️ Aucun embedding trouvé dans la base Chroma.")
+        if len(embeddings) == 0:
+            notifications.error("⚠️ Aucun embedding trouvé dans la base Chroma.")
             return np.array([])
 
-        st.success(f"✅ {len(embeddings)} embeddings chargés dans le détecteur.")
-        return np.array(embeddings)
+        notifications.success(f"✅ {len(embeddings)} embeddings chargés dans le détecteur.")
+        return embeddings
 
     
     def get_embeddings_function(self):
-        """Retourne la fonction d'embedding utilisée (pour vectoriser la requête)."""
-        return HuggingFaceBgeEmbeddings(
-             model_name=EMBEDDING_MODEL_NAME,
-             model_kwargs={'device': 'cpu'} 
-        )
+        """Retourne le service d'embedding partagé (celui utilisé pour l'indexation)."""
+        return get_embedding_service()
+
+    def score_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        """Scores de pertinence d'une matrice de requêtes (un seul appel au scorer)."""
+        return self.scorer.score(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1))
 
-    def is_anomaly(self, query_text: str, threshold: float = -0.5) -> bool:
+    def is_anomaly(self, query_text: str, threshold: float | None = None,
+                   query_vector: np.ndarray | None = None) -> bool:
         """
         Détermine si la requête utilisateur est une anomalie (hors-sujet).
         Retourne True si c'est une anomalie (hors sujet).
+        `query_vector` (ex : QueryContext.vector) évite de ré-encoder la requête.
+        Sans `threshold`, le seuil du scorer est utilisé (calibré pour knn / centroids).
         """
-        # 1. Vectoriser la requête
-        embedding_fn = self.get_embeddings_function()
-        query_vector = embedding_fn.embed_query(query_text)
-        query_vector = np.array(query_vector).reshape(1, -1)
+        # 1. Vectoriser la requête (si le vecteur n'est pas déjà fourni)
+        if query_vector is None:
+            query_vector = self.get_embeddings_function().encode([query_text])
+        threshold = self.scorer.threshold if threshold is None else threshold
         
-        # 2. Prédire le score d'anomalie
-        # Le score renvoie la 'distance' du point par rapport aux données normales
-        anomaly_score = self.model.decision_function(query_vector)[0]
+        # 2. Prédire le score d'anomalie (plus il est bas, plus la requête s'écarte de la base)
+        anomaly_score = float(self.score_vectors(np.asarray(query_vector).reshape(1, -1))[0])
         
-        st.info(f"Score d'anomalie pour la requête : {anomaly_score:.2f} (Seuil : {threshold})")
+        notifications.info(f"Score d'anomalie pour la requête : {anomaly_score:.2f} (Seuil : {threshold:.2f})")
         
         # 3. Déterminer si c'est une anomalie
         # Si le score est inférieur au seuil, c'est une anomalie (False pour inlier, True pour outlier)
-        return anomaly_score < threshold
\ No newline at end of file
+        return anomaly_score < threshold
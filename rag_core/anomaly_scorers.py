@@ -0,0 +1,166 @@
+# rag_core/anomaly_scorers.py
+
+import abc
+import os
+
+import numpy as np
+
+# Scorer utilisé par AnomalyDetector : 'isolation_forest', 'knn' ou 'centroids'
+ANOMALY_SCORER = os.getenv("ANOMALY_SCORER", "isolation_forest")
+# Nombre de requêtes scorées par produit matriciel (borne la mémoire des appels par lot)
+SCORING_BLOCK_SIZE = 256
+# Lignes de l'instantané reconverties en float32 par produit matriciel (scorer knn)
+REFERENCE_BLOCK_SIZE = 65536
+
+
+class AnomalyScorer(abc.ABC):
+    """
+    Interface des scorers de pertinence : `score` retourne un score par vecteur,
+    d'autant plus élevé que la requête ressemble à la base ; une requête dont le
+    score est inférieur à `threshold` est hors sujet.
+    Les scorers dont `requires_calibration` est vrai fixent leur seuil à partir des
+    vecteurs de requêtes du domaine passés à `fit` (`calibration_vectors`).
+    """
+    name = "base"
+    threshold = 0.0
+    requires_calibration = False
+
+    @abc.abstractmethod
+    def fit(self, embeddings: np.ndarray, calibration_vectors: np.ndarray | None = None) -> "AnomalyScorer":
+        """Entraîne le scorer sur les vecteurs de la base et retourne self."""
+
+    @abc.abstractmethod
+    def score(self, vectors: np.ndarray) -> np.ndarray:
+        """Un score de pertinence par vecteur de requête."""
+
+    def attach_reference(self, snapshot) -> None:
+        """Rattache les vecteurs de la base (instantané compact) après chargement de l'artefact."""
+
+    def is_anomaly(self, vectors: np.ndarray, threshold: float | None = None) -> np.ndarray:
+        threshold = self.threshold if threshold is None else threshold
+        return self.score(vectors) < threshold
+
+
+class IsolationForestScorer(AnomalyScorer):
+    """Scorer historique : Isolation Forest (100 arbres) entraînée sur tous les vecteurs de la base."""
+    name = "isolation_forest"
+
+    def __init__(self, threshold: float = -0.5, random_state: int = 42):
+        # scikit-learn n'est importé qu'à la construction d'un scorer (pas au démarrage de l'application)
+        from sklearn.ensemble import IsolationForest
+
+        self.threshold = threshold
+        self.model = IsolationForest(
+            contamination='auto', # La contamination est la proportion d'anomalies
+            random_state=random_state
+        )
+
+    def fit(self, embeddings, calibration_vectors=None):
+        self.model.fit(embeddings)
+        return self
+
+    def score(self, vectors):
+        # Le score renvoie la 'distance' du point par rapport aux données normales
+        return self.model.decision_function(np.asarray(vectors).reshape(len(vectors), -1))
+
+
+class NearestNeighbourScorer(AnomalyScorer):
+    """
+    Similarité cosinus moyenne aux k plus proches voisins de la base (ou aux k
+    centroïdes les plus proches si `n_centroids` > 0), calculée par produits
+    matriciels float32 (BLAS) sur des vecteurs normalisés.
+
+    Le seuil est le quantile `calibration_quantile` des scores de requêtes du
+    domaine (`calibration_vectors`, obligatoires) : les documents de la base sont
+    bien plus proches les uns des autres que ne le sont les vraies requêtes, et ne
+    peuvent pas servir à le calibrer.
+
+    En mode knn, la référence n'est pas sérialisée avec le scorer : c'est
+    l'instantané compact de db_manager, rattaché par `attach_reference`.
+    """
+    requires_calibration = True
+
+    def __init__(self, k: int = 10, n_centroids: int = 0, calibration_quantile: float = 0.05,
+                 random_state: int = 42):
+        self.k = k
+        self.n_centroids = n_centroids
+        self.calibration_quantile = calibration_quantile
+        self.random_state = random_state
+        self.reference = None
+        self.threshold = 0.0
+
+    @property
+    def name(self) -> str:
+        return "centroids" if self.n_centroids else "knn"
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if not self.n_centroids:
+            # Les vecteurs de la base restent dans l'instantané projeté en mémoire
+            state["reference"] = None
+        return state
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _build_reference(self, embeddings: np.ndarray) -> np.ndarray:
+        if not self.n_centroids:
+            return np.ascontiguousarray(embeddings)
+        from sklearn.cluster import MiniBatchKMeans
+
+        kmeans = MiniBatchKMeans(
+            n_clusters=min(self.n_centroids, len(embeddings)),
+            random_state=self.random_state,
+            n_init=3
+        ).fit(embeddings)
+        return np.ascontiguousarray(self._normalize(kmeans.cluster_centers_))
+
+    def fit(self, embeddings, calibration_vectors=None):
+        if calibration_vectors is None or len(calibration_vectors) == 0:
+            raise ValueError(f"Le scorer {self.name} doit être calibré sur des requêtes du domaine.")
+        self.reference = self._build_reference(self._normalize(embeddings))
+        self.threshold = float(np.quantile(self.score(calibration_vectors), self.calibration_quantile))
+        return self
+
+    def attach_reference(self, snapshot) -> None:
+        if not self.n_centroids:
+            self.reference = snapshot
+
+    def _reference_blocks(self):
+        """Blocs float32 normalisés de la référence (matrice, ou instantané relu par blocs)."""
+        if isinstance(self.reference, np.ndarray):
+            yield self.reference
+            return
+        for start in range(0, len(self.reference), REFERENCE_BLOCK_SIZE):
+            yield self._normalize(self.reference.rows(start, start + REFERENCE_BLOCK_SIZE))
+
+    def score(self, vectors):
+        if self.reference is None:
+            raise RuntimeError(f"Le scorer {self.name} n'a pas de vecteurs de référence (attach_reference).")
+        vectors = self._normalize(vectors)
+        k = min(self.k, len(self.reference))
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SCORING_BLOCK_SIZE):
+            block = vectors[start:start + SCORING_BLOCK_SIZE]
+            top_k = None
+            for reference in self._reference_blocks():
+                similarities = block @ reference.T
+                if top_k is not None:
+                    similarities = np.concatenate([top_k, similarities], axis=1)
+                top_k = np.partition(similarities, -k, axis=1)[:, -k:]
+            scores[start:start + SCORING_BLOCK_SIZE] = top_k.mean(axis=1)
+        return scores
+
+
+def make_scorer(name: str = ANOMALY_SCORER) -> AnomalyScorer:
+    """Instancie le scorer configuré."""
+    if name == "isolation_forest":
+        return IsolationForestScorer()
+    if name == "knn":
+        return NearestNeighbourScorer(k=10)
+    if name == "centroids":
+        return NearestNeighbourScorer(k=3, n_centroids=64)
+    raise ValueError(f"Scorer d'anomalies inconnu : {name}")
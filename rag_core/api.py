@@ -0,0 +1,134 @@
+# rag_core/api.py
+"""
+API HTTP asynchrone du pipeline RAG (sans Streamlit).
+
+Le modèle LaBSE, l'index Chroma, le détecteur et le cache sont chargés une fois
+par processus et partagés par toutes les requêtes ; l'encodage et la recherche
+tournent dans un pool de threads, les appels Gemini sont asynchrones. Le service
+est sans état (hors caches) : plusieurs instances peuvent être placées derrière
+un répartiteur de charge, chacune pointant vers le même répertoire vectorstore/.
+
+Endpoints :
+- POST /query  {"query": "...", "k": 3, "locale": true} -> PipelineResult
+- GET  /health vivacité du processus
+- GET  /ready  200 quand le modèle, l'index et le client Gemini sont prêts, 503 sinon
+- GET  /metrics histogrammes et compteurs (format Prometheus, ou JSON avec ?format=json)
+
+Usage : python -m rag_core.api [--host 0.0.0.0] [--port 8000] [--workers 1]
+"""
+
+import argparse
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+
+from rag_core import llm_utils, metrics, resources
+from rag_core.embeddings import get_embedding_service
+from rag_core.pipeline import RAGPipeline, get_cpu_executor
+
+logger = logging.getLogger("rag_core.api")
+
+# État du processus : client Gemini et erreur éventuelle du préchargement
+_state = {"client": None, "warmup_error": None, "warmup_done": False}
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    k: int = Field(3, ge=1, le=20)
+    # None : réglage du serveur (nl_processor.LOCAL_NORMALIZATION_ENABLED)
+    locale: bool | None = None
+
+
+def _warm_up():
+    """Charge le client Gemini, le modèle d'embedding, l'index et le détecteur."""
+    try:
+        _state["client"] = llm_utils.get_gemini_client()
+        get_embedding_service().load()
+        if resources.get_shared_resources() is None:
+            raise RuntimeError("Base vectorielle introuvable : lancez d'abord la préparation de l'index.")
+    except Exception as e:
+        _state["warmup_error"] = str(e)
+        logger.error("Préchargement impossible : %s", e)
+    finally:
+        _state["warmup_done"] = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_dotenv()
+    # Préchargement en arrière-plan : /health répond immédiatement, /ready passe à 200 une fois prêt
+    warmup = asyncio.get_running_loop().run_in_executor(get_cpu_executor(), _warm_up)
+    yield
+    await warmup
+
+
+app = FastAPI(title="Agent Commercial de Voyage IA - RAG", lifespan=lifespan)
+
+
+def _readiness() -> tuple[bool, dict]:
+    details = {
+        "gemini_client": _state["client"] is not None,
+        "embedding_model": get_embedding_service().is_loaded,
+        "index_loaded": resources.is_current(),
+        "warmup_done": _state["warmup_done"],
+        "warmup_error": _state["warmup_error"],
+    }
+    ready = details["gemini_client"] and details["embedding_model"] and details["index_loaded"]
+    return ready, details
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    is_ready, details = _readiness()
+    return JSONResponse({"ready": is_ready, **details}, status_code=200 if is_ready else 503)
+
+
+@app.get("/metrics")
+async def metrics_endpoint(format: str = "prometheus"):
+    if format == "json":
+        return metrics.REGISTRY.to_dict()
+    return PlainTextResponse(metrics.REGISTRY.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    if _state["client"] is None:
+        raise HTTPException(status_code=503, detail=_state["warmup_error"] or "Service en cours de démarrage.")
+
+    # Rechargement (dans le pool) si l'index sur disque a changé depuis le dernier appel
+    loop = asyncio.get_running_loop()
+    shared = (resources.get_shared_resources() if resources.is_current()
+              else await loop.run_in_executor(get_cpu_executor(), resources.get_shared_resources))
+    if shared is None:
+        raise HTTPException(status_code=503, detail="Base vectorielle non chargée.")
+
+    pipeline = RAGPipeline(shared, _state["client"], k=request.k, locale=request.locale)
+    result = await pipeline.arun(request.query)
+    return result.to_dict()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Processus serveurs (chacun charge son modèle)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    uvicorn.run("rag_core.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
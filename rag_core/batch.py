@@ -0,0 +1,232 @@
+# rag_core/batch.py
+"""
+Mode batch (sans interface) : répond à un fichier JSONL de questions.
+
+Chaque ligne est un objet JSON contenant la question sous l'une des clés
+`query`, `question`, `requete`, `text` ou `body`, et optionnellement un
+identifiant (`id` ou `request_id`). Le pipeline est exécuté par étapes :
+1. normalisation (locale ou Gemini, appels concurrents bornés) ;
+2. vectorisation de toutes les requêtes en un seul appel par lots ;
+3. score d'anomalie de toutes les requêtes en un seul produit matriciel ;
+4. recherche (ou statistiques du dataset pour les questions analytiques) +
+   génération Gemini (concurrence bornée), chaque résultat étant écrit en
+   JSONL dès qu'il est prêt.
+
+Usage : python -m rag_core.batch questions.jsonl [-o reponses.jsonl] [--concurrency 8]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, TextIO
+
+import numpy as np
+from dotenv import load_dotenv
+
+from rag_core import context_packer, db_manager, llm_utils, metrics, resources
+from rag_core.embeddings import get_embedding_service
+from rag_core.query_cache import CachedAnswer, QueryCache
+
+QUERY_KEYS = ("query", "question", "requete", "text", "body")
+ID_KEYS = ("id", "request_id")
+# Appels Gemini simultanés au maximum
+BATCH_CONCURRENCY = 8
+
+logger = logging.getLogger("rag_core.batch")
+
+
+@dataclass
+class BatchQuery:
+    """Une question du fichier d'entrée."""
+    id: str
+    requete: str
+
+
+def read_queries(lines: Iterable[str]) -> List[BatchQuery]:
+    """Lit les questions d'un flux JSONL (les lignes vides ou sans question sont ignorées)."""
+    queries = []
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.warning("Ligne %d ignorée (JSON invalide) : %s", line_number, e)
+            continue
+        requete = next((str(record[key]) for key in QUERY_KEYS if record.get(key)), None)
+        if requete is None:
+            logger.warning("Ligne %d ignorée : aucune question (%s).", line_number, ", ".join(QUERY_KEYS))
+            continue
+        query_id = next((str(record[key]) for key in ID_KEYS if record.get(key) is not None), str(line_number))
+        queries.append(BatchQuery(id=query_id, requete=requete))
+    return queries
+
+
+def _write_result(output: TextIO, result: dict):
+    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    output.flush()
+
+
+async def run_batch(queries: List[BatchQuery], output: TextIO,
+                    shared: resources.SharedResources, client,
+                    concurrency: int = BATCH_CONCURRENCY, k: int = 3,
+                    cache: QueryCache | None = None) -> dict:
+    """
+    Exécute le pipeline RAG sur toutes les questions et écrit un résultat JSONL par
+    question, dans l'ordre d'achèvement. Si `cache` est fourni, les réponses y sont
+    enregistrées ; c'est un cache en mémoire, utile seulement à un appelant du même
+    processus (la commande en ligne ne le transmet pas).
+    Retourne les statistiques du lot (dont le débit en requêtes/s).
+    """
+    debut = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"queries": len(queries), "answered": 0, "anomalies": 0, "no_context": 0, "errors": 0}
+
+    # 1. Normalisation (les requêtes propres ne quittent pas le processus)
+    async def normaliser(query: BatchQuery):
+        async with semaphore:
+            return await llm_utils.normaliser_requete_async(client, query.requete)
+
+    normalisations = await asyncio.gather(*(normaliser(q) for q in queries))
+
+    valides = []
+    for query, (requete_normalisee, source) in zip(queries, normalisations):
+        if requete_normalisee:
+            valides.append((query, requete_normalisee, source))
+        else:
+            stats["errors"] += 1
+            _write_result(output, {"id": query.id, "query": query.requete, "error": "normalisation"})
+
+    # 2. Vectorisation de toutes les requêtes normalisées en un seul appel
+    if not valides:
+        return _finaliser(stats, debut)
+    with metrics.timed("batch_embedding"):
+        # encode (un lot, thread appelant) : le pool multi-processus sert à l'indexation
+        vectors = await asyncio.to_thread(get_embedding_service().encode, [requete for _, requete, _ in valides])
+
+    # 3. Scores d'anomalie en un seul appel matriciel
+    with metrics.timed("batch_anomalie"):
+        scores = shared.detector.score_vectors(vectors)
+    threshold = shared.detector.scorer.threshold
+
+    # 4. Recherche et génération, concurrentes et bornées
+    async def repondre(query: BatchQuery, requete_normalisee: str, source: str,
+                       vector: np.ndarray, score: float) -> dict:
+        result = {
+            "id": query.id,
+            "query": query.requete,
+            "normalized_query": requete_normalisee,
+            "normalization": source,
+            "anomaly_score": round(float(score), 4),
+            "is_anomaly": bool(score < threshold),
+        }
+        if result["is_anomaly"]:
+            return result
+
+        # Question analytique : statistiques exactes du dataset, sans recherche
+        agregat = await asyncio.to_thread(db_manager.answer_aggregate_question, requete_normalisee)
+        if agregat is not None:
+            result["intent"] = "agregat"
+            result["filters"] = agregat.filters
+            contexte = agregat.facts
+        else:
+            # Chroma est interrogé hors de la boucle asynchrone
+            recherche = await asyncio.to_thread(
+                db_manager.search_db, requete_normalisee, shared.vectorstore,
+                context_packer.candidate_count(k), query_vector=vector
+            )
+            result["filters"] = recherche.filters
+            result["hits"] = [
+                {"trip_id": doc.metadata.get("trip_id"), "score": round(float(similarite), 4)}
+                for doc, similarite in recherche.hits
+            ]
+            if not recherche:
+                return result
+            contexte = recherche.context
+
+        usage = llm_utils.UsageGeneration()
+        async with semaphore:
+            reponse = await llm_utils.generer_reponse_rag_async(client, requete_normalisee, contexte, usage=usage)
+        result["answer"] = reponse
+        result["tokens"] = {
+            "prompt_estime": llm_utils.estimer_tokens_prompt(requete_normalisee, contexte),
+            "prompt": usage.tokens_prompt,
+            "reponse": usage.tokens_reponse,
+        }
+        if cache is not None and reponse != llm_utils.MESSAGE_ERREUR_GENERATION:
+            scope = await asyncio.to_thread(db_manager.query_scope, requete_normalisee, shared.vectorstore, k)
+            cache.put(query.requete, vector, CachedAnswer(requete_normalisee, contexte, reponse), scope=scope)
+        return result
+
+    tasks = [
+        repondre(query, requete_normalisee, source, vector, score)
+        for (query, requete_normalisee, source), vector, score in zip(valides, vectors, scores)
+    ]
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        if result["is_anomaly"]:
+            stats["anomalies"] += 1
+        elif "answer" not in result:
+            # Aucun trajet trouvé : pas de génération, ce n'est pas une erreur
+            stats["no_context"] += 1
+        elif result["answer"] in (None, llm_utils.MESSAGE_ERREUR_GENERATION):
+            stats["errors"] += 1
+        else:
+            stats["answered"] += 1
+        _write_result(output, result)
+
+    return _finaliser(stats, debut)
+
+
+def _finaliser(stats: dict, debut: float) -> dict:
+    stats["elapsed_s"] = round(time.perf_counter() - debut, 3)
+    stats["queries_per_s"] = round(stats["queries"] / stats["elapsed_s"], 2) if stats["elapsed_s"] else 0.0
+    return stats
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Fichier JSONL des questions ('-' pour l'entrée standard)")
+    parser.add_argument("-o", "--output", default="-", help="Fichier JSONL des résultats ('-' pour la sortie standard)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Appels Gemini simultanés")
+    parser.add_argument("-k", type=int, default=3, help="Nombre de trajets récupérés par question")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s", stream=sys.stderr)
+
+    if args.input == "-":
+        queries = read_queries(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            queries = read_queries(f)
+
+    shared = resources.get_shared_resources()
+    if shared is None:
+        raise SystemExit("Base vectorielle introuvable : lancez d'abord la préparation de l'index.")
+    client = llm_utils.get_gemini_client()
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = asyncio.run(run_batch(
+            queries, output, shared, client, concurrency=args.concurrency, k=args.k
+        ))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    logger.info(
+        "%d requêtes en %.2f s (%.2f requêtes/s) : %d réponses, %d hors sujet, %d sans contexte, "
+        "%d erreurs, taux de normalisation locale %.0f%%",
+        stats["queries"], stats["elapsed_s"], stats["queries_per_s"], stats["answered"],
+        stats["anomalies"], stats["no_context"], stats["errors"], llm_utils.taux_contournement() * 100
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# rag_core/context_packer.py
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+
+# Contexte compact (tableau dédupliqué sous budget de tokens) et instruction système courte ;
+# 0 pour revenir au contexte « [i] résumé » complet et à l'instruction d'origine.
+COMPACT_CONTEXT_ENABLED = os.getenv("COMPACT_CONTEXT", "1") == "1"
+# Budget (tokens estimés) du contexte de génération, en-tête du tableau compris
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "160"))
+# Voyages candidats demandés à la recherche ; le budget décide combien sont gardés
+CONTEXT_MAX_HITS = int(os.getenv("CONTEXT_MAX_HITS", "6"))
+# Estimation des tokens : ~4 caractères par token, les chiffres étant comptés un par un
+CHARS_PER_TOKEN = 4
+
+# Résumé construit par db_manager.clean_and_combine_data
+SUMMARY_PATTERN = re.compile(
+    r"Voyage ID (?P<id>[^.]*)\. Destination: (?P<destination>.*?)\. "
+    r"Durée: (?P<jours>[^ ]*) jours\. "
+    r"Hébergement: (?P<hebergement>.*?) \(Coût: (?P<cout_hebergement>[^)]*)\)\. "
+    r"Transport: (?P<transport>.*?) \(Coût: (?P<cout_transport>[^)]*)\)\. "
+    r"Voyageur: (?P<voyageur>.*) \((?P<age>[^)]*) ans\)\.$"
+)
+# Colonnes du tableau (nom du groupe de SUMMARY_PATTERN -> en-tête)
+COLUMNS = {
+    "id": "id",
+    "destination": "destination",
+    "jours": "jours",
+    "hebergement": "hébergement",
+    "cout_hebergement": "coût héb.",
+    "transport": "transport",
+    "cout_transport": "coût transp.",
+    "voyageur": "voyageur",
+    "age": "âge",
+}
+SEPARATOR = "|"
+
+
+def estimate_tokens(text: str) -> int:
+    """Nombre de tokens estimé d'un texte, sans appel réseau."""
+    digits = sum(c.isdigit() for c in text)
+    return digits + math.ceil((len(text) - digits) / CHARS_PER_TOKEN)
+
+
+def candidate_count(k: int) -> int:
+    """Nombre de voyages à demander à la recherche pour `k` voyages souhaités (le budget tranche)."""
+    return max(k, CONTEXT_MAX_HITS) if COMPACT_CONTEXT_ENABLED else k
+
+
+def legacy_context(hits: list) -> str:
+    """Contexte d'origine : un résumé complet numéroté par voyage."""
+    return "\n".join(f"[{i}] {doc.page_content}" for i, (doc, _) in enumerate(hits, start=1))
+
+
+@dataclass
+class PackedContext:
+    """Contexte compact et voyages effectivement transmis au modèle."""
+    text: str
+    hits: list = field(default_factory=list)    # [(Document, score)] gardés, dans l'ordre du classement
+    tokens: int = 0                             # estimation (estimate_tokens)
+    duplicates: int = 0                         # voyages fusionnés avec un voyage identique
+    over_budget: int = 0                        # voyages écartés faute de budget
+
+
+def pack_context(hits: list, budget: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """
+    Rend les voyages trouvés sous forme de tableau (un en-tête, une ligne par voyage).
+    Les voyages identiques à l'identifiant près sont fusionnés (« 12/87 »), les
+    colonnes communes à toutes les lignes sont sorties du tableau, et les voyages
+    sont ajoutés dans l'ordre du classement tant que le budget de tokens le permet
+    (au moins un). Les documents au format inconnu sont repris tels quels.
+    """
+    header = SEPARATOR.join(COLUMNS.values())
+    used = estimate_tokens(header) + 1
+    rows, others, kept, seen = {}, [], [], set()
+    duplicates = over_budget = 0
+
+    for doc, score in hits:
+        content = doc.page_content
+        match = SUMMARY_PATTERN.match(content)
+        if match is None:
+            if content in seen:
+                duplicates += 1
+                continue
+            cost = estimate_tokens(content) + 2
+        else:
+            values = match.groupdict()
+            key = tuple(value for name, value in values.items() if name != "id")
+            if key in rows:
+                if values["id"] not in rows[key]["id"].split("/"):
+                    rows[key]["id"] += "/" + values["id"]
+                duplicates += 1
+                continue
+            cost = estimate_tokens(SEPARATOR.join(values.values())) + 1
+        if kept and used + cost > budget:
+            over_budget += 1
+            continue
+        used += cost
+        kept.append((doc, score))
+        if match is None:
+            seen.add(content)
+            others.append(content)
+        else:
+            rows[key] = values
+
+    lines = []
+    if rows:
+        columns = list(COLUMNS)
+        # Valeurs partagées par toutes les lignes : écrites une seule fois au-dessus du tableau
+        if len(rows) > 1:
+            common = [name for name in columns if name != "id"
+                      and len({row[name] for row in rows.values()}) == 1]
+            first = next(iter(rows.values()))
+            lines.extend(f"{COLUMNS[name]}: {first[name]}" for name in common)
+            columns = [name for name in columns if name not in common]
+        lines.append(SEPARATOR.join(COLUMNS[name] for name in columns))
+        lines.extend(SEPARATOR.join(row[name] for name in columns) for row in rows.values())
+    lines.extend(f"- {content}" for content in others)
+
+    text = "\n".join(lines)
+    return PackedContext(text=text, hits=kept, tokens=estimate_tokens(text),
+                         duplicates=duplicates, over_budget=over_budget)
@@ -1,21 +1,67 @@
 # rag_core/db_manager.py (Version ultra-compacte)
 
+import hashlib
+import json
 import os
-from typing import List
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, List
+import numpy as np
 import pandas as pd
-import streamlit as st 
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceBgeEmbeddings 
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 
+from rag_core import context_packer, embedding_snapshot, metrics, notifications
+from rag_core.lexical_index import TRIP_ID_PATTERN, LexicalIndex, build_index
+from rag_core.embeddings import EMBEDDING_MODEL_NAME, get_embedding_service
+from rag_core.nl_processor import (
+    FILTER_FIELDS, build_chroma_where, extract_aggregate_intent, extract_metadata_filters, normalize_text
+)
+from rag_core.travel_stats import AggregateAnswer, TravelStats, TravelTableBuilder
+
 # --- Variables Globales ---
 DATA_PATH = "data/"
 VECTOR_STORE_PATH = "vectorstore/chroma_db"
 CSV_FILE_NAME = "Travel details dataset.csv" 
 CSV_FILE_PATH = os.path.join(DATA_PATH, CSV_FILE_NAME)
-EMBEDDING_MODEL_NAME = "sentence-transformers/LaBSE" 
+# Marqueur de version de l'index, réécrit à chaque (ré)indexation
+INDEX_VERSION_FILE = os.path.join(VECTOR_STORE_PATH, "index_version.txt")
+# Colonnes du CSV conservées comme métadonnées (filtrables dans Chroma)
+METADATA_COLUMNS = {
+    "Trip ID": "trip_id",
+    "Destination": "destination",
+    "Accommodation type": "accommodation_type",
+    "Transportation type": "transportation_type",
+    "Traveler nationality": "traveler_nationality",
+}
+# Nombre de documents vectorisés et écrits par appel à Chroma
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "512"))
+# Lots vectorisés en attente d'écriture dans Chroma (producteur/consommateur)
+INDEX_WRITE_QUEUE_SIZE = 2
+# Ingestion en flux : nombre de lignes CSV lues à la fois, et point de reprise après un crash
+INGEST_CHUNK_SIZE = 2000
+INGEST_CHECKPOINT_FILE = os.path.join(os.path.dirname(VECTOR_STORE_PATH), "ingest_checkpoint.json")
+# Instantané compact (float16 / int8) des vecteurs, réécrit à chaque nouvelle version de l'index
+EMBEDDING_SNAPSHOT_DIR = os.path.join(os.path.dirname(VECTOR_STORE_PATH), "embedding_snapshot")
+# Index lexical BM25 (résumés + métadonnées), reconstruit à chaque nouvelle version de l'index
+LEXICAL_INDEX_DIR = os.path.join(os.path.dirname(VECTOR_STORE_PATH), "lexical_index")
+# Recherche hybride : fusion RRF des classements dense (LaBSE) et BM25
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH", "1") == "1"
+# Réponse directe aux références exactes (Voyage ID, nom du voyageur), sans recherche dense
+LEXICAL_ROUTER_ENABLED = os.getenv("LEXICAL_ROUTER", "1") == "1"
+# Candidats de chaque classement avant fusion, et constante de la fusion (1 / (RRF_K + rang))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = 60
+# Store en colonnes du dataset nettoyé et agrégats (questions analytiques), réécrit à chaque version
+TRAVEL_STATS_DIR = os.path.join(os.path.dirname(VECTOR_STORE_PATH), "travel_stats")
+# Colonnes des morceaux en cours d'ingestion, écrites sur disque jusqu'à la publication du store
+TRAVEL_STATS_SPILL_DIR = os.path.join(os.path.dirname(VECTOR_STORE_PATH), "travel_stats_parts")
+# Réponse aux questions analytiques (combien, moyenne, min, max) par les agrégats, sans recherche
+AGGREGATE_INTENTS_ENABLED = os.getenv("AGGREGATE_INTENTS", "1") == "1"
 
 # --- Fonctions de Nettoyage ---
 
@@ -26,85 +72,198 @@ def int_to_str(value, default="Inconnu"):
     except (ValueError, TypeError):
         return default
 
+def int_column_to_str(series: pd.Series, default: str = "Inconnu") -> pd.Series:
+    """Version vectorisée de int_to_str sur une colonne entière."""
+    numbers = pd.to_numeric(series, errors='coerce')
+    valid = np.isfinite(numbers)
+    result = pd.Series(default, index=series.index, dtype=object)
+    result[valid] = np.trunc(numbers[valid]).astype(np.int64).astype(str)
+    return result
+
 def clean_and_combine_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Nettoie le DF et crée la colonne 'trip_summary' pour le RAG."""
+    """Nettoie le DF et crée la colonne 'trip_summary' pour le RAG (opérations par colonne)."""
     df = df.fillna('') 
     
     # Nettoyage des coûts
     for col in ['Accommodation cost', 'Transportation cost']:
-        df[col] = df[col].astype(str).str.replace(r'[$,USD]', '', regex=True).str.strip()
-        df[col] = df[col].apply(lambda x: 'Non spécifié' if x == '' or x == '0' else x)
+        cost = df[col].astype(str).str.replace(r'[$,USD]', '', regex=True).str.strip()
+        df[col] = cost.mask(cost.isin(['', '0']), 'Non spécifié')
     
     # Création du résumé textuel vectorisable
-    df['trip_summary'] = df.apply(
-        lambda row: (
-            f"Voyage ID {int_to_str(row['Trip ID'])}. Destination: {row['Destination']}. "
-            f"Durée: {int_to_str(row['Duration (days)'], 'Inconnue')} jours. "
-            f"Hébergement: {row['Accommodation type']} (Coût: {row['Accommodation cost']}). "
-            f"Transport: {row['Transportation type']} (Coût: {row['Transportation cost']}). "
-            f"Voyageur: {row['Traveler name']} ({int_to_str(row['Traveler age'], 'Inconnu')} ans)."
-        ), 
-        axis=1
+    text = {col: df[col].astype(str) for col in [
+        'Destination', 'Accommodation type', 'Accommodation cost',
+        'Transportation type', 'Transportation cost', 'Traveler name'
+    ]}
+    df['trip_summary'] = (
+        "Voyage ID " + int_column_to_str(df['Trip ID']) + ". Destination: " + text['Destination'] + ". "
+        + "Durée: " + int_column_to_str(df['Duration (days)'], 'Inconnue') + " jours. "
+        + "Hébergement: " + text['Accommodation type'] + " (Coût: " + text['Accommodation cost'] + "). "
+        + "Transport: " + text['Transportation type'] + " (Coût: " + text['Transportation cost'] + "). "
+        + "Voyageur: " + text['Traveler name'] + " (" + int_column_to_str(df['Traveler age'], 'Inconnu') + " ans)."
     )
     
     # Filtration des lignes vides
     return df[df['Destination'] != ''].reset_index(drop=True)
 
+def build_documents(df_processed: pd.DataFrame) -> List[Document]:
+    """Construit en bloc les LangChain Documents (et leurs métadonnées) d'un DF nettoyé."""
+    metadata_df = df_processed[list(METADATA_COLUMNS)].rename(columns=METADATA_COLUMNS)
+    # Trip ID en entier (ou '') quel que soit le type inféré par pandas pour ce morceau de CSV
+    metadata_df['trip_id'] = [
+        int(trip_id) if trip_id else '' for trip_id in int_column_to_str(metadata_df['trip_id'], default='')
+    ]
+    summaries = df_processed['trip_summary'].tolist()
+
+    # Entrée du hash construite par colonne (même format que row_content_hash)
+    hash_input = df_processed['trip_summary'].astype(str)
+    for key in sorted(metadata_df.columns):
+        hash_input = hash_input + f"\0{key}=" + metadata_df[key].astype(str)
+    hashes = [hashlib.sha1(text.encode("utf-8")).hexdigest()[:16] for text in hash_input.tolist()]
+
+    documents = []
+    for summary, metadata, content_hash in zip(summaries, metadata_df.to_dict('records'), hashes):
+        metadata["content_hash"] = content_hash
+        # Champs déjà typés : on évite la validation pydantic ligne par ligne
+        documents.append(Document.model_construct(page_content=summary, metadata=metadata))
+    return documents
+
 def load_csv_document() -> List[Document]:
     """Charge le CSV et le convertit en LangChain Documents."""
     if not os.path.exists(CSV_FILE_PATH):
-        st.error(f" ERREUR : Fichier CSV non trouvé : {CSV_FILE_PATH}")
+        notifications.error(f" ERREUR : Fichier CSV non trouvé : {CSV_FILE_PATH}")
         return []
 
     try:
         df = pd.read_csv(CSV_FILE_PATH)
-        df_processed = clean_and_combine_data(df)
-        
-        documents = []
-        for _, row in df_processed.iterrows():
-            metadata = {
-                "trip_id": row['Trip ID'],
-                "destination": row['Destination'],
-                "accommodation_type": row['Accommodation type'],
-                "transportation_type": row['Transportation type'],
-                "traveler_nationality": row['Traveler nationality']
-            }
-            documents.append(Document(page_content=row['trip_summary'], metadata=metadata))
-            
-        return documents
+        return build_documents(clean_and_combine_data(df))
     
     except Exception as e:
-        st.error(f"Erreur CSV : {e}")
+        notifications.error(f"Erreur CSV : {e}")
         return []
 
+# --- Identifiants Stables ---
+
+def row_content_hash(page_content: str, metadata: dict) -> str:
+    """Hash du contenu d'une ligne (résumé + métadonnées) pour détecter les modifications."""
+    digest = hashlib.sha1(page_content.encode("utf-8"))
+    for key in sorted(metadata):
+        if key != "content_hash":
+            digest.update(f"\0{key}={metadata[key]}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def assign_document_ids(documents: List[Document], seen: set | None = None) -> List[str]:
+    """
+    Attribue un identifiant stable à chaque document à partir du 'Trip ID'.
+    `seen` (identifiants déjà attribués) permet de traiter le CSV morceau par morceau.
+    """
+    ids = []
+    seen = set() if seen is None else seen
+    for doc in documents:
+        trip_id = int_to_str(doc.metadata.get("trip_id"), default="")
+        doc_id = f"trip-{trip_id}" if trip_id else f"row-{doc.metadata['content_hash']}"
+        # Trip ID dupliqué dans le CSV : on distingue les lignes par leur contenu
+        if doc_id in seen:
+            doc_id = f"{doc_id}-{doc.metadata['content_hash']}"
+        seen.add(doc_id)
+        ids.append(doc_id)
+    return ids
+
 # --- Fonctions de Vectorisation ---
-from langchain_community.embeddings import HuggingFaceEmbeddings
 
 def get_multilingual_embeddings():
-    """Charge correctement LaBSE sans erreur meta-tensor."""
-    return HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
-        model_kwargs={
-            "device": "cpu",             # Évite le .to(meta)
-            "trust_remote_code": True    # Au cas où le modèle en a besoin
-        },
-        encode_kwargs={"normalize_embeddings": True}
-    )
+    """Retourne le service LaBSE partagé du processus (chargé une seule fois)."""
+    return get_embedding_service()
+
+class _ChromaWriter:
+    """
+    Consommateur : écrit les lots vectorisés dans Chroma depuis un thread dédié,
+    pendant que le thread appelant (producteur) vectorise le lot suivant.
+    """
+
+    def __init__(self, collection, max_pending: int = INDEX_WRITE_QUEUE_SIZE):
+        self.collection = collection
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="chroma-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while (batch := self._queue.get()) is not None:
+            if self.error is None:
+                try:
+                    self.collection.upsert(**batch)
+                except Exception as e:
+                    self.error = e
+
+    def put(self, **batch):
+        if self.error is not None:
+            raise self.error
+        self._queue.put(batch)
+
+    def close(self):
+        """Attend la fin des écritures en attente et propage une éventuelle erreur."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+def _upsert_documents(collection, ids: List[str], documents: List[Document],
+                      embeddings=None, batch_size: int = INDEX_BATCH_SIZE):
+    """Vectorise et écrit (upsert) les documents par lots, l'écriture du lot N recouvrant l'encodage du lot N+1."""
+    if not documents:
+        return
+    embeddings = embeddings or get_multilingual_embeddings()
+    writer = _ChromaWriter(collection)
+    try:
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            texts = [doc.page_content for doc in batch]
+            vectors = embeddings.encode_documents(texts)
+            writer.put(
+                ids=ids[start:start + batch_size],
+                embeddings=vectors.tolist(),
+                documents=texts,
+                metadatas=[doc.metadata for doc in batch]
+            )
+    finally:
+        writer.close()
 
 def create_vector_store(documents: List[Document]):
-    """Crée et indexe la base vectorielle ChromaDB."""
+    """Crée (en remplaçant toute base existante) et indexe la base vectorielle ChromaDB."""
     # Pas besoin de splitter car chaque ligne est déjà un chunk de taille raisonnable
-    embeddings = get_multilingual_embeddings()
-    
-    db = Chroma.from_documents(
-        documents=documents, 
-        embedding=embeddings, 
-        persist_directory=VECTOR_STORE_PATH
+    existing = load_existing_vector_store()
+    if existing is not None:
+        # Reconstruction complète : on repart d'une collection vide pour éviter les doublons
+        existing.delete_collection()
+
+    db = Chroma(
+        persist_directory=VECTOR_STORE_PATH,
+        embedding_function=get_multilingual_embeddings()
     )
+    _upsert_documents(db._collection, assign_document_ids(documents), documents)
     db.persist()
-    st.success(f" Base vectorielle ChromaDB créée avec {db._collection.count()} vecteurs.")
+    publish_index_version(db._collection)
+    notifications.success(f" Base vectorielle ChromaDB créée avec {db._collection.count()} vecteurs.")
     return db
 
+def _apply_delta(collection, ids: List[str], documents: List[Document],
+                 existing_hashes: dict, stats: dict) -> int:
+    """Upsert des seuls documents nouveaux ou modifiés ; met à jour `stats` et retourne leur nombre."""
+    changed_ids, changed_docs = [], []
+    for doc_id, doc in zip(ids, documents):
+        if doc_id not in existing_hashes:
+            stats["added"] += 1
+        elif existing_hashes[doc_id] != doc.metadata["content_hash"]:
+            stats["updated"] += 1
+        else:
+            stats["skipped"] += 1
+            continue
+        changed_ids.append(doc_id)
+        changed_docs.append(doc)
+
+    _upsert_documents(collection, changed_ids, changed_docs)
+    return len(changed_ids)
+
 def load_existing_vector_store():
     """Charge une instance ChromaDB existante."""
     if os.path.exists(VECTOR_STORE_PATH):
@@ -114,23 +273,487 @@ def load_existing_vector_store():
         )
     return None
 
+# --- Recherche (Retrieval) ---
+
+@dataclass
+class SearchResult:
+    """Résultat de search_db : contexte formaté pour le LLM + documents trouvés et leurs scores."""
+    context: str
+    hits: List[tuple] = field(default_factory=list)   # [(Document, similarité cosinus)] transmis au LLM
+    filters: dict = field(default_factory=dict)       # filtres de métadonnées appliqués
+    context_tokens: int = 0                           # tokens estimés du contexte
+
+    def __bool__(self) -> bool:
+        return bool(self.hits)
+
+# Valeurs distinctes des métadonnées filtrables, par base et par version de l'index
+_metadata_values_cache = {}
+
+def get_metadata_values(vectorstore: Chroma) -> dict:
+    """Retourne {champ: [valeurs distinctes]} des métadonnées filtrables (calculé une fois par version)."""
+    cache_key = (id(vectorstore._collection), get_index_version())
+    if cache_key not in _metadata_values_cache:
+        values = {name: set() for name in FILTER_FIELDS}
+        collection, offset = vectorstore._collection, 0
+        while True:
+            page = collection.get(include=['metadatas'], limit=INGEST_CHUNK_SIZE, offset=offset)['metadatas']
+            if not page:
+                break
+            for metadata in page:
+                for name in values:
+                    value = (metadata or {}).get(name)
+                    if isinstance(value, str) and value:
+                        values[name].add(value)
+            offset += len(page)
+        _metadata_values_cache.clear()
+        _metadata_values_cache[cache_key] = {name: sorted(v) for name, v in values.items()}
+    return _metadata_values_cache[cache_key]
+
+def format_context(hits: List[tuple]) -> str:
+    """Met en forme les documents trouvés pour le prompt de génération (format complet d'origine)."""
+    return context_packer.legacy_context(hits)
+
+def _search_result(hits: List[tuple], filters: dict) -> SearchResult:
+    """
+    Contexte de génération des documents trouvés : tableau compact dédupliqué, borné
+    par le budget de tokens (context_packer), ou format complet si COMPACT_CONTEXT=0.
+    """
+    if not context_packer.COMPACT_CONTEXT_ENABLED:
+        context = format_context(hits)
+        return SearchResult(context=context, hits=hits, filters=filters,
+                            context_tokens=context_packer.estimate_tokens(context))
+    packed = context_packer.pack_context(hits)
+    return SearchResult(context=packed.text, hits=packed.hits, filters=filters, context_tokens=packed.tokens)
+
+def _similarity_search(vectorstore: Chroma, query_vector: list, k: int, where: dict | None) -> list:
+    """
+    Requête de similarité Chroma, chronométrée (rag_chroma_query_seconds).
+    Retourne [(identifiant, Document, similarité cosinus)] (identifiants nécessaires à la fusion).
+    """
+    start = time.perf_counter()
+    results = vectorstore._collection.query(
+        query_embeddings=[query_vector], n_results=k, where=where,
+        include=['documents', 'metadatas', 'distances']
+    )
+    metrics.observe("chroma_query_seconds", time.perf_counter() - start,
+                    filtered=str(where is not None).lower())
+    # Distance L2² entre vecteurs normalisés -> similarité cosinus
+    return [
+        (doc_id, Document(page_content=content, metadata=metadata or {}), 1.0 - distance / 2.0)
+        for doc_id, content, metadata, distance in zip(
+            results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+        )
+    ]
+
+def _get_documents(vectorstore: Chroma, ids: List[str], query_vector: list | None = None) -> list:
+    """
+    Documents Chroma par identifiant, dans l'ordre de `ids` : [(identifiant, Document, score)].
+    Le score est la similarité cosinus à `query_vector`, ou 1.0 (référence exacte) sans vecteur.
+    """
+    include = ['documents', 'metadatas'] + (['embeddings'] if query_vector is not None else [])
+    results = vectorstore._collection.get(ids=ids, include=include)
+    rows = {doc_id: i for i, doc_id in enumerate(results["ids"])}
+    found = []
+    for doc_id in ids:
+        if doc_id not in rows:
+            continue
+        i = rows[doc_id]
+        score = float(np.dot(results["embeddings"][i], query_vector)) if query_vector is not None else 1.0
+        document = Document(page_content=results["documents"][i], metadata=results["metadatas"][i] or {})
+        found.append((doc_id, document, score))
+    return found
+
+def _hybrid_hits(vectorstore: Chroma, lexical: LexicalIndex, requete: str, query_vector: list,
+                 dense: list, filters: dict, k: int) -> List[tuple]:
+    """Fusion RRF du classement dense et du classement BM25 ; scores = similarité cosinus à la requête."""
+    start = time.perf_counter()
+    rows, _ = lexical.search(requete, HYBRID_CANDIDATES, filters)
+    metrics.observe("lexical_query_seconds", time.perf_counter() - start)
+
+    fused = {}
+    for ranking in ([doc_id for doc_id, _, _ in dense], lexical.ids_for(rows)):
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank)
+    top = sorted(fused, key=fused.get, reverse=True)[:k]
+
+    # Documents trouvés seulement par BM25 : lus dans Chroma avec leur vecteur
+    found = {doc_id: (doc, score) for doc_id, doc, score in dense}
+    missing = [doc_id for doc_id in top if doc_id not in found]
+    if missing:
+        found.update({doc_id: (doc, score) for doc_id, doc, score in _get_documents(vectorstore, missing, query_vector)})
+    return [found[doc_id] for doc_id in top if doc_id in found]
+
+def search_db(requete: str, vectorstore: Chroma, k: int = 3,
+              filters: dict | None = None, auto_filters: bool = True,
+              query_vector=None) -> SearchResult:
+    """
+    Recherche les k trajets les plus proches de la requête.
+
+    Les filtres de métadonnées (destination, accommodation_type, transportation_type,
+    traveler_nationality) sont poussés dans la clause `where` de Chroma : seule la
+    partie correspondante de la collection est classée. Si `filters` n'est pas fourni
+    et `auto_filters` est actif, ils sont déduits de la requête (ex : 'hôtel à Paris').
+    Sans résultat filtré, la recherche est relancée sur toute la collection.
+    `query_vector` (ex : QueryContext.vector) évite de ré-encoder la requête.
+
+    Avec l'index lexical (HYBRID_SEARCH) : une référence exacte (« Voyage ID 42 »,
+    nom complet d'un voyageur) est servie directement par l'index, sans recherche
+    dense ; sinon les classements dense et BM25 sont fusionnés (Reciprocal Rank Fusion).
+
+    Le contexte est compacté (context_packer) : les doublons sont fusionnés et seuls
+    les trajets tenant dans le budget de tokens sont gardés dans `hits`.
+    """
+    if filters is None and auto_filters:
+        filters = extract_metadata_filters(requete, get_metadata_values(vectorstore))
+    filters = filters or {}
+    lexical = get_lexical_index(vectorstore) if HYBRID_SEARCH_ENABLED else None
+
+    if lexical is not None and LEXICAL_ROUTER_ENABLED:
+        rows = lexical.lookup(requete, filters)
+        if rows is not None:
+            metrics.increment("retrieval_route_total", route="reference")
+            hits = [(doc, score) for _, doc, score in _get_documents(vectorstore, lexical.ids_for(rows[:k]))]
+            return _search_result(hits, filters)
+
+    if query_vector is None:
+        query_vector = get_multilingual_embeddings().encode([requete])[0]
+    query_vector = [float(x) for x in query_vector]
+    n_dense = max(k, HYBRID_CANDIDATES) if lexical is not None else k
+    where = build_chroma_where(filters)
+    dense = _similarity_search(vectorstore, query_vector, n_dense, where)
+    if not dense and where is not None:
+        filters = {}
+        dense = _similarity_search(vectorstore, query_vector, n_dense, None)
+
+    if lexical is None:
+        metrics.increment("retrieval_route_total", route="dense")
+        hits = [(doc, score) for _, doc, score in dense[:k]]
+    else:
+        metrics.increment("retrieval_route_total", route="hybride")
+        hits = _hybrid_hits(vectorstore, lexical, requete, query_vector, dense, filters, k)
+    return _search_result(hits, filters)
+
+def query_scope(requete: str, vectorstore: Chroma, k: int = 3, locale: bool | None = None) -> tuple:
+    """
+    Portée d'une requête pour le cache sémantique (query_cache) : filtres de
+    métadonnées, références exactes (identifiants de voyage, voyageurs nommés),
+    k et mode de normalisation. « hôtel à Paris » et « hôtel à Bali », ou
+    « Voyage ID 12 » et « Voyage ID 21 », sont proches pour LaBSE mais de portées
+    différentes : ils ne partagent pas de réponse.
+    """
+    filters = extract_metadata_filters(requete, get_metadata_values(vectorstore))
+    references = tuple(TRIP_ID_PATTERN.findall(normalize_text(requete)))
+    lexical = get_lexical_index(vectorstore) if HYBRID_SEARCH_ENABLED else None
+    rows = lexical.lookup(requete, filters) if lexical is not None else None
+    if rows is not None:
+        references += tuple(lexical.ids_for(rows))
+    return k, locale, tuple((field, tuple(values)) for field, values in sorted(filters.items())), references
+
+# --- Version de l'Index ---
+
+def mark_index_updated() -> str:
+    """Écrit une nouvelle version de l'index sur disque (invalide les caches des autres sessions)."""
+    version = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(VECTOR_STORE_PATH, exist_ok=True)
+    with open(INDEX_VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(version)
+    return version
+
+def get_index_version() -> str | None:
+    """Retourne la version sur disque de l'index, ou None si la base n'existe pas."""
+    if not os.path.exists(VECTOR_STORE_PATH):
+        return None
+    try:
+        with open(INDEX_VERSION_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        # Base créée avant l'introduction du marqueur : on se rabat sur la date de modification
+        sqlite_path = os.path.join(VECTOR_STORE_PATH, "chroma.sqlite3")
+        path = sqlite_path if os.path.exists(sqlite_path) else VECTOR_STORE_PATH
+        return f"mtime-{os.stat(path).st_mtime_ns}"
+
+# --- Instantané Compact des Vecteurs ---
+
+def write_embedding_snapshot(collection, index_version: str):
+    """Écrit l'instantané projeté en mémoire des vecteurs pour la version `index_version` de l'index."""
+    try:
+        meta = embedding_snapshot.write_snapshot(collection, EMBEDDING_SNAPSHOT_DIR, index_version=index_version)
+    except OSError as e:
+        notifications.warning(f"Impossible d'écrire l'instantané des vecteurs : {e}")
+        return
+    if meta["count"] and meta["min_cosine"] < 0.999:
+        notifications.warning(
+            f"Instantané {meta['dtype']} peu fidèle au float32 (cosinus minimal {meta['min_cosine']:.4f})."
+        )
+
+def publish_index_version(collection, travel_table: TravelTableBuilder | None = None) -> str:
+    """
+    Nouvelle version de l'index, avec ses structures dérivées (instantané des vecteurs,
+    index BM25, store des statistiques). `travel_table` : colonnes déjà accumulées
+    pendant l'ingestion (sinon relues depuis le CSV).
+
+    Les structures dérivées sont reconstruites entièrement, même pour un delta d'une
+    ligne : l'instantané et l'index BM25 relisent la collection par pages (mémoire
+    bornée par une page plus les tableaux produits), en temps proportionnel à la
+    collection. C'est pourquoi l'ingestion ne publie de version que si le delta
+    n'est pas vide.
+    """
+    version = mark_index_updated()
+    write_embedding_snapshot(collection, version)
+    write_lexical_index(collection, version)
+    write_travel_stats(version, travel_table)
+    return version
+
+def open_embedding_snapshot() -> embedding_snapshot.EmbeddingSnapshot | None:
+    """Instantané des vecteurs de la version courante de l'index, ou None s'il est absent ou périmé."""
+    snapshot = embedding_snapshot.EmbeddingSnapshot.open(EMBEDDING_SNAPSHOT_DIR)
+    if snapshot is None or snapshot.index_version != get_index_version():
+        return None
+    return snapshot
+
+# --- Index Lexical BM25 ---
+
+_lexical_index_cache = {}
+_lexical_index_lock = threading.Lock()
+
+def write_lexical_index(collection, index_version: str):
+    """Construit et écrit l'index BM25 de la version `index_version` de l'index."""
+    try:
+        build_index(collection, LEXICAL_INDEX_DIR, index_version=index_version)
+    except OSError as e:
+        notifications.warning(f"Impossible d'écrire l'index lexical : {e}")
+
+def get_lexical_index(vectorstore: Chroma) -> LexicalIndex | None:
+    """
+    Index BM25 de la version courante de l'index (ouvert une fois par version).
+    Absent ou périmé (base construite avant son introduction), il est reconstruit
+    depuis la collection.
+    """
+    version = get_index_version()
+    cache_key = (id(vectorstore._collection), version)
+    if cache_key not in _lexical_index_cache:
+        with _lexical_index_lock:
+            if cache_key not in _lexical_index_cache:
+                lexical = LexicalIndex.open(LEXICAL_INDEX_DIR)
+                if lexical is None or lexical.index_version != version:
+                    write_lexical_index(vectorstore._collection, version)
+                    lexical = LexicalIndex.open(LEXICAL_INDEX_DIR)
+                _lexical_index_cache.clear()
+                _lexical_index_cache[cache_key] = lexical
+    return _lexical_index_cache[cache_key]
+
+# --- Statistiques du Dataset (questions analytiques) ---
+
+_travel_stats_cache = {}
+_travel_stats_lock = threading.Lock()
+
+def write_travel_stats(index_version: str, travel_table: TravelTableBuilder | None = None):
+    """Écrit le store en colonnes et ses agrégats pour la version `index_version` de l'index."""
+    try:
+        if travel_table is None:
+            if not os.path.exists(CSV_FILE_PATH):
+                return
+            travel_table = TravelTableBuilder(spill_dir=TRAVEL_STATS_SPILL_DIR)
+            for chunk in pd.read_csv(CSV_FILE_PATH, chunksize=INGEST_CHUNK_SIZE):
+                travel_table.add(clean_and_combine_data(chunk))
+            travel_table.write(TRAVEL_STATS_DIR, index_version=index_version)
+            travel_table.discard()
+        else:
+            travel_table.write(TRAVEL_STATS_DIR, index_version=index_version)
+    except OSError as e:
+        notifications.warning(f"Impossible d'écrire les statistiques du dataset : {e}")
+
+def get_travel_stats() -> TravelStats | None:
+    """
+    Store des statistiques de la version courante de l'index (ouvert une fois par
+    version). Absent ou périmé, il est reconstruit depuis le CSV.
+    """
+    version = get_index_version()
+    if version is None:
+        return None
+    if version not in _travel_stats_cache:
+        with _travel_stats_lock:
+            if version not in _travel_stats_cache:
+                stats = TravelStats.open(TRAVEL_STATS_DIR)
+                if stats is None or stats.index_version != version:
+                    write_travel_stats(version)
+                    stats = TravelStats.open(TRAVEL_STATS_DIR)
+                _travel_stats_cache.clear()
+                _travel_stats_cache[version] = stats
+    return _travel_stats_cache[version]
+
+def answer_aggregate_question(requete: str) -> AggregateAnswer | None:
+    """
+    Répond à une question analytique (combien, moyenne, minimum, maximum) par les
+    agrégats du store, sans recherche vectorielle. None pour les autres questions.
+    """
+    if not AGGREGATE_INTENTS_ENABLED:
+        return None
+    stats = get_travel_stats()
+    if stats is None:
+        return None
+    intent = extract_aggregate_intent(requete, stats.known_values())
+    if intent is None:
+        return None
+    metrics.increment("aggregate_intents_total", operation=intent.operation)
+    return stats.answer(intent)
+
+# --- Ingestion en Flux (CSV par morceaux) ---
+
+def count_csv_rows(csv_path: str) -> int:
+    """Compte (approximativement) les lignes de données du CSV sans le parser."""
+    newlines = 0
+    with open(csv_path, "rb") as f:
+        while block := f.read(1 << 20):
+            newlines += block.count(b"\n")
+    return max(newlines - 1, 0)
+
+def _csv_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"csv_path": os.path.abspath(csv_path), "csv_size": stat.st_size, "csv_mtime_ns": stat.st_mtime_ns}
+
+def _load_checkpoint(signature: dict, chunk_size: int, incremental: bool) -> dict | None:
+    """Retourne le point de reprise s'il correspond au même CSV et aux mêmes paramètres."""
+    try:
+        with open(INGEST_CHECKPOINT_FILE, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    same_run = (
+        checkpoint.get("signature") == signature
+        and checkpoint.get("chunk_size") == chunk_size
+        and checkpoint.get("incremental") == incremental
+    )
+    return checkpoint if same_run else None
+
+def _save_checkpoint(checkpoint: dict):
+    os.makedirs(os.path.dirname(INGEST_CHECKPOINT_FILE), exist_ok=True)
+    tmp_path = INGEST_CHECKPOINT_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, INGEST_CHECKPOINT_FILE)
+
+def ingest_csv_streaming(csv_path: str = CSV_FILE_PATH,
+                         incremental: bool = True,
+                         chunk_size: int = INGEST_CHUNK_SIZE,
+                         progress_callback: Callable[[int, int], None] | None = None,
+                         resume: bool = True):
+    """
+    Indexe le CSV morceau par morceau avec une mémoire bornée : chaque morceau est
+    nettoyé, seules ses lignes nouvelles ou modifiées sont vectorisées et écrites
+    dans Chroma, puis un point de reprise est sauvegardé. Après un crash, les
+    morceaux déjà traités ne sont ni re-vectorisés ni ré-écrits.
+
+    `progress_callback(lignes_traitées, lignes_totales)` est appelé après chaque morceau.
+    Les colonnes du store des statistiques sont écrites sur disque à chaque morceau.
+    Sans ligne ajoutée, modifiée ni supprimée, la version de l'index et ses structures
+    dérivées (publish_index_version) ne sont pas reconstruites.
+    Retourne la base et le bilan {'added', 'updated', 'skipped', 'deleted'}.
+    """
+    signature = _csv_signature(csv_path)
+    total_rows = count_csv_rows(csv_path)
+    checkpoint = _load_checkpoint(signature, chunk_size, incremental) if resume else None
+
+    if checkpoint is None:
+        # Reconstruction complète : on repart d'une collection vide (une seule fois, pas à la reprise)
+        if not incremental and os.path.exists(VECTOR_STORE_PATH):
+            load_existing_vector_store().delete_collection()
+        checkpoint = {
+            "signature": signature,
+            "chunk_size": chunk_size,
+            "incremental": incremental,
+            "chunks_done": 0,
+            "rows_done": 0,
+            "stats": {"added": 0, "updated": 0, "skipped": 0, "deleted": 0},
+        }
+
+    db = Chroma(
+        persist_directory=VECTOR_STORE_PATH,
+        embedding_function=get_multilingual_embeddings()
+    )
+    collection = db._collection
+    stats = checkpoint["stats"]
+    seen_ids: set = set()
+    changed = stats["added"] + stats["updated"]
+    # Colonnes typées du dataset nettoyé pour le store des statistiques (écrites sur disque par morceau)
+    travel_table = TravelTableBuilder(spill_dir=TRAVEL_STATS_SPILL_DIR)
+
+    for chunk_index, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunk_size)):
+        cleaned = clean_and_combine_data(chunk)
+        travel_table.add(cleaned)
+        documents = build_documents(cleaned)
+        # Les identifiants sont recalculés même pour les morceaux déjà traités (suppressions, doublons)
+        ids = assign_document_ids(documents, seen_ids)
+        if chunk_index < checkpoint["chunks_done"]:
+            continue
+
+        existing = collection.get(ids=ids, include=['metadatas']) if ids else {"ids": [], "metadatas": []}
+        existing_hashes = {
+            doc_id: (metadata or {}).get("content_hash")
+            for doc_id, metadata in zip(existing['ids'], existing['metadatas'])
+        }
+        changed += _apply_delta(collection, ids, documents, existing_hashes, stats)
+
+        checkpoint["chunks_done"] = chunk_index + 1
+        checkpoint["rows_done"] += len(chunk)
+        _save_checkpoint(checkpoint)
+        if progress_callback:
+            progress_callback(checkpoint["rows_done"], total_rows)
+
+    # Suppression des lignes disparues du CSV (parcours paginé des identifiants indexés)
+    removed_ids, offset = [], 0
+    while True:
+        page = collection.get(include=[], limit=INGEST_CHUNK_SIZE, offset=offset)["ids"]
+        if not page:
+            break
+        removed_ids.extend(doc_id for doc_id in page if doc_id not in seen_ids)
+        offset += len(page)
+    for start in range(0, len(removed_ids), INDEX_BATCH_SIZE):
+        collection.delete(ids=removed_ids[start:start + INDEX_BATCH_SIZE])
+    stats["deleted"] = len(removed_ids)
+
+    if changed or removed_ids or not incremental:
+        db.persist()
+        publish_index_version(collection, travel_table)
+    travel_table.discard()
+    if os.path.exists(INGEST_CHECKPOINT_FILE):
+        os.remove(INGEST_CHECKPOINT_FILE)
+    return db, stats
+
 # --- Pipeline de l'Étape 3 ---
 
-def pipeline_complet_preparation_dataset():
-    """Fonction principale du pipeline de l'Étape 3."""
+def pipeline_complet_preparation_dataset(incremental: bool = True):
+    """
+    Fonction principale du pipeline de l'Étape 3.
+    Le CSV est indexé en flux (mémoire bornée, reprise après crash). En mode
+    incrémental, seules les lignes nouvelles, modifiées ou supprimées du CSV
+    sont répercutées dans la base.
+    """
+    # Seule fonction d'interface du module : l'API et le mode batch n'importent pas Streamlit
+    import streamlit as st
+
     st.markdown("### 🛠️ Démarrage de l'Étape 3 : Indexation")
-    
-    # 1. Chargement et Traitement
-    with st.spinner("1/2. Chargement et structuration des données CSV..."):
-        documents = load_csv_document() 
-        if not documents:
-            return None
-        st.success(f" {len(documents)} enregistrements de voyage chargés.")
-    
-    # 2. Vectorisation et Indexation
-    with st.spinner(f"2/2. Création et Indexation (ChromaDB) avec {EMBEDDING_MODEL_NAME}."):
-        try:
-            return create_vector_store(documents)
-        except Exception as e:
-            st.error(f" ERREUR lors de la création de la base : {e}")
-            return None
\ No newline at end of file
+
+    if not os.path.exists(CSV_FILE_PATH):
+        st.error(f" ERREUR : Fichier CSV non trouvé : {CSV_FILE_PATH}")
+        return None
+
+    mode = "Mise à jour incrémentale" if incremental and os.path.exists(VECTOR_STORE_PATH) else "Création"
+    progress_bar = st.progress(0.0, text=f"{mode} (ChromaDB) avec {EMBEDDING_MODEL_NAME}...")
+
+    def on_progress(rows_done: int, total_rows: int):
+        fraction = min(rows_done / total_rows, 1.0) if total_rows else 1.0
+        progress_bar.progress(fraction, text=f"{mode} : {rows_done}/{total_rows} lignes traitées")
+
+    try:
+        db, stats = ingest_csv_streaming(incremental=incremental, progress_callback=on_progress)
+    except Exception as e:
+        st.error(f" ERREUR lors de l'indexation (relancez pour reprendre au dernier morceau) : {e}")
+        return None
+
+    st.success(
+        f" Base vectorielle ChromaDB : {db._collection.count()} vecteurs "
+        f"({stats['added']} ajoutés, {stats['updated']} mis à jour, "
+        f"{stats['skipped']} inchangés, {stats['deleted']} supprimés)."
+    )
+    return db
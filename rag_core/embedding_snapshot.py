@@ -0,0 +1,230 @@
+# rag_core/embedding_snapshot.py
+
+import json
+import os
+import time
+
+import numpy as np
+
+# Format de stockage des vecteurs : 'float16' (2 octets / dimension) ou 'int8' (1 octet + une échelle par ligne)
+EMBEDDING_SNAPSHOT_DTYPE = os.getenv("EMBEDDING_SNAPSHOT_DTYPE", "float16")
+# Vecteurs lus par requête Chroma lors de l'écriture de l'instantané
+SNAPSHOT_PAGE_SIZE = 5000
+# Lignes traitées par produit matriciel lors d'une recherche exacte
+SEARCH_BLOCK_SIZE = 65536
+SNAPSHOT_FORMAT_VERSION = 1
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+IDS_FILE = "ids.npy"
+META_FILE = "meta.json"
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """Convertit des vecteurs float32 au format de stockage ; retourne (matrice, échelles int8 ou None)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        # Quantification symétrique par ligne : x ≈ q * échelle, q dans [-127, 127]
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Format d'instantané inconnu : {dtype}")
+
+
+def read_collection_embeddings(collection, page_size: int = SNAPSHOT_PAGE_SIZE):
+    """Itère sur (ids, vecteurs float32) de la collection Chroma, page par page."""
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        page = collection.get(include=['embeddings'], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        yield page["ids"], np.asarray(page["embeddings"], dtype=np.float32)
+
+
+def load_collection_embeddings(collection, page_size: int = SNAPSHOT_PAGE_SIZE) -> np.ndarray:
+    """Matrice float32 de tous les vecteurs de la collection (sans liste Python intermédiaire)."""
+    blocks = [vectors for _, vectors in read_collection_embeddings(collection, page_size)]
+    return np.concatenate(blocks) if blocks else np.empty((0, 0), dtype=np.float32)
+
+
+def write_snapshot(collection, directory: str, index_version: str | None = None,
+                   dtype: str = EMBEDDING_SNAPSHOT_DTYPE, page_size: int = SNAPSHOT_PAGE_SIZE) -> dict:
+    """
+    Écrit l'instantané compact des vecteurs de la collection dans `directory` :
+    matrice contiguë (float16 ou int8 + échelles) remplie page par page dans un
+    fichier .npy projeté en mémoire, identifiants, et méta-données incluant
+    l'erreur de quantification mesurée par rapport aux vecteurs float32.
+    Les fichiers sont remplacés atomiquement, meta.json en dernier.
+    """
+    os.makedirs(directory, exist_ok=True)
+    total = collection.count()
+    matrix = scales = None
+    ids = []
+    written = 0
+    max_abs_error = 0.0
+    min_cosine = 1.0
+
+    for page_ids, vectors in read_collection_embeddings(collection, page_size):
+        if matrix is None:
+            storage_dtype = np.float16 if dtype == "float16" else np.int8
+            matrix = np.lib.format.open_memmap(
+                os.path.join(directory, VECTORS_FILE + ".tmp"), mode="w+",
+                dtype=storage_dtype, shape=(total, vectors.shape[1])
+            )
+            if dtype == "int8":
+                scales = np.lib.format.open_memmap(
+                    os.path.join(directory, SCALES_FILE + ".tmp"), mode="w+", dtype=np.float32, shape=(total,)
+                )
+        # La collection a pu grossir pendant la lecture : on s'arrête à la taille allouée
+        n = min(len(page_ids), total - written)
+        quantized, page_scales = quantize(vectors[:n], dtype)
+        matrix[written:written + n] = quantized
+        if scales is not None:
+            scales[written:written + n] = page_scales
+
+        # Contrôle de précision par rapport au float32 d'origine
+        restored = quantized.astype(np.float32) * (page_scales[:, None] if page_scales is not None else 1.0)
+        max_abs_error = max(max_abs_error, float(np.abs(restored - vectors[:n]).max(initial=0.0)))
+        norms = np.linalg.norm(restored, axis=1) * np.linalg.norm(vectors[:n], axis=1)
+        cosines = (restored * vectors[:n]).sum(axis=1) / np.maximum(norms, 1e-12)
+        min_cosine = min(min_cosine, float(cosines.min(initial=1.0)))
+
+        ids.extend(page_ids[:n])
+        written += n
+        if written >= total:
+            break
+
+    meta = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "dtype": dtype,
+        "count": written,
+        "dim": int(matrix.shape[1]) if matrix is not None else 0,
+        "index_version": index_version,
+        "created_at": time.time(),
+        "max_abs_error": max_abs_error,
+        "min_cosine": min_cosine,
+    }
+    if matrix is not None:
+        matrix.flush()
+        del matrix
+        os.replace(os.path.join(directory, VECTORS_FILE + ".tmp"), os.path.join(directory, VECTORS_FILE))
+        if scales is not None:
+            scales.flush()
+            del scales
+            os.replace(os.path.join(directory, SCALES_FILE + ".tmp"), os.path.join(directory, SCALES_FILE))
+        with open(os.path.join(directory, IDS_FILE + ".tmp"), "wb") as f:
+            np.save(f, np.array(ids, dtype=str))
+        os.replace(os.path.join(directory, IDS_FILE + ".tmp"), os.path.join(directory, IDS_FILE))
+
+    tmp_meta = os.path.join(directory, META_FILE + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(directory, META_FILE))
+    return meta
+
+
+class EmbeddingSnapshot:
+    """
+    Instantané en lecture seule des vecteurs de l'index, projeté en mémoire
+    (np.load mmap_mode='r') : plusieurs sessions ou processus partagent les mêmes
+    pages du cache disque, sans copie. Les lignes sont dans l'ordre de `ids`.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray, meta: dict, scales: np.ndarray | None = None):
+        self.vectors = vectors
+        self.ids = ids
+        self.meta = meta
+        self.scales = scales
+
+    @classmethod
+    def open(cls, directory: str) -> "EmbeddingSnapshot | None":
+        """Ouvre l'instantané de `directory`, ou None s'il est absent ou incohérent."""
+        try:
+            with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION or not meta["count"]:
+                return None
+            vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")[:meta["count"]]
+            ids = np.load(os.path.join(directory, IDS_FILE), mmap_mode="r")
+            scales = (np.load(os.path.join(directory, SCALES_FILE), mmap_mode="r")[:meta["count"]]
+                      if meta["dtype"] == "int8" else None)
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(ids) != meta["count"] or vectors.shape != (meta["count"], meta["dim"]):
+            return None
+        return cls(vectors, ids, meta, scales)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def index_version(self) -> str | None:
+        return self.meta.get("index_version")
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Lignes [start:stop] reconverties en float32."""
+        block = np.asarray(self.vectors[start:stop], dtype=np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:stop, None]
+        return block
+
+    def to_float32(self) -> np.ndarray:
+        """Matrice float32 complète (pour l'entraînement d'un modèle)."""
+        return self.rows()
+
+    def search(self, query_vector: np.ndarray, k: int = 10,
+               block_size: int = SEARCH_BLOCK_SIZE) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Recherche exacte des k vecteurs les plus similaires (produit scalaire, soit la
+        similarité cosinus pour des vecteurs normalisés). Retourne (ids, scores) triés.
+        """
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        k = min(k, len(self))
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), block_size):
+            stop = min(start + block_size, len(self))
+            scores[start:stop] = np.asarray(self.vectors[start:stop], dtype=np.float32) @ query
+            if self.scales is not None:
+                scores[start:stop] *= self.scales[start:stop]
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return np.asarray(self.ids[top]), scores[top]
+
+
+def check_accuracy(snapshot: EmbeddingSnapshot, reference: np.ndarray, n_queries: int = 100,
+                   k: int = 10, seed: int = 42) -> dict:
+    """
+    Compare l'instantané aux vecteurs float32 d'origine (`reference`, même ordre que
+    snapshot.ids) : erreur absolue maximale, cosinus minimal, et rappel@k de la
+    recherche exacte sur des requêtes tirées de la base.
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    restored = snapshot.to_float32()
+    norms = np.linalg.norm(restored, axis=1) * np.linalg.norm(reference, axis=1)
+    cosines = (restored * reference).sum(axis=1) / np.maximum(norms, 1e-12)
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(reference), size=min(n_queries, len(reference)), replace=False)
+    recalls = []
+    for row in sample:
+        query = reference[row]
+        expected = set(np.argpartition(reference @ query, -k)[-k:].tolist()) if len(reference) > k \
+            else set(range(len(reference)))
+        found_ids, _ = snapshot.search(query, k)
+        found = {int(i) for i in np.flatnonzero(np.isin(snapshot.ids, found_ids))}
+        recalls.append(len(expected & found) / len(expected))
+
+    return {
+        "dtype": snapshot.meta["dtype"],
+        "bytes": snapshot.nbytes,
+        "float32_bytes": reference.nbytes,
+        "max_abs_error": float(np.abs(restored - reference).max(initial=0.0)),
+        "min_cosine": float(cosines.min(initial=1.0)),
+        f"recall_at_{k}": float(np.mean(recalls)) if recalls else 1.0,
+    }
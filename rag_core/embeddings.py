@@ -0,0 +1,200 @@
+# rag_core/embeddings.py
+
+import atexit
+import os
+import threading
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag_core import metrics
+
+# --- Variables Globales ---
+# Le même modèle sert à l'indexation, à la recherche et à la détection d'anomalies
+EMBEDDING_MODEL_NAME = "sentence-transformers/LaBSE"
+EMBEDDING_DEVICE = "cpu"
+# Réglages de l'encodage (surchargeables par variables d'environnement sur les machines d'ingestion)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Nombre de processus d'encodage pour l'indexation (1 = encodage dans le processus courant)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+# Threads torch par processus (0 = valeur par défaut de torch)
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+
+
+class EmbeddingService(Embeddings):
+    """
+    Service d'embedding LaBSE partagé par tout le processus.
+
+    Le modèle n'est chargé qu'une seule fois (au premier appel) puis réutilisé
+    par db_manager (indexation / chargement) et par AnomalyDetector.
+    Les vecteurs retournés sont normalisés (norme L2 = 1).
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME,
+                 device: str = EMBEDDING_DEVICE,
+                 batch_size: int = EMBEDDING_BATCH_SIZE,
+                 workers: int = EMBEDDING_WORKERS,
+                 num_threads: int = EMBEDDING_NUM_THREADS):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.workers = workers
+        self.num_threads = num_threads
+        self._model = None
+        self._pool = None
+        self._load_lock = threading.Lock()
+        # Les tokenizers HuggingFace ne supportent pas les appels concurrents
+        self._encode_lock = threading.Lock()
+        # Démarrage du pool et encodages répartis (les files du pool sont partagées entre appels)
+        self._pool_lock = threading.Lock()
+        self.metrics = {
+            "load_time_s": None,
+            "encode_calls": 0,
+            "texts_encoded": 0,
+            "encode_time_s": 0.0,
+        }
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def _get_model(self):
+        """Charge le modèle SentenceTransformer une seule fois (double verrouillage)."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    if self.num_threads > 0:
+                        import torch
+                        torch.set_num_threads(self.num_threads)
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(
+                        self.model_name,
+                        device=self.device,       # Évite le .to(meta)
+                        trust_remote_code=True
+                    )
+                    self.metrics["load_time_s"] = time.perf_counter() - start
+        return self._model
+
+    def load(self) -> "EmbeddingService":
+        """Force le chargement du modèle (préchauffage)."""
+        self._get_model()
+        return self
+
+    def _record_encode(self, n_texts: int, duration_s: float):
+        self.metrics["encode_calls"] += 1
+        self.metrics["texts_encoded"] += n_texts
+        self.metrics["encode_time_s"] += duration_s
+        metrics.observe("embedding_batch_size", n_texts, buckets=metrics.SIZE_BUCKETS)
+        metrics.observe("embedding_seconds", duration_s)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Vectorise une liste de textes par lots et retourne une matrice float32 normalisée."""
+        model = self._get_model()
+        with self._encode_lock:
+            start = time.perf_counter()
+            vectors = model.encode(
+                list(texts),
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            self._record_encode(len(texts), time.perf_counter() - start)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _get_pool(self):
+        """Démarre (une seule fois) le pool multi-processus de sentence-transformers (sous _pool_lock)."""
+        if self._pool is None:
+            model = self._get_model()
+            previous = os.environ.get("OMP_NUM_THREADS")
+            if self.num_threads > 0:
+                # Hérité par les processus fils au démarrage : évite la sur-souscription des cœurs
+                os.environ["OMP_NUM_THREADS"] = str(self.num_threads)
+            try:
+                self._pool = model.start_multi_process_pool(target_devices=[self.device] * self.workers)
+            finally:
+                # Le processus courant garde son réglage
+                if previous is None:
+                    os.environ.pop("OMP_NUM_THREADS", None)
+                else:
+                    os.environ["OMP_NUM_THREADS"] = previous
+            atexit.register(self.close_pool)
+        return self._pool
+
+    def close_pool(self):
+        """Arrête les processus d'encodage parallèle s'ils ont été démarrés."""
+        if self._pool is not None:
+            self._get_model().stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Vectorise un lot de documents pour l'indexation : réparti sur `workers`
+        processus si configuré, sinon équivalent à encode(). L'encodage réparti
+        ne prend pas `_encode_lock` : les requêtes (encode) ne l'attendent pas.
+        """
+        if self.workers <= 1 or len(texts) < self.workers * self.batch_size:
+            return self.encode(texts)
+
+        with self._pool_lock:
+            pool = self._get_pool()
+            start = time.perf_counter()
+            vectors = self._get_model().encode(
+                list(texts),
+                pool=pool,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            self._record_encode(len(texts), time.perf_counter() - start)
+        return np.asarray(vectors, dtype=np.float32)
+
+    # --- Interface LangChain (utilisée par Chroma) ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode_documents(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+class QueryContext:
+    """
+    Contexte d'une requête utilisateur : texte normalisé et son vecteur LaBSE,
+    calculé une seule fois puis réutilisé par le cache, le détecteur d'anomalies
+    et la recherche (dans l'espace vectoriel de l'index).
+    """
+
+    def __init__(self, text: str, service: EmbeddingService | None = None):
+        self.text = text
+        self._service = service
+        self._vector = None
+
+    @property
+    def vector(self) -> np.ndarray:
+        """Vecteur normalisé (1-D, float32) de la requête, encodé au premier accès."""
+        if self._vector is None:
+            service = self._service or get_embedding_service()
+            self._vector = service.encode([self.text])[0]
+        return self._vector
+
+
+# --- Instance partagée du processus ---
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Retourne l'unique EmbeddingService du processus (créé à la demande, modèle chargé paresseusement)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+    return _service
@@ -0,0 +1,279 @@
+# rag_core/gemini_pool.py
+
+import asyncio
+import concurrent.futures
+import hashlib
+import itertools
+import os
+import random
+import threading
+import time
+import weakref
+from types import SimpleNamespace
+
+from rag_core import metrics
+
+# --- Réglages (à dimensionner selon le quota du projet Gemini) ---
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "2"))
+# Débit maximal envoyé à l'API (requêtes / minute) et rafale autorisée ; 0 = illimité
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+# Appels simultanés au maximum (par processus)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "60"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_BACKOFF_BASE_S = float(os.getenv("GEMINI_BACKOFF_BASE_S", "0.5"))
+GEMINI_BACKOFF_MAX_S = float(os.getenv("GEMINI_BACKOFF_MAX_S", "20"))
+
+# Codes HTTP temporaires : quota dépassé et erreurs serveur
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Erreur passagère (quota, serveur indisponible, délai dépassé) justifiant un nouvel essai."""
+    from google.genai.errors import APIError
+
+    if isinstance(error, APIError):
+        return error.code in RETRYABLE_CODES
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+def backoff_delay(attempt: int, error: Exception | None = None,
+                  base_s: float = GEMINI_BACKOFF_BASE_S, max_s: float = GEMINI_BACKOFF_MAX_S) -> float:
+    """Attente avant l'essai suivant : Retry-After si l'API l'indique, sinon backoff exponentiel à gigue complète."""
+    response = getattr(error, "response", None)
+    retry_after = getattr(getattr(response, "headers", None), "get", lambda _: None)("retry-after")
+    if retry_after:
+        try:
+            return min(max_s, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(max_s, base_s * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Seau à jetons thread-safe : `rate_per_s` jetons par seconde, au plus `capacity`
+    en réserve. Les appelants réservent un jeton (le solde peut devenir négatif)
+    puis attendent le temps correspondant, ce qui les sert dans l'ordre d'arrivée.
+    """
+
+    def __init__(self, rate_per_s: float, capacity: int):
+        self.rate_per_s = rate_per_s
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Réserve un jeton et retourne le temps d'attente nécessaire (en secondes)."""
+        if self.rate_per_s <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate_per_s
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            metrics.observe("gemini_throttle_seconds", wait)
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            metrics.observe("gemini_throttle_seconds", wait)
+            await asyncio.sleep(wait)
+
+
+def _request_key(model: str, contents, config) -> str:
+    """Clé de coalescence : même modèle, même prompt, même configuration."""
+    config_repr = config.model_dump_json(exclude_none=True) if hasattr(config, "model_dump_json") else repr(config)
+    digest = hashlib.sha256(f"{model}\0{contents!r}\0{config_repr}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PooledGeminiClient:
+    """
+    Client Gemini partagé par tout le processus, compatible avec l'interface de
+    genai.Client utilisée par llm_utils (`models` et `aio.models`) :
+    - répartition des appels sur un pool de clients (round-robin) ;
+    - limitation du débit (seau à jetons) et du nombre d'appels simultanés ;
+    - nouvel essai avec backoff exponentiel et gigue sur 429 / 5xx / délai dépassé ;
+    - coalescence (single-flight) des appels non streamés identiques en cours :
+      une rafale de la même question ne produit qu'un appel à l'API.
+    """
+
+    def __init__(self, clients: list, rpm: float = GEMINI_RPM, burst: int = GEMINI_BURST,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY, max_retries: int = GEMINI_MAX_RETRIES):
+        if not clients:
+            raise ValueError("Le pool Gemini doit contenir au moins un client.")
+        self.clients = list(clients)
+        self._next = itertools.cycle(range(len(self.clients)))
+        self._next_lock = threading.Lock()
+        self.bucket = TokenBucket(rpm / 60.0, burst)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphores = weakref.WeakKeyDictionary()   # boucle asyncio -> Semaphore
+        self._inflight = {}           # clé -> Future (appels synchrones)
+        self._inflight_async = {}     # (boucle, clé) -> asyncio.Future
+        self._inflight_lock = threading.Lock()
+        self.models = SimpleNamespace(
+            generate_content=self.generate_content,
+            generate_content_stream=self.generate_content_stream,
+        )
+        self.aio = SimpleNamespace(models=SimpleNamespace(
+            generate_content=self.generate_content_async,
+            generate_content_stream=self.generate_content_stream_async,
+        ))
+
+    @classmethod
+    def create(cls, size: int = GEMINI_POOL_SIZE, timeout_s: float = GEMINI_TIMEOUT_S, **kwargs) -> "PooledGeminiClient":
+        """Construit le pool de genai.Client (clé lue dans GEMINI_API_KEY, délai maximal par appel)."""
+        from google import genai
+        from google.genai import types
+
+        http_options = types.HttpOptions(timeout=int(timeout_s * 1000))
+        return cls([genai.Client(http_options=http_options) for _ in range(max(1, size))], **kwargs)
+
+    def _client(self):
+        with self._next_lock:
+            return self.clients[next(self._next)]
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._inflight_lock:
+            if loop not in self._async_semaphores:
+                self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return self._async_semaphores[loop]
+
+    def _on_retry(self, error: Exception, attempt: int) -> float:
+        metrics.increment("gemini_retries_total", code=getattr(error, "code", type(error).__name__))
+        return backoff_delay(attempt, error)
+
+    # --- Appels synchrones ---
+
+    def _call(self, fn):
+        for attempt in itertools.count():
+            self.bucket.acquire()
+            try:
+                with self._semaphore:
+                    return fn(self._client())
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self._on_retry(e, attempt))
+
+    def generate_content(self, model: str, contents, config=None):
+        key = _request_key(model, contents, config)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+        if not leader:
+            metrics.increment("gemini_coalesced_total")
+            return future.result()
+
+        try:
+            response = self._call(lambda c: c.models.generate_content(model=model, contents=contents, config=config))
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        """Flux de fragments ; un nouvel essai n'est tenté que si aucun fragment n'a encore été reçu."""
+        for attempt in itertools.count():
+            self.bucket.acquire()
+            received = False
+            try:
+                with self._semaphore:
+                    for chunk in self._client().models.generate_content_stream(
+                        model=model, contents=contents, config=config
+                    ):
+                        received = True
+                        yield chunk
+                return
+            except Exception as e:
+                if received or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self._on_retry(e, attempt))
+
+    # --- Appels asynchrones ---
+
+    async def _call_async(self, coro_fn):
+        for attempt in itertools.count():
+            await self.bucket.acquire_async()
+            try:
+                async with self._async_semaphore():
+                    return await coro_fn(self._client())
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(self._on_retry(e, attempt))
+
+    async def generate_content_async(self, model: str, contents, config=None):
+        loop = asyncio.get_running_loop()
+        key = (loop, _request_key(model, contents, config))
+        with self._inflight_lock:
+            future = self._inflight_async.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight_async[key] = loop.create_future()
+        if not leader:
+            metrics.increment("gemini_coalesced_total")
+            return await asyncio.shield(future)
+
+        try:
+            response = await self._call_async(
+                lambda c: c.aio.models.generate_content(model=model, contents=contents, config=config)
+            )
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # marquée comme lue même sans autre appelant en attente
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight_async.pop(key, None)
+
+    async def generate_content_stream_async(self, model: str, contents, config=None):
+        """Comme genai : `await client.aio.models.generate_content_stream(...)` retourne un itérateur asynchrone."""
+
+        async def stream():
+            for attempt in itertools.count():
+                await self.bucket.acquire_async()
+                received = False
+                try:
+                    async with self._async_semaphore():
+                        async for chunk in await self._client().aio.models.generate_content_stream(
+                            model=model, contents=contents, config=config
+                        ):
+                            received = True
+                            yield chunk
+                    return
+                except Exception as e:
+                    if received or attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    await asyncio.sleep(self._on_retry(e, attempt))
+
+        return stream()
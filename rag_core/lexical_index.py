@@ -0,0 +1,244 @@
+# rag_core/lexical_index.py
+
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from rag_core.nl_processor import FILTER_FIELDS, normalize_text
+
+# Paramètres BM25 (saturation de la fréquence des termes, normalisation par la longueur)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Documents lus par requête Chroma lors de la construction de l'index
+LEXICAL_PAGE_SIZE = 5000
+LEXICAL_FORMAT_VERSION = 1
+
+# Référence explicite à un voyage : 'Voyage ID 42', 'trip #42', 'voyage n°42', 'voyage numéro 42'
+# (« numéro 3 » ou « no. 2 » seuls ne désignent pas un voyage)
+TRIP_ID_PATTERN = re.compile(
+    r"\b(?:voyages?|trips?)\s*(?:\bid\b|#|\bn°|\bno\.|\bnumero\b|\bnumber\b)\s*:?\s*(\d+)\b"
+)
+# Nom du voyageur dans le résumé construit par db_manager.clean_and_combine_data
+TRAVELER_NAME_PATTERN = re.compile(r"Voyageur: (.+?) \(")
+# Longueurs (en mots) des noms de voyageurs cherchés dans la requête
+NAME_NGRAMS = (2, 3, 4)
+
+META_FILE = "meta.json"
+ARRAY_FILES = ("terms", "indptr", "postings", "tfs", "doc_len", "ids", "trip_ids", "names")
+
+
+def tokenize(text: str) -> list[str]:
+    """Mots de la requête ou du document : minuscules, sans accents (nl_processor.normalize_text)."""
+    return re.findall(r"\w+", normalize_text(text))
+
+
+def _document_text(content: str, metadata: dict) -> str:
+    """Résumé du voyage complété par les métadonnées filtrables qu'il ne contient pas (nationalité)."""
+    extra = [str(metadata[field]) for field in FILTER_FIELDS
+             if metadata.get(field) and str(metadata[field]) not in content]
+    return " ".join([content, *extra])
+
+
+def _trip_id(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def build_index(collection, directory: str, index_version: str | None = None,
+                page_size: int = LEXICAL_PAGE_SIZE) -> dict:
+    """
+    Construit l'index inversé BM25 des documents de la collection Chroma (lecture
+    paginée) et l'écrit dans `directory` : listes de postings triées par terme
+    (format CSC : indptr / postings / tfs), longueurs des documents, identifiants
+    Chroma, Trip ID, noms des voyageurs et codes des métadonnées filtrables.
+    meta.json est écrit en dernier.
+    """
+    vocabulary = {}
+    term_ids, doc_rows, tfs = [], [], []
+    doc_len, ids, trip_ids, names = [], [], [], []
+    field_values = {field: {} for field in FILTER_FIELDS}
+    field_codes = {field: [] for field in FILTER_FIELDS}
+
+    offset = 0
+    while True:
+        page = collection.get(include=['documents', 'metadatas'], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for doc_id, content, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            content, metadata = content or "", metadata or {}
+            counts = Counter(tokenize(_document_text(content, metadata)))
+            row = len(ids)
+            for term, tf in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                tfs.append(tf)
+            doc_rows.extend([row] * len(counts))
+            doc_len.append(sum(counts.values()))
+            ids.append(doc_id)
+            trip_ids.append(_trip_id(metadata.get("trip_id")))
+            name = TRAVELER_NAME_PATTERN.search(content)
+            names.append(" ".join(tokenize(name.group(1))) if name else "")
+            for field, values in field_values.items():
+                value = metadata.get(field)
+                field_codes[field].append(values.setdefault(value, len(values)) if value else -1)
+        offset += len(page["ids"])
+
+    # Postings regroupés par terme (tri stable : documents dans l'ordre croissant)
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    order = np.argsort(term_ids, kind="stable")
+    indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=indptr[1:])
+    arrays = {
+        "terms": np.array(sorted(vocabulary, key=vocabulary.get), dtype=str),
+        "indptr": indptr,
+        "postings": np.asarray(doc_rows, dtype=np.int32)[order],
+        "tfs": np.asarray(tfs, dtype=np.float32)[order],
+        "doc_len": np.asarray(doc_len, dtype=np.float32),
+        "ids": np.array(ids, dtype=str),
+        "trip_ids": np.asarray(trip_ids, dtype=np.int64),
+        "names": np.array(names, dtype=str),
+    }
+    for field, codes in field_codes.items():
+        arrays[f"field_{field}"] = np.asarray(codes, dtype=np.int32)
+
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        tmp_path = os.path.join(directory, f"{name}.npy.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+    meta = {
+        "format_version": LEXICAL_FORMAT_VERSION,
+        "index_version": index_version,
+        "count": len(ids),
+        "terms": len(vocabulary),
+        "avg_doc_len": float(np.mean(doc_len)) if doc_len else 0.0,
+        "field_values": {field: sorted(values, key=values.get) for field, values in field_values.items()},
+        "created_at": time.time(),
+    }
+    tmp_meta = os.path.join(directory, META_FILE + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(directory, META_FILE))
+    return meta
+
+
+class LexicalIndex:
+    """
+    Index inversé BM25 en lecture seule (tableaux projetés en mémoire), avec un
+    routeur pour les références exactes : Trip ID et nom complet du voyageur.
+    Les lignes de l'index correspondent à `ids` (identifiants Chroma).
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.meta = meta
+        self.terms = arrays["terms"]
+        self.indptr = arrays["indptr"]
+        self.postings = arrays["postings"]
+        self.tfs = arrays["tfs"]
+        self.doc_len = arrays["doc_len"]
+        self.ids = arrays["ids"]
+        self.trip_ids = arrays["trip_ids"]
+        self.field_codes = {field: arrays[f"field_{field}"] for field in FILTER_FIELDS}
+        self.field_values = {
+            field: {value: code for code, value in enumerate(values)}
+            for field, values in meta["field_values"].items()
+        }
+        self.vocabulary = {term: i for i, term in enumerate(self.terms.tolist())}
+        self.names = {}
+        for row, name in enumerate(arrays["names"].tolist()):
+            if name:
+                self.names.setdefault(name, []).append(row)
+
+    @classmethod
+    def open(cls, directory: str) -> "LexicalIndex | None":
+        """Ouvre l'index de `directory`, ou None s'il est absent ou incomplet."""
+        try:
+            with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != LEXICAL_FORMAT_VERSION:
+                return None
+            names = list(ARRAY_FILES) + [f"field_{field}" for field in FILTER_FIELDS]
+            arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in names}
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(arrays["ids"]) != meta["count"]:
+            return None
+        return cls(arrays, meta)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def index_version(self) -> str | None:
+        return self.meta.get("index_version")
+
+    def ids_for(self, rows) -> list[str]:
+        return [str(self.ids[row]) for row in rows]
+
+    def _filter_mask(self, rows: np.ndarray, filters: dict | None) -> np.ndarray:
+        """Lignes compatibles avec les filtres {champ: valeur | [valeurs]} (même format que Chroma)."""
+        mask = np.ones(len(rows), dtype=bool)
+        for field, values in (filters or {}).items():
+            if field not in self.field_codes:
+                continue
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            codes = [self.field_values[field][v] for v in values if v in self.field_values[field]]
+            mask &= np.isin(self.field_codes[field][rows], codes)
+        return mask
+
+    def search(self, query: str, k: int, filters: dict | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Les k meilleures lignes au sens de BM25 (scores > 0), avec leurs scores."""
+        n_docs = len(self)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        avg_len = self.meta["avg_doc_len"] or 1.0
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, stop = self.indptr[term_id], self.indptr[term_id + 1]
+            rows, tf = self.postings[start:stop], self.tfs[start:stop]
+            idf = math.log(1.0 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[rows] / avg_len)
+            scores[rows] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        candidates = np.flatnonzero(scores)
+        candidates = candidates[self._filter_mask(candidates, filters)]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        candidates = candidates[np.argsort(scores[candidates], kind="stable")[::-1]]
+        return candidates, scores[candidates]
+
+    def lookup(self, query: str, filters: dict | None = None) -> np.ndarray | None:
+        """
+        Routeur des références exactes : lignes des Trip ID cités (« Voyage ID 42 »),
+        sinon des noms complets de voyageurs présents dans la requête.
+        None si la requête ne cite ni voyage ni voyageur connu.
+        """
+        normalized = normalize_text(query)
+        trip_ids = [int(value) for value in TRIP_ID_PATTERN.findall(normalized)]
+        rows = np.flatnonzero(np.isin(self.trip_ids, trip_ids)) if trip_ids else np.array([], dtype=np.int64)
+
+        if not len(rows) and self.names:
+            words = re.findall(r"\w+", normalized)
+            matched = {
+                row
+                for size in NAME_NGRAMS
+                for i in range(len(words) - size + 1)
+                for row in self.names.get(" ".join(words[i:i + size]), [])
+            }
+            rows = np.array(sorted(matched), dtype=np.int64)
+
+        if not len(rows):
+            return None
+        # Les filtres affinent la référence (ex : nom + destination) ; s'ils la contredisent,
+        # la requête suit la recherche hybride habituelle
+        filtered = rows[self._filter_mask(rows, filters)]
+        return filtered if len(filtered) else None
@@ -1,37 +1,71 @@
-import streamlit as st
 import os
-from google import genai
-from google.genai.errors import APIError
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Iterator
 
-from google.genai import types
+from rag_core import context_packer, metrics, nl_processor, notifications
+from rag_core.gemini_pool import PooledGeminiClient
+
+# google-genai (~1 s d'import) n'est chargé qu'au premier appel à Gemini
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+GEMINI_MODEL = 'gemini-2.5-flash'
 
 # --- Configuration et Initialisation Gemini ---
 
-def get_gemini_client():
+# Client partagé par toutes les sessions (pool, limitation de débit, nouveaux essais, coalescence)
+_client = None
+_client_lock = threading.Lock()
+
+def get_gemini_client() -> PooledGeminiClient:
     """
-    Vérifie la clé API et initialise le client Gemini.
-    Arrête l'application Streamlit en cas d'erreur.
+    Vérifie la clé API et retourne le client Gemini partagé du processus
+    (créé au premier appel, voir gemini_pool.PooledGeminiClient).
+    Arrête l'application Streamlit en cas d'erreur (RuntimeError hors Streamlit).
     """
+    global _client
     # La librairie 'google-genai' recherche la clé dans GEMINI_API_KEY
     if "GEMINI_API_KEY" not in os.environ:
-        st.error("ERREUR : La variable d'environnement GEMINI_API_KEY n'est pas configurée.")
-        st.stop()
+        notifications.stop("ERREUR : La variable d'environnement GEMINI_API_KEY n'est pas configurée.")
     
-    try:
-        client = genai.Client()
-        return client
-    except Exception as e:
-        # Gérer les erreurs d'initialisation (problème de connexion, etc.)
-        st.error(f"Erreur d'initialisation du client Gemini : {e}")
-        st.stop()
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = PooledGeminiClient.create()
+                except Exception as e:
+                    # Gérer les erreurs d'initialisation (problème de connexion, etc.)
+                    notifications.stop(f"Erreur d'initialisation du client Gemini : {e}")
+    return _client
 
 
-def traiter_requete_multilingue(client: genai.Client, requete_brute: str) -> str | None:
-    """
-    Utilise Gemini pour traduire et normaliser la requête de l'utilisateur
-    en Français standard pour la recherche RAG.
-    """
-    prompt_normalisation = f"""
+@dataclass
+class UsageGeneration:
+    """Tokens facturés d'un appel de génération (usage_metadata), None si l'API ne les renvoie pas."""
+    tokens_prompt: int | None = None
+    tokens_reponse: int | None = None
+
+def _enregistrer_appel_gemini(operation: str, debut: float, response=None, usage: UsageGeneration | None = None):
+    """Latence et tokens (usage_metadata) d'un appel Gemini, pour rag_core.metrics (et `usage`)."""
+    metrics.observe("gemini_seconds", time.perf_counter() - debut, operation=operation)
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return
+    if usage is not None:
+        usage.tokens_prompt = metadata.prompt_token_count
+        usage.tokens_reponse = metadata.candidates_token_count
+    for type_token, valeur in (("prompt", metadata.prompt_token_count), ("reponse", metadata.candidates_token_count)):
+        if valeur:
+            metrics.observe("gemini_tokens", valeur, buckets=metrics.TOKEN_BUCKETS,
+                            operation=operation, type=type_token)
+
+
+def _prompt_normalisation(requete_brute: str) -> str:
+    """Construit le prompt de traduction / normalisation de la requête."""
+    return f"""
     Tu es un nettoyeur et traducteur de requêtes. L'utilisateur a saisi une requête qui peut être en français, anglais, arabe classique ou dialecte tunisien (Derja).
     
     TA TÂCHE :
@@ -41,22 +75,93 @@ def traiter_requete_multilingue(client: genai.Client, requete_brute: str) -> str
     
     REQUÊTE BRUTE : "{requete_brute}"
     """
-    
+
+def _signaler_erreur_normalisation(e: Exception):
+    metrics.increment("gemini_errors_total", operation="normalisation")
+    # Les erreurs de l'API (google.genai.errors.APIError) portent un code HTTP
+    if getattr(e, "code", None) is not None:
+        notifications.error(f"Erreur API lors de la normalisation (code {e.code}): {e}")
+    else:
+        notifications.error(f"Erreur inattendue lors de la normalisation : {e}")
+
+def traiter_requete_multilingue(client: "genai.Client", requete_brute: str) -> str | None:
+    """
+    Utilise Gemini pour traduire et normaliser la requête de l'utilisateur
+    en Français standard pour la recherche RAG.
+    """
+    debut = time.perf_counter()
     try:
         response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt_normalisation
+            model=GEMINI_MODEL,
+            contents=_prompt_normalisation(requete_brute)
         )
+        _enregistrer_appel_gemini("normalisation", debut, response)
         # S'assurer qu'on retire les espaces inutiles autour
         return response.text.strip()
-    except APIError as e:
-        st.error(f"Erreur API lors de la normalisation (code {e.response.status_code}): {e}")
+    except Exception as e:
+        _signaler_erreur_normalisation(e)
         return None
+
+async def traiter_requete_multilingue_async(client: "genai.Client", requete_brute: str) -> str | None:
+    """Version asynchrone de traiter_requete_multilingue (planifiable avec d'autres étapes)."""
+    debut = time.perf_counter()
+    try:
+        response = await client.aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=_prompt_normalisation(requete_brute)
+        )
+        _enregistrer_appel_gemini("normalisation", debut, response)
+        return response.text.strip()
     except Exception as e:
-        st.error(f"Erreur inattendue lors de la normalisation : {e}")
+        _signaler_erreur_normalisation(e)
         return None
 
-SYSTEM_INSTRUCTION_RAG = """
+# --- Routage de la Normalisation (locale ou Gemini) ---
+
+# Compteurs du processus : requêtes normalisées localement vs envoyées à Gemini
+NORMALISATION_STATS = {"locale": 0, "gemini": 0}
+_stats_lock = threading.Lock()
+
+def _compter_normalisation(source: str):
+    with _stats_lock:
+        NORMALISATION_STATS[source] += 1
+    metrics.increment("normalisation_total", source=source)
+
+def taux_contournement() -> float:
+    """Part des requêtes normalisées localement, sans appel Gemini."""
+    total = NORMALISATION_STATS["locale"] + NORMALISATION_STATS["gemini"]
+    return NORMALISATION_STATS["locale"] / total if total else 0.0
+
+def normaliser_requete(client: "genai.Client", requete_brute: str,
+                       locale: bool | None = None) -> tuple[str | None, str]:
+    """
+    Normalise la requête : les requêtes propres en français / anglais sont traitées
+    localement (nl_processor), seules les requêtes en arabe, en Derja ou « sales »
+    passent par Gemini. Retourne (requête normalisée, 'locale' | 'gemini').
+    """
+    locale = nl_processor.LOCAL_NORMALIZATION_ENABLED if locale is None else locale
+    if locale:
+        requete_normalisee = nl_processor.normalisation_locale(requete_brute)
+        if requete_normalisee:
+            _compter_normalisation("locale")
+            return requete_normalisee, "locale"
+    _compter_normalisation("gemini")
+    return traiter_requete_multilingue(client, requete_brute), "gemini"
+
+async def normaliser_requete_async(client: "genai.Client", requete_brute: str,
+                                   locale: bool | None = None) -> tuple[str | None, str]:
+    """Version asynchrone de normaliser_requete."""
+    locale = nl_processor.LOCAL_NORMALIZATION_ENABLED if locale is None else locale
+    if locale:
+        requete_normalisee = nl_processor.normalisation_locale(requete_brute)
+        if requete_normalisee:
+            _compter_normalisation("locale")
+            return requete_normalisee, "locale"
+    _compter_normalisation("gemini")
+    return await traiter_requete_multilingue_async(client, requete_brute), "gemini"
+
+# Instruction d'origine, utilisée avec le contexte complet (COMPACT_CONTEXT=0)
+SYSTEM_INSTRUCTION_RAG_COMPLETE = """
 Vous êtes un agent d'assistance de voyage expert et un commercial très professionnel de l'agence Alpha. Votre mission est de répondre aux questions des utilisateurs en utilisant EXCLUSIVEMENT le CONTEXTE FACTUEL fourni.
 
 Règles à suivre IMPÉRATIVEMENT :
@@ -66,19 +171,24 @@ Règles à suivre IMPÉRATIVEMENT :
 4. **Format :** Ne faites pas référence au "contexte" ou aux "documents" dans votre réponse finale.
 """
 
-def generer_reponse_rag(client: genai.Client, question_utilisateur: str, contexte_recupere: str) -> str:
-    """
-    Génère la réponse finale en utilisant Gemini, en augmentant le prompt
-    avec le contexte factuel récupéré par le RAG.
-    
-    :param client: Instance du client Gemini.
-    :param question_utilisateur: La question normalisée posée par l'utilisateur.
-    :param contexte_recupere: Le texte de contexte pertinent extrait du Vector Store.
-    :return: La réponse synthétisée par le LLM.
-    """
-    
-    # 1. Construction du Prompt Augmenté (le prompt principal injectant les données)
-    prompt_complet = f"""
+# Instruction courte, adaptée au contexte compact de context_packer (mêmes règles)
+SYSTEM_INSTRUCTION_RAG = """Agent de voyage de l'agence Alpha : ton professionnel et commercial, réponse concise en français.
+Utilise EXCLUSIVEMENT le CONTEXTE : un tableau de voyages (une ligne par voyage, colonnes séparées par |, valeurs communes à toutes les lignes écrites au-dessus) ou des statistiques.
+Si l'information n'y est pas, réponds : "Je suis désolé, je n'ai pas trouvé d'information précise dans nos documents de voyage concernant cette requête."
+Ne mentionne ni le contexte ni les documents."""
+
+# Réponse renvoyée lorsque la génération échoue (jamais mise en cache)
+MESSAGE_ERREUR_GENERATION = "Une erreur interne est survenue lors de la tentative de génération de la réponse."
+
+def _prompt_rag(question_utilisateur: str, contexte_recupere: str) -> str:
+    """Construit le prompt augmenté (le prompt principal injectant les données)."""
+    if context_packer.COMPACT_CONTEXT_ENABLED:
+        return f"CONTEXTE :\n{contexte_recupere}\n\nQUESTION : {question_utilisateur}"
+    return _prompt_rag_complet(question_utilisateur, contexte_recupere)
+
+def _prompt_rag_complet(question_utilisateur: str, contexte_recupere: str) -> str:
+    """Prompt augmenté d'origine (contexte complet)."""
+    return f"""
     CONTEXTE FACTUEL :
     ---
     {contexte_recupere}
@@ -90,18 +200,144 @@ def generer_reponse_rag(client: genai.Client, question_utilisateur: str, context
     Répondez à la question en utilisant le CONTEXTE FACTUEL ci-dessus et en respectant les instructions.
     """
 
-    # 2. Configuration et Appel à l'API Gemini
+def _system_instruction_rag() -> str:
+    return SYSTEM_INSTRUCTION_RAG if context_packer.COMPACT_CONTEXT_ENABLED else SYSTEM_INSTRUCTION_RAG_COMPLETE
+
+def estimer_tokens_prompt(question_utilisateur: str, contexte_recupere: str) -> int:
+    """Tokens estimés (sans appel réseau) de l'instruction système et du prompt de génération."""
+    return context_packer.estimate_tokens(_system_instruction_rag() + _prompt_rag(question_utilisateur, contexte_recupere))
+
+def estimer_tokens_prompt_complet(question_utilisateur: str, hits: list) -> int:
+    """Tokens estimés du prompt d'origine (instruction et contexte complets) pour les mêmes voyages."""
+    return context_packer.estimate_tokens(
+        SYSTEM_INSTRUCTION_RAG_COMPLETE
+        + _prompt_rag_complet(question_utilisateur, context_packer.legacy_context(hits))
+    )
+
+def _config_rag() -> "types.GenerateContentConfig":
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        system_instruction=_system_instruction_rag(),
+        # Basse température pour une réponse factuelle et peu créative
+        temperature=0.1 
+    )
+
+def generer_reponse_rag(client: "genai.Client", question_utilisateur: str, contexte_recupere: str,
+                        usage: UsageGeneration | None = None) -> str:
+    """
+    Génère la réponse finale en utilisant Gemini, en augmentant le prompt
+    avec le contexte factuel récupéré par le RAG.
+    
+    :param client: Instance du client Gemini.
+    :param question_utilisateur: La question normalisée posée par l'utilisateur.
+    :param contexte_recupere: Le texte de contexte pertinent extrait du Vector Store.
+    :param usage: Reçoit, si fourni, les tokens facturés de l'appel.
+    :return: La réponse synthétisée par le LLM.
+    """
+    debut = time.perf_counter()
     try:
         response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt_complet,
-            config=types.GenerateContentConfig(
-                system_instruction=SYSTEM_INSTRUCTION_RAG,
-                # Basse température pour une réponse factuelle et peu créative
-                temperature=0.1 
-            )
+            model=GEMINI_MODEL,
+            contents=_prompt_rag(question_utilisateur, contexte_recupere),
+            config=_config_rag()
+        )
+        _enregistrer_appel_gemini("generation", debut, response, usage)
+        return response.text
+    except Exception as e:
+        metrics.increment("gemini_errors_total", operation="generation")
+        notifications.error(f"Erreur lors de la génération de la réponse finale par Gemini : {e}")
+        return MESSAGE_ERREUR_GENERATION
+
+# --- Génération en Flux (token par token) ---
+
+@dataclass
+class LatenceGeneration:
+    """Latences mesurées d'une génération en flux (en secondes) et issue du flux."""
+    premier_token_s: float | None = None
+    total_s: float | None = None
+    # Vrai seulement si le flux est allé à son terme sans erreur : un texte partiel
+    # suivi de MESSAGE_ERREUR_GENERATION ne doit pas être mis en cache
+    terminee: bool = False
+
+def generer_reponse_rag_stream(client: "genai.Client", question_utilisateur: str, contexte_recupere: str,
+                               latence: LatenceGeneration | None = None,
+                               usage: UsageGeneration | None = None) -> Iterator[str]:
+    """
+    Variante en flux de generer_reponse_rag : produit le texte au fur et à mesure
+    de sa génération (à afficher avec st.write_stream). Si `latence` est fourni,
+    il reçoit le temps jusqu'au premier token, le temps total et `terminee` ;
+    `usage`, les tokens facturés (portés par le dernier fragment).
+    En cas d'erreur, MESSAGE_ERREUR_GENERATION est produit à la suite du texte
+    déjà généré et `latence.terminee` reste faux.
+    """
+    latence = latence if latence is not None else LatenceGeneration()
+    debut = time.perf_counter()
+    dernier_chunk = None
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=_prompt_rag(question_utilisateur, contexte_recupere),
+            config=_config_rag()
+        ):
+            dernier_chunk = chunk
+            if chunk.text:
+                if latence.premier_token_s is None:
+                    latence.premier_token_s = time.perf_counter() - debut
+                    metrics.observe("gemini_seconds", latence.premier_token_s, operation="premier_token")
+                yield chunk.text
+        # Le dernier fragment porte le décompte de tokens de toute la réponse
+        _enregistrer_appel_gemini("generation", debut, dernier_chunk, usage)
+        latence.terminee = True
+    except Exception as e:
+        metrics.increment("gemini_errors_total", operation="generation")
+        notifications.error(f"Erreur lors de la génération de la réponse finale par Gemini : {e}")
+        yield MESSAGE_ERREUR_GENERATION
+    finally:
+        latence.total_s = time.perf_counter() - debut
+
+async def generer_reponse_rag_async(client: "genai.Client", question_utilisateur: str,
+                                    contexte_recupere: str, usage: UsageGeneration | None = None) -> str:
+    """Version asynchrone de generer_reponse_rag."""
+    debut = time.perf_counter()
+    try:
+        response = await client.aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=_prompt_rag(question_utilisateur, contexte_recupere),
+            config=_config_rag()
         )
+        _enregistrer_appel_gemini("generation", debut, response, usage)
         return response.text
     except Exception as e:
-        st.error(f"Erreur lors de la génération de la réponse finale par Gemini : {e}")
-        return "Une erreur interne est survenue lors de la tentative de génération de la réponse."
\ No newline at end of file
+        metrics.increment("gemini_errors_total", operation="generation")
+        notifications.error(f"Erreur lors de la génération de la réponse finale par Gemini : {e}")
+        return MESSAGE_ERREUR_GENERATION
+
+async def generer_reponse_rag_stream_async(client: "genai.Client", question_utilisateur: str,
+                                           contexte_recupere: str,
+                                           latence: LatenceGeneration | None = None,
+                                           usage: UsageGeneration | None = None) -> AsyncIterator[str]:
+    """Version asynchrone de generer_reponse_rag_stream (générateur asynchrone)."""
+    latence = latence if latence is not None else LatenceGeneration()
+    debut = time.perf_counter()
+    dernier_chunk = None
+    try:
+        async for chunk in await client.aio.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=_prompt_rag(question_utilisateur, contexte_recupere),
+            config=_config_rag()
+        ):
+            dernier_chunk = chunk
+            if chunk.text:
+                if latence.premier_token_s is None:
+                    latence.premier_token_s = time.perf_counter() - debut
+                    metrics.observe("gemini_seconds", latence.premier_token_s, operation="premier_token")
+                yield chunk.text
+        _enregistrer_appel_gemini("generation", debut, dernier_chunk, usage)
+        latence.terminee = True
+    except Exception as e:
+        metrics.increment("gemini_errors_total", operation="generation")
+        notifications.error(f"Erreur lors de la génération de la réponse finale par Gemini : {e}")
+        yield MESSAGE_ERREUR_GENERATION
+    finally:
+        latence.total_s = time.perf_counter() - debut
@@ -0,0 +1,204 @@
+# rag_core/metrics.py
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Bornes des histogrammes : latences (s), tailles de lots, nombres de tokens
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Journalise une trace JSON (durée de chaque étape) par requête traitée
+TRACE_LOG_ENABLED = os.getenv("RAG_TRACE_LOG", "0") == "1"
+
+# Descriptions exportées (# HELP) des métriques connues
+METRIC_HELP = {
+    "stage_seconds": "Durée de chaque étape du pipeline RAG",
+    "requests_total": "Requêtes traitées par le pipeline, par statut",
+    "embedding_batch_size": "Nombre de textes par appel d'encodage LaBSE",
+    "embedding_seconds": "Durée des appels d'encodage LaBSE",
+    "chroma_query_seconds": "Durée des requêtes de similarité Chroma",
+    "lexical_query_seconds": "Durée des recherches BM25 dans l'index lexical",
+    "retrieval_route_total": "Recherches par voie (reference, hybride, dense)",
+    "aggregate_intents_total": "Questions analytiques répondues par les agrégats, par opération",
+    "gemini_seconds": "Latence des appels Gemini, par opération",
+    "gemini_tokens": "Tokens par appel Gemini (prompt / réponse)",
+    "prompt_tokens": "Tokens estimés du prompt de génération (envoyé / format complet d'origine)",
+    "gemini_errors_total": "Appels Gemini en erreur, par opération",
+    "gemini_retries_total": "Nouveaux essais Gemini après une erreur passagère, par code",
+    "gemini_coalesced_total": "Appels Gemini identiques fusionnés avec un appel en cours",
+    "gemini_throttle_seconds": "Attente imposée par le limiteur de débit Gemini",
+    "normalisation_total": "Requêtes normalisées, par source (locale / gemini)",
+    "query_cache_lookups_total": "Consultations du cache de réponses, par niveau et résultat",
+    "query_cache_evictions_total": "Entrées évincées du cache de réponses",
+    "startup_seconds": "Durée des étapes du préchargement au démarrage",
+}
+
+logger = logging.getLogger("rag_core.metrics")
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes (au format Prometheus)."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # dernier compartiment : +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Estimation d'un quantile par interpolation linéaire dans le compartiment concerné."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if cumulative + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes étiquetés du processus (thread-safe)."""
+
+    def __init__(self, prefix: str = "rag"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}     # nom -> {labels: valeur}
+        self._histograms = {}   # nom -> (bornes, {labels: Histogram})
+
+    def increment(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _labels_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        with self._lock:
+            _, series = self._histograms.setdefault(name, (buckets, {}))
+            key = _labels_key(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # --- Export ---
+
+    def to_prometheus(self) -> str:
+        """Export au format texte Prometheus (exposition 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full_name = f"{self.prefix}_{name}"
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {full_name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {full_name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{full_name}{_format_labels(labels)} {value:g}")
+            for name, (buckets, series) in sorted(self._histograms.items()):
+                full_name = f"{self.prefix}_{name}"
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {full_name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(buckets + ("+Inf",), histogram.counts):
+                        cumulative += n
+                        le = bound if bound == "+Inf" else f"{bound:g}"
+                        lines.append(f"{full_name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        """Instantané JSON : compteurs, et pour chaque histogramme count / sum / p50 / p95 / p99."""
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(labels), "value": value} for labels, value in sorted(series.items())]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(labels),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "mean": h.sum / h.count if h.count else None,
+                        "p50": h.quantile(0.5),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                    }
+                    for labels, h in sorted(series.items())
+                ]
+                for name, (_, series) in self._histograms.items()
+            }
+        return {"timestamp": time.time(), "counters": counters, "histograms": histograms}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+# --- Registre du processus ---
+
+REGISTRY = MetricsRegistry()
+
+
+def increment(name: str, value: float = 1, **labels):
+    REGISTRY.increment(name, value, **labels)
+
+
+def observe(name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+    REGISTRY.observe(name, value, buckets=buckets, **labels)
+
+
+@contextmanager
+def timed(stage: str, trace: dict | None = None):
+    """
+    Mesure la durée d'une étape du pipeline (histogramme rag_stage_seconds{stage=...}).
+    Si `trace` est fourni, la durée y est aussi ajoutée (trace par requête).
+    """
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        duree = time.perf_counter() - debut
+        REGISTRY.observe("stage_seconds", duree, stage=stage)
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + duree
+
+
+def log_trace(requete: str, trace: dict, **fields):
+    """Journalise la trace d'une requête en JSON (si RAG_TRACE_LOG=1)."""
+    if TRACE_LOG_ENABLED:
+        logger.info(json.dumps(
+            {"requete": requete, "stages_s": {k: round(v, 6) for k, v in trace.items()}, **fields},
+            ensure_ascii=False
+        ))
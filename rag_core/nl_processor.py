@@ -0,0 +1,482 @@
+# rag_core/nl_processor.py
+
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+
+# --- Synonymes (requête normalisée en français / anglais -> valeurs du dataset) ---
+# Les clés et les valeurs sont comparées après normalisation (minuscules, sans accents)
+ACCOMMODATION_SYNONYMS = {
+    "hotel": ["hotel"],
+    "hotels": ["hotel"],
+    "auberge": ["hostel"],
+    "auberge de jeunesse": ["hostel"],
+    "hostel": ["hostel"],
+    "resort": ["resort"],
+    "complexe hotelier": ["resort"],
+    "villa": ["villa"],
+    "airbnb": ["airbnb"],
+    "appartement": ["airbnb", "vacation rental"],
+    "location de vacances": ["vacation rental"],
+    "riad": ["riad"],
+    "maison d'hotes": ["guesthouse"],
+    "guesthouse": ["guesthouse"],
+}
+TRANSPORTATION_SYNONYMS = {
+    "avion": ["flight", "plane", "airplane"],
+    "vol": ["flight", "plane", "airplane"],
+    "vols": ["flight", "plane", "airplane"],
+    "flight": ["flight", "plane", "airplane"],
+    "plane": ["flight", "plane", "airplane"],
+    "train": ["train"],
+    "bus": ["bus"],
+    "voiture": ["car", "car rental"],
+    "location de voiture": ["car rental"],
+    "car": ["car", "car rental"],
+    "ferry": ["ferry"],
+    "bateau": ["ferry"],
+    "metro": ["subway"],
+    "subway": ["subway"],
+}
+# Exonymes français des villes et pays du dataset (les pays sont des alias des destinations)
+DESTINATION_SYNONYMS = {
+    "londres": ["london"],
+    "royaume-uni": ["uk"],
+    "royaume uni": ["uk"],
+    "angleterre": ["uk"],
+    "thailande": ["thailand"],
+    "indonesie": ["indonesia"],
+    "japon": ["japan"],
+    "etats-unis": ["usa"],
+    "etats unis": ["usa"],
+    "australie": ["australia"],
+    "bresil": ["brazil"],
+    "pays-bas": ["netherlands"],
+    "pays bas": ["netherlands"],
+    "hollande": ["netherlands"],
+    "emirats arabes unis": ["united arab emirates"],
+    "emirats": ["united arab emirates"],
+    "doubai": ["dubai"],
+    "mexique": ["mexico"],
+    "barcelone": ["barcelona"],
+    "espagne": ["spain"],
+    "hawai": ["hawaii"],
+    "allemagne": ["germany"],
+    "maroc": ["morocco"],
+    "edimbourg": ["edinburgh"],
+    "ecosse": ["scotland"],
+    "italie": ["italy"],
+    "afrique du sud": ["south africa"],
+    "coree du sud": ["south korea"],
+    "coree": ["south korea"],
+    "tunisie": ["tunisia"],
+}
+# Nationalités en français (toutes les formes) et pluriels anglais -> valeurs du dataset
+NATIONALITY_SYNONYMS = {
+    form: [nationality]
+    for nationality, forms in {
+        "american": ["americain", "americaine", "americains", "americaines", "americans"],
+        "canadian": ["canadien", "canadienne", "canadiens", "canadiennes", "canadians"],
+        "korean": ["coreen", "coreenne", "coreens", "coreennes", "koreans"],
+        "british": ["britannique", "britanniques", "anglais", "anglaise", "anglaises"],
+        "vietnamese": ["vietnamien", "vietnamienne", "vietnamiens", "vietnamiennes"],
+        "australian": ["australien", "australienne", "australiens", "australiennes", "australians"],
+        "brazilian": ["bresilien", "bresilienne", "bresiliens", "bresiliennes", "brazilians"],
+        "dutch": ["neerlandais", "neerlandaise", "neerlandaises", "hollandais", "hollandaise", "hollandaises"],
+        "emirati": ["emirien", "emirienne", "emiriens", "emiriennes", "emiratis"],
+        "mexican": ["mexicain", "mexicaine", "mexicains", "mexicaines", "mexicans"],
+        "spanish": ["espagnol", "espagnole", "espagnols", "espagnoles"],
+        "chinese": ["chinois", "chinoise", "chinoises"],
+        "german": ["allemand", "allemande", "allemands", "allemandes", "germans"],
+        "moroccan": ["marocain", "marocaine", "marocains", "marocaines", "moroccans"],
+        "scottish": ["ecossais", "ecossaise", "ecossaises"],
+        "indian": ["indien", "indienne", "indiens", "indiennes", "indians"],
+        "italian": ["italien", "italienne", "italiens", "italiennes", "italians"],
+        "south african": ["sud-africain", "sud-africaine", "sud-africains", "sud-africaines", "south africans"],
+        "tunisian": ["tunisien", "tunisienne", "tunisiens", "tunisiennes", "tunisians"],
+        "french": ["francais", "francaise", "francaises"],
+    }.items()
+    for form in forms
+}
+
+# Champs de métadonnées filtrables et leurs synonymes
+FILTER_FIELDS = {
+    "destination": DESTINATION_SYNONYMS,
+    "accommodation_type": ACCOMMODATION_SYNONYMS,
+    "transportation_type": TRANSPORTATION_SYNONYMS,
+    "traveler_nationality": NATIONALITY_SYNONYMS,
+}
+# Une nationalité n'est retenue qu'à au plus NATIONALITY_WINDOW mots d'un de ces termes
+# (« voyageurs français », « American travelers », « de nationalité italienne ») :
+# seule, elle qualifie souvent autre chose (« French cuisine », « the Italian job »)
+NATIONALITY_CUES = re.compile(
+    r"(?<!\w)(?:voyageu(?:r|rs|se|ses)|travell?ers?|touristes?|tourists?|nationalite|nationality)(?!\w)"
+)
+NATIONALITY_WINDOW = 2
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation superflue (pour les comparaisons)."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+@lru_cache(maxsize=4096)
+def _term_pattern(term: str) -> re.Pattern:
+    return re.compile(rf"(?<!\w){re.escape(term)}(?!\w)")
+
+
+def _contains_term(normalized_query: str, term: str) -> bool:
+    """Vrai si `term` apparaît comme mot (ou groupe de mots) entier dans la requête."""
+    # Test de sous-chaîne d'abord : l'expression régulière ne sert qu'à vérifier les bornes des mots
+    return bool(term) and term in normalized_query and _term_pattern(term).search(normalized_query) is not None
+
+
+def _near_nationality_cue(normalized_query: str, term: str) -> bool:
+    """Vrai si `term` apparaît à au plus NATIONALITY_WINDOW mots d'un terme de NATIONALITY_CUES."""
+    if not _contains_term(normalized_query, term):
+        return False
+    for match in _term_pattern(term).finditer(normalized_query):
+        for cue in NATIONALITY_CUES.finditer(normalized_query):
+            first, second = sorted((match, cue), key=lambda m: m.start())
+            if len(re.findall(r"\w+", normalized_query[first.end():second.start()])) <= NATIONALITY_WINDOW:
+                return True
+    return False
+
+
+def _mentions(normalized_query: str, field: str, term: str) -> bool:
+    """Vrai si la requête mentionne `term` pour le champ `field`."""
+    if field == "traveler_nationality":
+        return _near_nationality_cue(normalized_query, term)
+    return _contains_term(normalized_query, term)
+
+
+@lru_cache(maxsize=4096)
+def _value_aliases(value: str) -> tuple:
+    """
+    Formes reconnues d'une valeur, la forme normalisée en premier :
+    'Paris, France' -> ('paris, france', 'paris', 'france').
+    """
+    normalized = normalize_text(value)
+    if "," in normalized:
+        return (normalized, *(part.strip() for part in normalized.split(",") if part.strip()))
+    return (normalized,)
+
+
+def _match_filters(normalized_query: str, known_values: dict) -> tuple[dict, set]:
+    """
+    Filtres reconnus dans la requête normalisée et termes de la requête qui les ont
+    produits (alias des valeurs ou synonymes), pour repérer les lieux non résolus.
+    """
+    filters, matched_terms = {}, set()
+    for field, synonyms in FILTER_FIELDS.items():
+        # Termes de la requête traduits via les synonymes (ex : 'hôtel' -> 'hotel')
+        translated = {
+            term: targets for term, targets in synonyms.items() if _mentions(normalized_query, field, term)
+        }
+        matches = []
+        for value in known_values.get(field) or []:
+            aliases = _value_aliases(value)
+            terms = [term for term, targets in translated.items() if any(alias in targets for alias in aliases)]
+            terms += [alias for alias in aliases if _mentions(normalized_query, field, alias)]
+            if terms:
+                matches.append(value)
+                matched_terms.update(terms)
+        if matches:
+            filters[field] = sorted(matches)
+    return filters, matched_terms
+
+
+def extract_metadata_filters(query: str, known_values: dict) -> dict:
+    """
+    Repère dans la requête les valeurs de métadonnées connues de la base
+    (destination, type d'hébergement, transport, nationalité), y compris via leurs
+    noms français (« Londres », « Japon », « voyageurs français »). Une nationalité
+    doit accompagner un voyageur (voir NATIONALITY_CUES).
+
+    :param known_values: {champ: [valeurs distinctes présentes dans la base]}
+    :return: {champ: [valeurs exactes de la base]} pour les champs reconnus.
+    """
+    return _match_filters(normalize_text(query), known_values)[0]
+
+
+def build_chroma_where(filters: dict) -> dict | None:
+    """Traduit {champ: valeur | [valeurs]} en clause `where` Chroma."""
+    clauses = []
+    for field, values in (filters or {}).items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        values = sorted(values)
+        if not values:
+            continue
+        clauses.append({field: values[0]} if len(values) == 1 else {field: {"$in": values}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+# --- Détection de Langue Locale (contournement de la normalisation Gemini) ---
+
+# Active le pré-traitement local : les requêtes propres en français / anglais
+# sont vectorisées directement (LaBSE est multilingue), sans appel Gemini.
+LOCAL_NORMALIZATION_ENABLED = os.getenv("LOCAL_NORMALIZATION", "1") == "1"
+
+FRENCH_MARKERS = {
+    "le", "la", "les", "de", "des", "du", "un", "une", "et", "pour", "en", "au", "aux", "je",
+    "j'aimerais", "voudrais", "cherche", "quel", "quelle", "quels", "quelles", "combien",
+    "est", "sont", "avec", "sur", "dans", "pas", "cout", "prix", "voyage", "voyages",
+    "sejour", "hebergement", "moyen", "ou", "quand", "mon", "ma", "mes", "vers", "partir",
+}
+ENGLISH_MARKERS = {
+    "the", "a", "an", "of", "to", "for", "in", "on", "with", "is", "are", "what", "which",
+    "how", "much", "many", "i", "want", "would", "like", "trip", "trips", "travel", "cost",
+    "price", "cheap", "where", "when", "my", "book", "stay", "average", "from", "does",
+}
+# Mots de Derja tunisien écrits en alphabet latin (arabizi)
+DERJA_LATIN_MARKERS = {
+    "nheb", "n7eb", "nhebb", "chnowa", "chnoua", "chnia", "kifech", "kifeh", "barcha", "mta3",
+    "mte3", "fama", "famma", "bech", "bch", "nemchi", "nsafer", "nsefer", "9adech", "9addech",
+    "kadech", "ena", "inti", "enti", "brabi", "3aslema", "ahla", "sahbi", "lbled", "chouf",
+    "wa9tech", "win", "mnin", "3andi", "3andek", "ya3tik", "yesser", "chwaya", "behi", "mouch",
+}
+# Formules de politesse retirées par la normalisation locale
+FILLER_PATTERN = re.compile(
+    r"^(?:(?:bonjour|bonsoir|salut|hello|hi|hey|svp|s'il vous plait|s'il te plait|please|merci)[\s,!.]*)+"
+    r"|(?:[\s,!.]*(?:svp|s'il vous plait|s'il te plait|please|merci(?: beaucoup)?|thanks|thank you))+[\s!.]*$",
+    re.IGNORECASE
+)
+ARABIC_CHAR = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+# Chiffres utilisés comme lettres en arabizi : '3andi', 'n7eb', '9adech'
+ARABIZI_TOKEN = re.compile(r"^(?=.*[a-z])(?=.*[235789])[a-z235789']+$")
+MAX_LOCAL_QUERY_CHARS = 300
+
+
+@dataclass
+class DetectionLangue:
+    """Résultat de l'identification locale de la langue d'une requête."""
+    langue: str          # 'fr', 'en', 'ar', 'derja' ou 'inconnue'
+    propre: bool         # requête exploitable telle quelle (sans passer par Gemini)
+    raison: str = ""
+
+
+def detect_language(requete: str) -> DetectionLangue:
+    """
+    Identifie l'écriture et la langue de la requête par heuristiques (sans appel réseau)
+    et indique si elle est assez propre pour être vectorisée directement.
+    """
+    texte = requete.strip()
+    lettres = [c for c in texte if c.isalpha()]
+    if not lettres:
+        return DetectionLangue("inconnue", False, "aucune lettre")
+
+    # 1. Écriture arabe (arabe classique ou Derja) -> traduction Gemini
+    if sum(1 for c in lettres if ARABIC_CHAR.match(c)) / len(lettres) > 0.3:
+        return DetectionLangue("ar", False, "écriture arabe")
+
+    tokens = re.findall(r"[\w']+", normalize_text(texte))
+    # 2. Derja en alphabet latin (arabizi)
+    if any(t in DERJA_LATIN_MARKERS or ARABIZI_TOKEN.match(t) for t in tokens):
+        return DetectionLangue("derja", False, "arabizi")
+
+    # 3. Français ou anglais selon les mots-outils
+    score_fr = sum(t in FRENCH_MARKERS for t in tokens)
+    score_en = sum(t in ENGLISH_MARKERS for t in tokens)
+    if score_fr == score_en:
+        return DetectionLangue("inconnue", False, "langue indéterminée")
+    langue = "fr" if score_fr > score_en else "en"
+
+    # 4. Requête « sale » : trop longue, ponctuation excessive, lettres répétées, tout en majuscules
+    if len(texte) > MAX_LOCAL_QUERY_CHARS:
+        return DetectionLangue(langue, False, "requête trop longue")
+    if sum(1 for c in texte if not (c.isalnum() or c.isspace() or c in "'-,.?!")) / len(texte) > 0.15:
+        return DetectionLangue(langue, False, "caractères spéciaux")
+    if re.search(r"(\w)\1{3,}|[!?.]{3,}", texte):
+        return DetectionLangue(langue, False, "répétitions")
+    if len(lettres) > 12 and texte.upper() == texte:
+        return DetectionLangue(langue, False, "majuscules")
+    return DetectionLangue(langue, True)
+
+
+def normalisation_locale(requete: str) -> str | None:
+    """
+    Normalisation heuristique bon marché : retourne la requête nettoyée si elle est
+    en français ou en anglais propre, sinon None (à confier à Gemini).
+    """
+    if not detect_language(requete).propre:
+        return None
+    texte = FILLER_PATTERN.sub("", re.sub(r"\s+", " ", requete).strip()).strip(" ,")
+    return texte or None
+
+
+# --- Questions Analytiques (compter, moyenne, minimum, maximum) ---
+
+# Opérations reconnues (requête normalisée) ; les mesures sont les colonnes de travel_stats.MEASURES
+AGGREGATE_OPERATIONS = {
+    "avg": ["moyen", "moyenne", "moyens", "moyennes", "en moyenne", "average", "mean", "avg"],
+    "min": ["minimum", "minimal", "minimale", "min", "moins cher", "moins chere", "moins chers",
+            "moins cheres", "le plus bas", "la plus basse", "le plus court", "la plus courte",
+            "le plus jeune", "cheapest", "lowest", "shortest", "youngest"],
+    "max": ["maximum", "maximal", "maximale", "max", "plus cher", "plus chere", "plus chers",
+            "plus cheres", "le plus eleve", "la plus elevee", "le plus long", "la plus longue",
+            "le plus age", "most expensive", "highest", "longest", "oldest"],
+    "count": ["combien de", "nombre de", "how many", "number of", "count"],
+}
+COST_TERMS = ["cout", "couts", "coute", "coutent", "prix", "tarif", "tarifs", "budget", "depense", "depenses", "cher", "chere",
+              "chers", "cheres", "cost", "costs", "price", "prices", "spend", "expensive", "cheapest"]
+ACCOMMODATION_COST_TERMS = ["hebergement", "logement", "nuitee", "accommodation", "lodging"]
+TRANSPORT_COST_TERMS = ["transport", "transports", "billet", "billets", "trajet", "transportation", "ticket", "fare"]
+DURATION_TERMS = ["duree", "jours", "nuits", "long", "longue", "court", "courte", "duration", "days", "longest",
+                  "shortest"]
+AGE_TERMS = ["age", "ages", "ans", "jeune", "old", "oldest", "youngest", "young"]
+# Sans filtre ni regroupement, un décompte doit porter sur des voyages
+TRIP_TERMS = ["voyage", "voyages", "sejour", "sejours", "voyageur", "voyageurs", "trip", "trips", "travel",
+              "travels", "traveler", "travelers", "traveller", "travellers", "reservation", "reservations"]
+MEANS_OF_TRANSPORT = re.compile(r"\bmoyens? de transports?\b")
+# Une opération ne compte que si elle qualifie une mesure à au plus AGGREGATE_WINDOW mots
+# (« coût moyen », « moyenne des prix ») ou, pour un décompte, des voyages (« combien de voyages »)
+AGGREGATE_WINDOW = 3
+# Adjectifs qui suivent la mesure qu'ils qualifient (« coût moyen ») ; placés avant, ce sont
+# des noms (« un moyen pas cher d'aller à Bali »)
+POSTPOSED_TERMS = {"moyen", "moyens"}
+# Lieu ou nationalité mentionnés mais absents des filtres (« à Lisbonne », « voyageurs japonais ») :
+# sans filtre, l'agrégat porterait à tort sur tout le dataset
+PLACE_PREPOSITIONS = {"a", "au", "aux", "en", "pour", "vers", "to", "in", "at"}
+NATIONALITY_ADJECTIVE = re.compile(r"(?:ais|aise|ois|oise|ien|ienne|een|eenne|ain|aine|ol|ole|ique|i|ie)s?$")
+DURATION_COUNT = re.compile(r"\b(?:combien de|nombre de|how many|number of) (?:jours|nuits|days|nights)\b")
+GROUP_BY_TERMS = {
+    "destination": ["par destination", "pour chaque destination", "per destination", "by destination",
+                    "each destination"],
+    "accommodation_type": ["par hebergement", "par type d'hebergement", "par logement", "quel hebergement",
+                           "quel type d'hebergement", "per accommodation", "by accommodation",
+                           "by accommodation type", "which accommodation"],
+    "transportation_type": ["par transport", "par mode de transport", "par type de transport", "quel transport",
+                            "per transport", "by transport", "by transportation", "by transportation type",
+                            "which transport", "which transportation"],
+}
+
+
+@dataclass
+class AggregateIntent:
+    """Question analytique reconnue : opération sur une mesure, filtres et regroupement éventuel."""
+    operation: str              # 'count', 'avg', 'min' ou 'max'
+    measure: str | None         # colonne de travel_stats.MEASURES (None pour un simple décompte)
+    filters: dict               # {champ: [valeurs exactes de la base]}
+    group_by: str | None = None
+
+
+def _terms_pattern(terms: list) -> re.Pattern:
+    """Une seule expression (compilée à l'import) pour tous les termes d'une liste, en mots entiers."""
+    alternatives = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+
+
+_OPERATION_PATTERNS = {op: _terms_pattern(terms) for op, terms in AGGREGATE_OPERATIONS.items()}
+_GROUP_BY_PATTERNS = {name: _terms_pattern(terms) for name, terms in GROUP_BY_TERMS.items()}
+_COST_PATTERN = _terms_pattern(COST_TERMS)
+_ACCOMMODATION_COST_PATTERN = _terms_pattern(ACCOMMODATION_COST_TERMS)
+_TRANSPORT_COST_PATTERN = _terms_pattern(TRANSPORT_COST_TERMS)
+_DURATION_PATTERN = _terms_pattern(DURATION_TERMS)
+_AGE_PATTERN = _terms_pattern(AGE_TERMS)
+_TRIP_PATTERN = _terms_pattern(TRIP_TERMS)
+_MEASURE_PATTERNS = (_COST_PATTERN, _DURATION_PATTERN, _AGE_PATTERN)
+
+
+def _qualifies(normalized_query: str, operation: str) -> bool:
+    """Vrai si l'opération porte sur une mesure (ou sur des voyages pour un décompte) proche."""
+    targets = (_TRIP_PATTERN,) if operation == "count" else _MEASURE_PATTERNS
+    for op_match in _OPERATION_PATTERNS[operation].finditer(normalized_query):
+        postposed = op_match.group() in POSTPOSED_TERMS
+        for pattern in targets:
+            for target in pattern.finditer(normalized_query):
+                if postposed and target.start() > op_match.start():
+                    continue
+                first, second = sorted((op_match, target), key=lambda m: m.start())
+                # Termes qui se chevauchent (« le plus cher ») ou séparés d'au plus AGGREGATE_WINDOW mots
+                between = normalized_query[first.end():second.start()]
+                if second.start() < first.end() or len(re.findall(r"\w+", between)) <= AGGREGATE_WINDOW:
+                    return True
+    return False
+
+
+def _aggregate_measure(normalized_query: str, filters: dict) -> str | None:
+    """Mesure visée : coût (hébergement, transport ou total), durée ou âge."""
+    if _COST_PATTERN.search(normalized_query):
+        if _ACCOMMODATION_COST_PATTERN.search(normalized_query):
+            return "accommodation_cost"
+        if _TRANSPORT_COST_PATTERN.search(normalized_query):
+            return "transportation_cost"
+        # « le prix d'un hôtel à Bali » : le type filtré désigne le poste de coût
+        if "accommodation_type" in filters and "transportation_type" not in filters:
+            return "accommodation_cost"
+        if "transportation_type" in filters and "accommodation_type" not in filters:
+            return "transportation_cost"
+        return "total_cost"
+    if _DURATION_PATTERN.search(normalized_query):
+        return "duration_days"
+    if _AGE_PATTERN.search(normalized_query):
+        return "traveler_age"
+    return None
+
+
+def _unresolved_mention(query: str, matched_terms: set) -> str | None:
+    """
+    Premier lieu ou nationalité de la requête qu'aucun filtre ne couvre : nom propre
+    après une préposition de lieu (« à Lisbonne », « in Lima »), adjectif après un
+    voyageur (« voyageurs japonais ») ou nom propre avant (« Japanese travelers »).
+    Heuristique sur la requête brute (les majuscules signalent les noms propres).
+    """
+    matched_words = {word for term in matched_terms for word in re.findall(r"\w+", term)}
+    tokens = re.findall(r"\w+(?:-\w+)*", query)
+    normalized = [normalize_text(token) for token in tokens]
+    for i, token in enumerate(normalized):
+        candidates = []
+        if token in PLACE_PREPOSITIONS and i + 1 < len(tokens) and tokens[i + 1][0].isupper():
+            candidates.append(i + 1)
+        if NATIONALITY_CUES.fullmatch(token):
+            if i + 1 < len(tokens) and NATIONALITY_ADJECTIVE.search(normalized[i + 1]):
+                candidates.append(i + 1)
+            if i > 0 and tokens[i - 1][0].isupper():
+                candidates.append(i - 1)
+        for j in candidates:
+            if re.findall(r"\w+", normalized[j])[0] not in matched_words:
+                return tokens[j]
+    return None
+
+
+def extract_aggregate_intent(query: str, known_values: dict) -> AggregateIntent | None:
+    """
+    Reconnaît une question analytique (combien, moyenne, minimum, maximum) portant
+    sur les coûts, la durée ou l'âge, avec les filtres de métadonnées de la requête.
+    L'opération doit qualifier la mesure (« coût moyen », « le plus cher »,
+    « combien de voyages ») : un mot isolé comme « moyen » ou « max » ne suffit pas.
+    Retourne None pour les autres questions, pour les conditions chiffrées
+    (« voyages de plus de 7 jours ») et pour les lieux ou nationalités qui ne
+    correspondent à aucune valeur de la base (« voyages à Lisbonne ») : la requête
+    retombe alors sur la recherche au lieu d'un agrégat sur tout le dataset.
+    """
+    # « moyen de transport » n'est pas une moyenne
+    normalized_query = MEANS_OF_TRANSPORT.sub("transport", normalize_text(query))
+    if re.search(r"\d", normalized_query):
+        return None
+    operations = [op for op in _OPERATION_PATTERNS if _qualifies(normalized_query, op)]
+    duration_count = DURATION_COUNT.search(normalized_query) is not None
+    if not operations and not duration_count:
+        return None
+
+    filters, matched_terms = _match_filters(normalize_text(query), known_values)
+    if _unresolved_mention(query, matched_terms) is not None:
+        return None
+    group_by = next(
+        (name for name, pattern in _GROUP_BY_PATTERNS.items() if pattern.search(normalized_query)), None
+    )
+    measure = _aggregate_measure(normalized_query, filters)
+    # Une statistique sur une mesure prime sur le décompte (« combien de voyages en moyenne... »)
+    operation = next((op for op in operations if op != "count"), None)
+    # « combien de jours dure un voyage à Bali » : durée moyenne, pas un décompte
+    if operation is None and duration_count:
+        operation, measure = "avg", "duration_days"
+    if operation is None:
+        operation = "count"
+    return AggregateIntent(operation=operation, measure=measure, filters=filters, group_by=group_by)
@@ -0,0 +1,65 @@
+# rag_core/notifications.py
+
+import logging
+import sys
+
+logger = logging.getLogger("rag_core")
+
+
+def in_streamlit() -> bool:
+    """Vrai si le code s'exécute dans un script Streamlit (et non en mode batch / thread de fond)."""
+    # Streamlit n'est pas importé ici (l'API et le mode batch s'en passent) :
+    # s'il n'est pas déjà chargé, aucun script Streamlit n'est en cours
+    if "streamlit" not in sys.modules:
+        return False
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:  # Anciennes versions de Streamlit
+        return False
+    try:
+        return get_script_run_ctx(suppress_warning=True) is not None
+    except TypeError:  # Versions sans le paramètre suppress_warning
+        return get_script_run_ctx() is not None
+
+
+# --- Messages : affichés dans l'interface sous Streamlit, journalisés sinon ---
+
+def info(message: str):
+    if in_streamlit():
+        import streamlit as st
+        st.info(message)
+    else:
+        logger.info(message)
+
+
+def success(message: str):
+    if in_streamlit():
+        import streamlit as st
+        st.success(message)
+    else:
+        logger.info(message)
+
+
+def warning(message: str):
+    if in_streamlit():
+        import streamlit as st
+        st.warning(message)
+    else:
+        logger.warning(message)
+
+
+def error(message: str):
+    if in_streamlit():
+        import streamlit as st
+        st.error(message)
+    else:
+        logger.error(message)
+
+
+def stop(message: str):
+    """Erreur bloquante : arrête le script Streamlit, ou lève RuntimeError hors Streamlit."""
+    if in_streamlit():
+        import streamlit as st
+        st.error(message)
+        st.stop()
+    raise RuntimeError(message)
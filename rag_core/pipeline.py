@@ -0,0 +1,283 @@
+# rag_core/pipeline.py
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from rag_core import context_packer, db_manager, llm_utils, metrics
+from rag_core.embeddings import QueryContext
+from rag_core.query_cache import CachedAnswer
+from rag_core.resources import SharedResources
+from rag_core.travel_stats import AggregateAnswer
+
+# Threads dédiés aux étapes CPU (encodage LaBSE, score d'anomalie, requête Chroma)
+PIPELINE_CPU_WORKERS = int(os.getenv("PIPELINE_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor = None
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Pool de threads du processus pour les étapes CPU appelées depuis du code asynchrone."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PIPELINE_CPU_WORKERS, thread_name_prefix="rag-cpu")
+    return _executor
+
+
+@dataclass
+class PipelineResult:
+    """Résultat du pipeline RAG pour une requête (sérialisable via to_dict)."""
+    requete: str
+    # 'ok', 'cache', 'hors_sujet', 'sans_contexte', 'erreur_normalisation' ou 'erreur_generation'
+    statut: str = "ok"
+    requete_normalisee: str | None = None
+    normalisation: str | None = None      # 'locale' ou 'gemini'
+    cache: str | None = None              # 'exact' ou 'semantique'
+    intention: str | None = None          # 'agregat' : réponse calculée sur les statistiques du dataset
+    score_anomalie: float | None = None
+    seuil_anomalie: float | None = None
+    filtres: dict = field(default_factory=dict)
+    resultats: list = field(default_factory=list)   # [{"trip_id", "score", "contenu"}]
+    contexte: str = ""
+    reponse: str | None = None
+    durees: dict = field(default_factory=dict)      # {étape: secondes}
+    # Tokens du prompt de génération : estimés (envoyé / format complet d'origine) et facturés
+    tokens: dict = field(default_factory=dict)      # {"prompt_estime", "prompt_complet_estime", "prompt", "reponse"}
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class RAGPipeline:
+    """
+    Pipeline RAG sans interface : normalisation, contrôle du sujet, recherche et
+    génération, avec le cache de réponses partagé. Chaque étape est exposée
+    séparément (pour l'affichage pas à pas de Streamlit) et enchaînée par
+    `run` (synchrone) ou `arun` (asynchrone, étapes CPU dans un pool de threads).
+    La durée de chaque étape est enregistrée dans rag_core.metrics et dans `trace`
+    (une instance par requête).
+    """
+
+    def __init__(self, shared: SharedResources, client, k: int = 3, locale: bool | None = None):
+        self.shared = shared
+        self.client = client
+        self.k = k
+        self.locale = locale
+        self.trace = {}
+        self.usage = llm_utils.UsageGeneration()
+        self._scopes = {}
+
+    # --- Étapes ---
+
+    def normalize(self, requete_brute: str) -> tuple[str | None, str]:
+        with metrics.timed("normalisation", self.trace):
+            return llm_utils.normaliser_requete(self.client, requete_brute, locale=self.locale)
+
+    def embed(self, contexte_requete: QueryContext) -> np.ndarray:
+        """Encode la requête normalisée (une seule fois, le vecteur reste dans le contexte)."""
+        with metrics.timed("embedding", self.trace):
+            return contexte_requete.vector
+
+    def lookup_exact(self, requete_brute: str) -> CachedAnswer | None:
+        with metrics.timed("cache", self.trace):
+            return self.shared.query_cache.get_exact(requete_brute)
+
+    def cache_scope(self, contexte_requete: QueryContext) -> tuple:
+        """Portée de la requête pour le cache sémantique (calculée une fois par requête)."""
+        if contexte_requete.text not in self._scopes:
+            self._scopes[contexte_requete.text] = db_manager.query_scope(
+                contexte_requete.text, self.shared.vectorstore, k=self.k, locale=self.locale
+            )
+        return self._scopes[contexte_requete.text]
+
+    def lookup_semantic(self, contexte_requete: QueryContext, requete_brute: str) -> CachedAnswer | None:
+        with metrics.timed("cache", self.trace):
+            return self.shared.query_cache.get_semantic(
+                contexte_requete.vector, requete_brute, scope=self.cache_scope(contexte_requete)
+            )
+
+    def check_anomaly(self, contexte_requete: QueryContext) -> tuple[bool, float]:
+        """Retourne (hors sujet ?, score) à partir du vecteur déjà calculé de la requête."""
+        detector = self.shared.detector
+        with metrics.timed("anomalie", self.trace):
+            score = float(detector.score_vectors(np.asarray(contexte_requete.vector).reshape(1, -1))[0])
+        return score < detector.scorer.threshold, score
+
+    def retrieve(self, contexte_requete: QueryContext) -> db_manager.SearchResult:
+        with metrics.timed("recherche", self.trace):
+            # Candidats supplémentaires : le budget de tokens du contexte décide combien sont gardés
+            return db_manager.search_db(
+                contexte_requete.text, self.shared.vectorstore, k=context_packer.candidate_count(self.k),
+                query_vector=contexte_requete.vector
+            )
+
+    def aggregate(self, contexte_requete: QueryContext) -> AggregateAnswer | None:
+        """Question analytique (combien, moyenne, min, max) : statistiques exactes au lieu de la recherche."""
+        with metrics.timed("agregats", self.trace):
+            return db_manager.answer_aggregate_question(contexte_requete.text)
+
+    def generate(self, requete_normalisee: str, contexte: str) -> str:
+        with metrics.timed("generation", self.trace):
+            return llm_utils.generer_reponse_rag(self.client, requete_normalisee, contexte, usage=self.usage)
+
+    def finish(self, result: PipelineResult) -> PipelineResult:
+        """Clôt la requête : compteur par statut et trace JSON (RAG_TRACE_LOG=1)."""
+        result.durees = {etape: round(duree, 6) for etape, duree in self.trace.items()}
+        if self.usage.tokens_prompt is not None:
+            result.tokens.update(prompt=self.usage.tokens_prompt, reponse=self.usage.tokens_reponse)
+        metrics.increment("requests_total", statut=result.statut)
+        metrics.log_trace(result.requete, self.trace, statut=result.statut, tokens=result.tokens)
+        return result
+
+    def remember(self, requete_brute: str, contexte_requete: QueryContext, contexte: str, reponse: str):
+        """Met la réponse en cache (sauf message d'erreur)."""
+        if reponse and reponse != llm_utils.MESSAGE_ERREUR_GENERATION:
+            self.shared.query_cache.put(requete_brute, contexte_requete.vector, CachedAnswer(
+                requete_normalisee=contexte_requete.text, contexte=contexte, reponse=reponse
+            ), scope=self.cache_scope(contexte_requete))
+
+    # --- Enchaînement ---
+    # Les apply_* reportent le résultat d'une étape dans PipelineResult et indiquent si
+    # la requête continue ; l'interface Streamlit les utilise pour ses étapes affichées.
+
+    @staticmethod
+    def from_cache(result: PipelineResult, answer: CachedAnswer, niveau: str) -> PipelineResult:
+        result.statut = "cache"
+        result.cache = niveau
+        result.requete_normalisee = answer.requete_normalisee
+        result.contexte = answer.contexte
+        result.reponse = answer.reponse
+        return result
+
+    def apply_anomaly(self, result: PipelineResult, anomalie: bool, score: float) -> bool:
+        result.score_anomalie = score
+        result.seuil_anomalie = float(self.shared.detector.scorer.threshold)
+        if anomalie:
+            result.statut = "hors_sujet"
+        return anomalie
+
+    def measure_prompt(self, result: PipelineResult, hits: list | None = None):
+        """
+        Tokens estimés du prompt de génération et, pour une recherche, du prompt
+        d'origine (instruction et résumés complets) sur les k premiers voyages.
+        """
+        result.tokens["prompt_estime"] = llm_utils.estimer_tokens_prompt(result.requete_normalisee, result.contexte)
+        metrics.observe("prompt_tokens", result.tokens["prompt_estime"], buckets=metrics.TOKEN_BUCKETS,
+                        format="envoye")
+        if hits:
+            complet = llm_utils.estimer_tokens_prompt_complet(result.requete_normalisee, hits[:self.k])
+            result.tokens["prompt_complet_estime"] = complet
+            metrics.observe("prompt_tokens", complet, buckets=metrics.TOKEN_BUCKETS, format="complet")
+
+    def apply_search(self, result: PipelineResult, recherche: db_manager.SearchResult) -> bool:
+        result.filtres = recherche.filters
+        result.contexte = recherche.context
+        result.resultats = [
+            {"trip_id": doc.metadata.get("trip_id"), "score": round(float(score), 4), "contenu": doc.page_content}
+            for doc, score in recherche.hits
+        ]
+        if not recherche:
+            result.statut = "sans_contexte"
+            return False
+        self.measure_prompt(result, recherche.hits)
+        return True
+
+    def apply_aggregate(self, result: PipelineResult, agregat: AggregateAnswer | None) -> bool:
+        if agregat is None:
+            return False
+        result.intention = "agregat"
+        result.filtres = agregat.filters
+        result.contexte = agregat.facts
+        self.measure_prompt(result)
+        return True
+
+    @staticmethod
+    def apply_answer(result: PipelineResult, reponse: str):
+        result.reponse = reponse
+        if reponse == llm_utils.MESSAGE_ERREUR_GENERATION:
+            result.statut = "erreur_generation"
+
+    def run(self, requete_brute: str) -> PipelineResult:
+        with metrics.timed("total", self.trace):
+            result = self._run(requete_brute)
+        return self.finish(result)
+
+    def _run(self, requete_brute: str) -> PipelineResult:
+        result = PipelineResult(requete=requete_brute)
+
+        answer = self.lookup_exact(requete_brute)
+        if answer:
+            return self.from_cache(result, answer, "exact")
+
+        result.requete_normalisee, result.normalisation = self.normalize(requete_brute)
+        if not result.requete_normalisee:
+            result.statut = "erreur_normalisation"
+            return result
+
+        contexte_requete = QueryContext(result.requete_normalisee)
+        self.embed(contexte_requete)
+        answer = self.lookup_semantic(contexte_requete, requete_brute)
+        if answer:
+            return self.from_cache(result, answer, "semantique")
+
+        if self.apply_anomaly(result, *self.check_anomaly(contexte_requete)):
+            return result
+        if (not self.apply_aggregate(result, self.aggregate(contexte_requete))
+                and not self.apply_search(result, self.retrieve(contexte_requete))):
+            return result
+
+        self.apply_answer(result, self.generate(result.requete_normalisee, result.contexte))
+        self.remember(requete_brute, contexte_requete, result.contexte, result.reponse)
+        return result
+
+    async def arun(self, requete_brute: str) -> PipelineResult:
+        """Version asynchrone de run : les appels Gemini n'occupent pas de thread."""
+        with metrics.timed("total", self.trace):
+            result = await self._arun(requete_brute)
+        return self.finish(result)
+
+    async def _arun(self, requete_brute: str) -> PipelineResult:
+        loop = asyncio.get_running_loop()
+        executor = get_cpu_executor()
+        result = PipelineResult(requete=requete_brute)
+
+        answer = self.lookup_exact(requete_brute)
+        if answer:
+            return self.from_cache(result, answer, "exact")
+
+        with metrics.timed("normalisation", self.trace):
+            result.requete_normalisee, result.normalisation = await llm_utils.normaliser_requete_async(
+                self.client, requete_brute, locale=self.locale
+            )
+        if not result.requete_normalisee:
+            result.statut = "erreur_normalisation"
+            return result
+
+        contexte_requete = QueryContext(result.requete_normalisee)
+        # Encodage LaBSE et portée du cache (filtres, références) dans le pool CPU
+        await loop.run_in_executor(executor, self.embed, contexte_requete)
+        answer = await loop.run_in_executor(executor, self.lookup_semantic, contexte_requete, requete_brute)
+        if answer:
+            return self.from_cache(result, answer, "semantique")
+
+        # Score d'anomalie et agrégats (construction éventuelle du store des statistiques)
+        # dans le pool CPU : la boucle d'événements continue de servir les autres requêtes
+        anomalie = await loop.run_in_executor(executor, self.check_anomaly, contexte_requete)
+        if self.apply_anomaly(result, *anomalie):
+            return result
+        agregat = await loop.run_in_executor(executor, self.aggregate, contexte_requete)
+        if not self.apply_aggregate(result, agregat):
+            recherche = await loop.run_in_executor(executor, self.retrieve, contexte_requete)
+            if not self.apply_search(result, recherche):
+                return result
+
+        with metrics.timed("generation", self.trace):
+            reponse = await llm_utils.generer_reponse_rag_async(
+                self.client, result.requete_normalisee, result.contexte, usage=self.usage
+            )
+        self.apply_answer(result, reponse)
+        self.remember(requete_brute, contexte_requete, result.contexte, result.reponse)
+        return result
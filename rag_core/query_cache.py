@@ -0,0 +1,193 @@
+# rag_core/query_cache.py
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from rag_core import metrics
+
+# --- Réglages du cache (surchargeables par variables d'environnement) ---
+QUERY_CACHE_TTL_S = float(os.getenv("QUERY_CACHE_TTL_S", "3600"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000"))
+QUERY_CACHE_MAX_BYTES = int(float(os.getenv("QUERY_CACHE_MAX_MB", "64")) * 1024 * 1024)
+# Similarité cosinus minimale entre requêtes normalisées pour réutiliser une réponse
+QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.95"))
+
+
+@dataclass
+class CachedAnswer:
+    """Résultat complet du pipeline RAG pour une requête."""
+    requete_normalisee: str
+    contexte: str
+    reponse: str
+    created_at: float = field(default_factory=time.time)
+
+    def size_bytes(self) -> int:
+        return (sys.getsizeof(self.requete_normalisee) + sys.getsizeof(self.contexte)
+                + sys.getsizeof(self.reponse) + 64)
+
+
+class QueryCache:
+    """
+    Cache à deux niveaux des réponses du pipeline RAG :
+    1. correspondance exacte sur le texte brut de la requête (évite tous les appels) ;
+    2. recherche sémantique sur l'embedding LaBSE de la requête normalisée
+       (réutilise la réponse d'une question quasi identique), limitée aux entrées
+       de même portée (`scope` : filtres, références, k... voir db_manager.query_scope),
+       car LaBSE rapproche « hôtel à Paris » et « hôtel à Bali ».
+
+    Éviction LRU bornée en nombre d'entrées et en mémoire, expiration par TTL.
+    Une instance est liée à une version de l'index (voir resources.SharedResources) :
+    reconstruire l'index crée un cache vide.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+                 ttl_s: float = QUERY_CACHE_TTL_S,
+                 max_bytes: int = QUERY_CACHE_MAX_BYTES,
+                 similarity_threshold: float = QUERY_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        # clé -> (vecteur normalisé ou None, portée, CachedAnswer), dans l'ordre LRU
+        self._entries = OrderedDict()
+        # requête brute -> clé de l'entrée, et inversement
+        self._exact = {}
+        self._aliases = {}
+        self._next_key = 0
+        self._bytes = 0
+        # Matrice des vecteurs (reconstruite paresseusement après modification)
+        self._matrix = None
+        self._matrix_keys = []
+        self._matrix_scopes = []
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _exact_key(requete_brute: str) -> str:
+        return " ".join(requete_brute.split())
+
+    def _is_expired(self, answer: CachedAnswer) -> bool:
+        return time.time() - answer.created_at > self.ttl_s
+
+    def _drop(self, key: int):
+        vector, _, answer = self._entries.pop(key)
+        self._bytes -= answer.size_bytes() + (vector.nbytes if vector is not None else 0)
+        for raw in self._aliases.pop(key, ()):
+            if self._exact.get(raw) == key:
+                del self._exact[raw]
+        self._matrix = None
+
+    def _alias(self, requete_brute: str, key: int):
+        raw = self._exact_key(requete_brute)
+        self._exact[raw] = key
+        self._aliases.setdefault(key, set()).add(raw)
+
+    def get_exact(self, requete_brute: str) -> CachedAnswer | None:
+        """Niveau 1 : réponse déjà calculée pour exactement la même requête brute."""
+        with self._lock:
+            key = self._exact.get(self._exact_key(requete_brute))
+            if key is None or key not in self._entries:
+                metrics.increment("query_cache_lookups_total", niveau="exact", resultat="miss")
+                return None
+            _, _, answer = self._entries[key]
+            if self._is_expired(answer):
+                self._drop(key)
+                metrics.increment("query_cache_lookups_total", niveau="exact", resultat="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            metrics.increment("query_cache_lookups_total", niveau="exact", resultat="hit")
+            return answer
+
+    def _drop_expired(self):
+        for key in [k for k, (_, _, answer) in self._entries.items() if self._is_expired(answer)]:
+            self._drop(key)
+
+    def get_semantic(self, query_vector: np.ndarray, requete_brute: str | None = None,
+                     scope=None) -> CachedAnswer | None:
+        """
+        Niveau 2 : réponse d'une requête normalisée sémantiquement équivalente
+        (similarité cosinus >= seuil) et de même portée `scope`. Les entrées expirées
+        sont retirées avant la recherche. En cas de succès, la requête brute est aussi
+        enregistrée au niveau 1.
+        """
+        with self._lock:
+            self._drop_expired()
+            if self._matrix is None:
+                self._matrix_keys = [k for k, (v, _, _) in self._entries.items() if v is not None]
+                self._matrix_scopes = [self._entries[k][1] for k in self._matrix_keys]
+                self._matrix = (
+                    np.stack([self._entries[k][0] for k in self._matrix_keys])
+                    if self._matrix_keys else None
+                )
+            same_scope = np.array([s == scope for s in self._matrix_scopes], dtype=bool)
+            if self._matrix is None or not same_scope.any():
+                self.stats["misses"] += 1
+                metrics.increment("query_cache_lookups_total", niveau="semantique", resultat="miss")
+                return None
+
+            similarities = np.where(same_scope, self._matrix @ np.asarray(query_vector, dtype=np.float32), -np.inf)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.stats["misses"] += 1
+                metrics.increment("query_cache_lookups_total", niveau="semantique", resultat="miss")
+                return None
+
+            key = self._matrix_keys[best]
+            _, _, answer = self._entries[key]
+            self._entries.move_to_end(key)
+            if requete_brute:
+                self._alias(requete_brute, key)
+            self.stats["semantic_hits"] += 1
+            metrics.increment("query_cache_lookups_total", niveau="semantique", resultat="hit")
+            return answer
+
+    def put(self, requete_brute: str, query_vector: np.ndarray | None, answer: CachedAnswer, scope=None):
+        """
+        Enregistre la réponse (elle remplace celle de la même requête brute, retirée
+        du cache si aucune autre requête n'y renvoie) puis évince les entrées les
+        moins récemment utilisées si besoin.
+        """
+        vector = None if query_vector is None else np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            raw = self._exact_key(requete_brute)
+            previous = self._exact.pop(raw, None)
+            if previous is not None and previous in self._entries:
+                aliases = self._aliases.get(previous, set())
+                aliases.discard(raw)
+                if not aliases:
+                    self._drop(previous)
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (vector, scope, answer)
+            self._alias(requete_brute, key)
+            self._bytes += answer.size_bytes() + (vector.nbytes if vector is not None else 0)
+            self._matrix = None
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+                metrics.increment("query_cache_evictions_total")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._aliases.clear()
+            self._bytes = 0
+            self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
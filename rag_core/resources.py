@@ -0,0 +1,93 @@
+# rag_core/resources.py
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from rag_core import db_manager
+from rag_core.anomaly_detector import AnomalyDetector
+from rag_core.query_cache import QueryCache
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+
+@dataclass
+class SharedResources:
+    """
+    Base vectorielle (lecture seule), détecteur et cache de réponses partagés par
+    toutes les sessions. Une nouvelle version de l'index donne un cache vide.
+    """
+    vectorstore: "Chroma"
+    detector: AnomalyDetector
+    index_version: str
+    query_cache: QueryCache = field(default_factory=QueryCache)
+    loaded_at: float = field(default_factory=time.time)
+
+
+# --- Cache du processus ---
+# Streamlit ré-exécute chatbot.py à chaque interaction mais n'importe rag_core qu'une fois :
+# ces variables de module sont donc communes à toutes les sessions du serveur.
+_resources: SharedResources | None = None
+_lock = threading.Lock()
+
+
+def is_current() -> bool:
+    """Indique si les ressources en mémoire correspondent à la version de l'index sur disque."""
+    current = _resources
+    return current is not None and current.index_version == db_manager.get_index_version()
+
+
+def get_shared_resources() -> SharedResources | None:
+    """
+    Retourne la base et le détecteur partagés, en les (re)chargeant uniquement
+    si la version de l'index sur disque a changé. Retourne None si la base n'existe pas.
+    """
+    global _resources
+    version = db_manager.get_index_version()
+    if version is None:
+        return None
+
+    current = _resources
+    if current is not None and current.index_version == version:
+        return current
+
+    with _lock:
+        # Une autre session a pu recharger pendant l'attente du verrou
+        if _resources is not None and _resources.index_version == version:
+            return _resources
+
+        vectorstore = db_manager.load_existing_vector_store()
+        if vectorstore is None:
+            return None
+        # Index BM25 ouvert (ou reconstruit) avec la base, pas à la première recherche
+        if db_manager.HYBRID_SEARCH_ENABLED:
+            db_manager.get_lexical_index(vectorstore)
+        if db_manager.AGGREGATE_INTENTS_ENABLED:
+            db_manager.get_travel_stats()
+        _resources = SharedResources(
+            vectorstore=vectorstore,
+            detector=AnomalyDetector(vectorstore, background_refit=True),
+            index_version=version
+        )
+        return _resources
+
+
+def publish_vector_store(vectorstore: "Chroma") -> SharedResources:
+    """Enregistre une base fraîchement construite comme ressource partagée de toutes les sessions."""
+    global _resources
+    with _lock:
+        _resources = SharedResources(
+            vectorstore=vectorstore,
+            detector=AnomalyDetector(vectorstore, background_refit=True),
+            index_version=db_manager.get_index_version()
+        )
+        return _resources
+
+
+def invalidate_shared_resources():
+    """Oublie les ressources en mémoire ; le prochain appel les rechargera depuis le disque."""
+    global _resources
+    with _lock:
+        _resources = None
@@ -0,0 +1,176 @@
+# rag_core/startup.py
+"""
+Démarrage à froid : préchargement en arrière-plan et rapport des temps de démarrage.
+
+L'interface Streamlit n'importe au chargement de la page que des modules légers ;
+les modules lourds (scikit-learn, LangChain / Chroma, pandas, google-genai), le
+modèle LaBSE, l'index et le détecteur sont chargés par un thread de préchargement
+pendant que la page est déjà servie. Chaque étape est chronométrée
+(rag_startup_seconds{step}).
+
+Usage : python -m rag_core.startup [--importtime 20]
+  mesure l'import de chatbot.py (chemin critique du premier affichage), puis
+  chaque étape du préchargement, et liste éventuellement les imports les plus lents.
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable
+
+from rag_core import metrics
+
+logger = logging.getLogger("rag_core")
+
+# Préchargement au démarrage de l'interface (0 pour tout charger à la première requête)
+RAG_WARMUP_ENABLED = os.getenv("RAG_WARMUP", "1") == "1"
+# Modules lourds importés par la première étape du préchargement
+HEAVY_MODULES = (
+    "rag_core.llm_utils",
+    "rag_core.db_manager",
+    "rag_core.anomaly_detector",
+    "rag_core.resources",
+    "rag_core.pipeline",
+)
+
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+def _load_embedding_model():
+    from rag_core.embeddings import get_embedding_service
+    get_embedding_service().load()
+
+
+def _load_index_and_detector():
+    from rag_core import resources
+    resources.get_shared_resources()
+
+
+def _create_gemini_client():
+    from rag_core import llm_utils
+    llm_utils.get_gemini_client()
+
+
+class WarmUp:
+    """
+    Préchargement du processus, exécuté une seule fois dans un thread démon.
+    Les chargements sont protégés par les verrous de leurs modules : une requête
+    arrivant avant la fin attend simplement l'étape en cours au lieu de la refaire.
+    """
+
+    def __init__(self):
+        self.durations = {}        # étape -> secondes
+        self.current_step = None
+        self.error = None
+        self._done = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def steps(self) -> list[tuple[str, Callable[[], None]]]:
+        steps = [
+            ("imports", _import_heavy_modules),
+            ("modele_embedding", _load_embedding_model),
+            ("index_detecteur", _load_index_and_detector),
+        ]
+        # Sans clé, get_gemini_client signale l'erreur à la première requête
+        if "GEMINI_API_KEY" in os.environ:
+            steps.append(("client_gemini", _create_gemini_client))
+        return steps
+
+    def start(self) -> "WarmUp":
+        """Lance le préchargement en arrière-plan (sans effet s'il est déjà lancé)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="rag-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def run(self):
+        """Exécute les étapes dans le thread courant (arrêt à la première erreur)."""
+        try:
+            for name, step in self.steps():
+                self.current_step = name
+                start = time.perf_counter()
+                step()
+                self.durations[name] = time.perf_counter() - start
+                metrics.observe("startup_seconds", self.durations[name], step=name)
+        except Exception as e:
+            self.error = f"{self.current_step} : {e}"
+            logger.warning("Préchargement interrompu (%s)", self.error)
+        finally:
+            self.current_step = None
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+
+_warmup = WarmUp()
+
+
+def start_warmup() -> WarmUp:
+    """Préchargement partagé par toutes les sessions du processus (lancé au premier appel)."""
+    return _warmup.start() if RAG_WARMUP_ENABLED else _warmup
+
+
+def get_warmup() -> WarmUp:
+    return _warmup
+
+
+# --- Rapport ---
+
+def slowest_imports(module: str, top: int) -> list[tuple[str, float]]:
+    """Imports les plus lents (temps cumulé, en secondes) d'un interpréteur neuf (python -X importtime)."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "RAG_WARMUP": "0"}
+    )
+    timings = []
+    for line in completed.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            timings.append((parts[2].strip(), int(parts[1]) / 1e6))
+    return sorted(timings, key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="Liste les N imports les plus lents du préchargement complet")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    start = time.perf_counter()
+    importlib.import_module("chatbot")
+    page_s = time.perf_counter() - start
+    print(f"{'import chatbot (premier affichage)':<38} {page_s:>8.3f} s")
+
+    warmup = WarmUp()
+    warmup.run()
+    for name, duration in warmup.durations.items():
+        print(f"{'préchargement : ' + name:<38} {duration:>8.3f} s")
+    print(f"{'total':<38} {page_s + sum(warmup.durations.values()):>8.3f} s")
+    if warmup.error:
+        print(f"Préchargement interrompu : {warmup.error}")
+
+    if args.importtime:
+        print("\nImports les plus lents (cumulé) :")
+        imports = "chatbot, " + ", ".join(HEAVY_MODULES)
+        for module, seconds in slowest_imports(imports, args.importtime):
+            print(f"  {module:<50} {seconds:>8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
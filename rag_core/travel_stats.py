@@ -0,0 +1,374 @@
+# rag_core/travel_stats.py
+
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+TRAVEL_STATS_FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+# Colonnes numériques du CSV nettoyé (db_manager.clean_and_combine_data) -> colonnes du store
+NUMERIC_COLUMNS = {
+    "Accommodation cost": "accommodation_cost",
+    "Transportation cost": "transportation_cost",
+    "Duration (days)": "duration_days",
+    "Traveler age": "traveler_age",
+}
+# Colonnes catégorielles, stockées sous forme de codes (mêmes noms que les métadonnées Chroma)
+CATEGORY_COLUMNS = {
+    "Destination": "destination",
+    "Accommodation type": "accommodation_type",
+    "Transportation type": "transportation_type",
+    "Traveler nationality": "traveler_nationality",
+}
+# Mesures agrégées : colonnes numériques + coût total (hébergement + transport, si les deux sont connus)
+MEASURES = {
+    "total_cost": "Coût total (hébergement + transport)",
+    "accommodation_cost": "Coût d'hébergement",
+    "transportation_cost": "Coût de transport",
+    "duration_days": "Durée (jours)",
+    "traveler_age": "Âge du voyageur",
+}
+# Regroupements précalculés à la construction
+GROUP_BY_FIELDS = ("destination", "accommodation_type", "transportation_type")
+FIELD_LABELS = {
+    "destination": "destination",
+    "accommodation_type": "hébergement",
+    "transportation_type": "transport",
+    "traveler_nationality": "nationalité",
+}
+# Groupes détaillés au plus dans une réponse « par destination / par transport... »
+MAX_GROUPS_IN_FACTS = 10
+
+
+# Colonnes du store et leur type
+COLUMN_DTYPES = {
+    "trip_id": np.int64,
+    **{name: np.float32 for name in NUMERIC_COLUMNS.values()},
+    **{name: np.int32 for name in CATEGORY_COLUMNS.values()},
+}
+
+
+class TravelTableBuilder:
+    """
+    Accumule, morceau par morceau, les colonnes typées des DataFrames nettoyés :
+    coûts, durée et âge en float32 (NaN si non renseignés), catégories en codes int32.
+    Avec `spill_dir`, chaque morceau est écrit sur disque (un .npy par colonne)
+    au lieu d'être gardé en mémoire : la mémoire de l'ingestion reste bornée par
+    la taille d'un morceau, et `write` recopie les morceaux dans le store.
+    """
+
+    def __init__(self, spill_dir: str | None = None):
+        self.categories = {name: {} for name in CATEGORY_COLUMNS.values()}
+        self.spill_dir = spill_dir
+        # Un élément par morceau : {colonne: tableau} en mémoire, ou {colonne: chemin du .npy}
+        self._chunks = []
+        self._rows = 0
+        if spill_dir is not None:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+            os.makedirs(spill_dir)
+
+    def add(self, df_processed: pd.DataFrame):
+        columns = {
+            name: pd.to_numeric(df_processed[col], errors='coerce').to_numpy(dtype=np.float32)
+            for col, name in NUMERIC_COLUMNS.items()
+        }
+        columns["trip_id"] = (
+            pd.to_numeric(df_processed["Trip ID"], errors='coerce').fillna(-1).to_numpy().astype(np.int64)
+        )
+        for col, name in CATEGORY_COLUMNS.items():
+            values = self.categories[name]
+            columns[name] = np.fromiter(
+                (values.setdefault(value, len(values)) if value else -1
+                 for value in df_processed[col].astype(str).str.strip().tolist()),
+                dtype=np.int32, count=len(df_processed)
+            )
+        if self.spill_dir is not None:
+            paths = {name: os.path.join(self.spill_dir, f"{len(self._chunks):06d}-{name}.npy") for name in columns}
+            for name, column in columns.items():
+                np.save(paths[name], column)
+            columns = paths
+        self._chunks.append(columns)
+        self._rows += len(df_processed)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _parts(self, name: str):
+        """Morceaux successifs de la colonne `name` (projetés en mémoire s'ils sont sur disque)."""
+        for chunk in self._chunks:
+            part = chunk[name]
+            yield np.load(part, mmap_mode="r") if isinstance(part, str) else part
+
+    def _meta(self, index_version: str | None) -> dict:
+        categories = {name: sorted(values, key=values.get) for name, values in self.categories.items()}
+        return {"index_version": index_version, "categories": categories}
+
+    def build(self, index_version: str | None = None) -> "TravelStats":
+        """Store en mémoire (colonnes concaténées) avec ses agrégats précalculés."""
+        columns = {
+            name: np.concatenate([np.asarray(part) for part in self._parts(name)]) if self._chunks
+            else np.array([], dtype=dtype)
+            for name, dtype in COLUMN_DTYPES.items()
+        }
+        stats = TravelStats(columns, self._meta(index_version))
+        stats.meta["aggregates"] = stats.precompute()
+        return stats
+
+    def write(self, directory: str, index_version: str | None = None) -> dict:
+        """
+        Écrit les colonnes (.npy, recopiées morceau par morceau) puis meta.json
+        (catégories, agrégats précalculés sur les colonnes projetées) en dernier.
+        """
+        os.makedirs(directory, exist_ok=True)
+        columns = {}
+        for name, dtype in COLUMN_DTYPES.items():
+            path = os.path.join(directory, f"{name}.npy")
+            tmp_path = path + ".tmp"
+            if self._rows:
+                column = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(self._rows,))
+                offset = 0
+                for part in self._parts(name):
+                    column[offset:offset + len(part)] = part
+                    offset += len(part)
+                column.flush()
+                del column
+            else:
+                with open(tmp_path, "wb") as f:
+                    np.save(f, np.array([], dtype=dtype))
+            os.replace(tmp_path, path)
+            columns[name] = np.load(path, mmap_mode="r")
+
+        stats = TravelStats(columns, self._meta(index_version))
+        meta = {
+            **stats.meta,
+            "aggregates": stats.precompute(),
+            "format_version": TRAVEL_STATS_FORMAT_VERSION,
+            "count": len(stats),
+            "created_at": time.time(),
+        }
+        tmp_meta = os.path.join(directory, META_FILE + ".tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, os.path.join(directory, META_FILE))
+        return meta
+
+    def discard(self):
+        """Supprime les morceaux écrits dans `spill_dir`."""
+        self._chunks.clear()
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+@dataclass
+class AggregateAnswer:
+    """Statistiques exactes calculées pour une question analytique (contexte de generer_reponse_rag)."""
+    facts: str
+    operation: str
+    measure: str | None
+    filters: dict = field(default_factory=dict)
+    group_by: str | None = None
+    rows: int = 0
+
+
+def _round(value) -> float | None:
+    return None if value is None or not np.isfinite(value) else round(float(value), 2)
+
+
+class TravelStats:
+    """
+    Store en colonnes du dataset nettoyé (une ligne par voyage) et agrégats
+    count / moyenne / min / max par destination, hébergement et transport.
+    Les agrégats sans filtre sont précalculés ; avec filtres, ils sont calculés
+    à la volée par masques numpy sur les colonnes projetées en mémoire.
+    """
+
+    def __init__(self, columns: dict, meta: dict):
+        self.columns = columns
+        self.meta = meta
+        self.categories = meta["categories"]
+        self.codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in self.categories.items()
+        }
+        accommodation, transport = columns["accommodation_cost"], columns["transportation_cost"]
+        self.measures = {
+            "total_cost": accommodation + transport,
+            **{name: columns[name] for name in MEASURES if name != "total_cost"},
+        }
+
+    @classmethod
+    def open(cls, directory: str) -> "TravelStats | None":
+        """Ouvre le store de `directory`, ou None s'il est absent ou incomplet."""
+        try:
+            with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != TRAVEL_STATS_FORMAT_VERSION:
+                return None
+            columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in COLUMN_DTYPES}
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(columns["trip_id"]) != meta["count"]:
+            return None
+        return cls(columns, meta)
+
+    def __len__(self) -> int:
+        return len(self.columns["trip_id"])
+
+    @property
+    def index_version(self) -> str | None:
+        return self.meta.get("index_version")
+
+    def known_values(self) -> dict:
+        """{champ: [valeurs distinctes]} (pour nl_processor.extract_metadata_filters)."""
+        return self.categories
+
+    # --- Agrégats ---
+
+    def _mask(self, filters: dict | None) -> np.ndarray | None:
+        """Lignes compatibles avec les filtres {champ: [valeurs]}, ou None sans filtre."""
+        mask = None
+        for name, values in (filters or {}).items():
+            if name not in self.codes:
+                continue
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            field_mask = np.isin(self.columns[name], [self.codes[name][v] for v in values if v in self.codes[name]])
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def summarize(self, mask: np.ndarray | None = None, measures: list | None = None) -> dict:
+        """
+        {"count": n, mesure: {"n", "mean", "min", "max", "min_trip_id", "max_trip_id"}}
+        pour les `measures` demandées (toutes par défaut).
+        """
+        trip_ids = self.columns["trip_id"] if mask is None else self.columns["trip_id"][mask]
+        summary = {"count": int(len(trip_ids))}
+        for name in self.measures if measures is None else measures:
+            values = self.measures[name] if mask is None else self.measures[name][mask]
+            known = np.flatnonzero(~np.isnan(values))
+            if not len(known):
+                summary[name] = {"n": 0, "mean": None, "min": None, "max": None,
+                                 "min_trip_id": None, "max_trip_id": None}
+                continue
+            known_values = values[known].astype(np.float64)
+            low, high = known[np.argmin(known_values)], known[np.argmax(known_values)]
+            summary[name] = {
+                "n": int(len(known)),
+                "mean": _round(known_values.mean()),
+                "min": _round(values[low]),
+                "max": _round(values[high]),
+                "min_trip_id": int(trip_ids[low]),
+                "max_trip_id": int(trip_ids[high]),
+            }
+        return summary
+
+    def group(self, group_by: str, mask: np.ndarray | None = None, measures: list | None = None) -> dict:
+        """{valeur: résumé} pour chaque valeur du champ `group_by` présente dans les lignes `mask`."""
+        codes = self.columns[group_by]
+        groups = {}
+        for code in np.unique(codes if mask is None else codes[mask]):
+            if code < 0:
+                continue
+            group_mask = codes == code if mask is None else mask & (codes == code)
+            groups[self.categories[group_by][code]] = self.summarize(group_mask, measures)
+        return groups
+
+    def precompute(self) -> dict:
+        """Agrégats sans filtre : ensemble du dataset et regroupements GROUP_BY_FIELDS."""
+        return {"global": self.summarize(), **{name: self.group(name) for name in GROUP_BY_FIELDS}}
+
+    def aggregate(self, filters: dict | None = None, group_by: str | None = None,
+                  measures: list | None = None) -> tuple[dict, int]:
+        """
+        (résumé ou {valeur: résumé}, nombre de lignes retenues). Sans filtre, les
+        agrégats précalculés sont lus directement ; avec filtres, seules les
+        `measures` demandées sont calculées.
+        """
+        mask = self._mask(filters)
+        precomputed = self.meta.get("aggregates") or {}
+        if mask is None:
+            rows = len(self)
+            if group_by is None and "global" in precomputed:
+                return precomputed["global"], rows
+            if group_by in precomputed:
+                return precomputed[group_by], rows
+        else:
+            rows = int(mask.sum())
+        if group_by is None:
+            return self.summarize(mask, measures), rows
+        return self.group(group_by, mask, measures), rows
+
+    def answer(self, intent) -> AggregateAnswer | None:
+        """
+        Statistiques répondant à une intention analytique (nl_processor.AggregateIntent),
+        mises en forme comme contexte factuel. None si aucun voyage ne correspond.
+        """
+        result, rows = self.aggregate(intent.filters, intent.group_by, [intent.measure] if intent.measure else [])
+        if not rows:
+            return None
+        facts = _format_facts(result, intent, rows)
+        return AggregateAnswer(facts=facts, operation=intent.operation, measure=intent.measure,
+                               filters=intent.filters, group_by=intent.group_by, rows=rows)
+
+
+# --- Mise en forme (contexte transmis à Gemini) ---
+
+def _format_number(value: float | None, measure: str) -> str:
+    if value is None:
+        return "non renseigné"
+    if measure.endswith("_cost"):
+        return f"{value:,.0f}".replace(",", " ")
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def _format_measure(stats: dict, measure: str) -> str:
+    if not stats["n"]:
+        return f"{MEASURES[measure]} : non renseigné"
+    return (
+        f"{MEASURES[measure]} : moyenne {_format_number(stats['mean'], measure)}, "
+        f"minimum {_format_number(stats['min'], measure)} (Voyage ID {stats['min_trip_id']}), "
+        f"maximum {_format_number(stats['max'], measure)} (Voyage ID {stats['max_trip_id']}), "
+        f"sur {stats['n']} voyages renseignés"
+    )
+
+
+def _format_facts(result: dict, intent, rows: int) -> str:
+    scope = "; ".join(
+        f"{FIELD_LABELS.get(name, name)} = {', '.join(values)}" for name, values in intent.filters.items()
+    ) or "tous les voyages"
+    lines = [
+        "Statistiques exactes calculées sur l'ensemble du dataset (pas un échantillon).",
+        f"Périmètre : {scope} ({rows} voyages).",
+    ]
+    measure = intent.measure
+    if intent.group_by is None:
+        lines.append(f"Nombre de voyages : {result['count']}")
+        if measure:
+            lines.append(_format_measure(result[measure], measure))
+        return "\n".join(lines)
+
+    # Groupes triés selon l'opération demandée (les plus grands / chers en premier)
+    def sort_key(item):
+        stats = item[1]
+        if measure is None or intent.operation == "count":
+            return stats["count"]
+        value = stats[measure][{"avg": "mean"}.get(intent.operation, intent.operation)]
+        if value is None:
+            return np.inf if intent.operation == "min" else -np.inf
+        return value
+
+    groups = sorted(result.items(), key=sort_key, reverse=intent.operation != "min")
+    lines.append(f"Par {FIELD_LABELS[intent.group_by]} ({len(groups)} valeurs) :")
+    for value, stats in groups[:MAX_GROUPS_IN_FACTS]:
+        line = f"- {value} : {stats['count']} voyages"
+        if measure:
+            line += f" ; {_format_measure(stats[measure], measure)}"
+        lines.append(line)
+    if len(groups) > MAX_GROUPS_IN_FACTS:
+        lines.append(f"- ... {len(groups) - MAX_GROUPS_IN_FACTS} autres valeurs non détaillées")
+    return "\n".join(lines)
@@ -0,0 +1,76 @@
+# tests/conftest.py
+"""
+Fixtures communes des tests (hors ligne) : encodage par n-grammes hachés à la
+place de LaBSE, client Gemini factice, répertoire de travail temporaire (les
+chemins de db_manager sont relatifs) et petite base indexée à partir du dataset
+synthétique des benchmarks.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_clients import FakeGeminiClient, use_hashing_embeddings  # noqa: E402
+from benchmarks.synthetic_data import write_travel_csv  # noqa: E402
+from rag_core import db_manager, resources  # noqa: E402
+from rag_core.anomaly_detector import AnomalyDetector  # noqa: E402
+from rag_core.embeddings import get_embedding_service  # noqa: E402
+
+# Lignes du dataset synthétique indexées par la fixture `vectorstore`
+TEST_ROWS = 300
+
+
+@pytest.fixture(scope="session", autouse=True)
+def hashing_embeddings():
+    """Service d'embedding du processus branché sur HashingEmbeddingModel (aucun téléchargement)."""
+    use_hashing_embeddings(get_embedding_service())
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Répertoire de travail vide : data/, vectorstore/ et artefacts sont créés sous tmp_path."""
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(db_manager.DATA_PATH, exist_ok=True)
+    # Chroma garde un client par chemin : le même chemin relatif désigne ici une autre base
+    SharedSystemClient.clear_system_cache()
+    resources.invalidate_shared_resources()
+    yield tmp_path
+    SharedSystemClient.clear_system_cache()
+    resources.invalidate_shared_resources()
+
+
+@pytest.fixture
+def travel_csv(workdir) -> str:
+    """CSV synthétique de TEST_ROWS voyages à l'emplacement attendu par db_manager."""
+    return write_travel_csv(db_manager.CSV_FILE_PATH, TEST_ROWS, seed=7)
+
+
+@pytest.fixture
+def vectorstore(travel_csv):
+    """Base Chroma construite par l'ingestion en flux (version publiée, instantané, BM25, agrégats)."""
+    db, _ = db_manager.ingest_csv_streaming(travel_csv, incremental=False, resume=False)
+    return db
+
+
+@pytest.fixture
+def shared(vectorstore, monkeypatch) -> resources.SharedResources:
+    """
+    Ressources partagées sur la base de test. Les vecteurs hachés ne séparent pas
+    les sujets : le seuil d'anomalie est abaissé sous les scores de l'Isolation Forest
+    (dans [-0.5, 0.5]) pour que toute requête soit traitée.
+    """
+    detector = AnomalyDetector(vectorstore)
+    monkeypatch.setattr(detector.scorer, "threshold", -1.0)
+    return resources.SharedResources(vectorstore=vectorstore, detector=detector,
+                                     index_version=db_manager.get_index_version())
+
+
+@pytest.fixture
+def gemini() -> FakeGeminiClient:
+    """Client Gemini factice sans latence."""
+    return FakeGeminiClient(latency_s=0.0, first_token_s=0.0)
@@ -0,0 +1,73 @@
+# tests/test_anomaly_detector.py
+
+import os
+
+from rag_core import anomaly_detector, db_manager
+from rag_core.anomaly_detector import ANOMALY_MODEL_FILE, AnomalyDetector
+
+
+def _unexpected_refit(self):
+    """Remplace refit : le détecteur doit venir de l'artefact."""
+    raise AssertionError("ré-entraînement inattendu")
+
+
+def test_artifact_is_written_then_loaded_without_refit(vectorstore, monkeypatch):
+    detector = AnomalyDetector(vectorstore)
+    assert os.path.exists(ANOMALY_MODEL_FILE)
+    assert len(detector.embeddings_data) == vectorstore._collection.count()
+
+    monkeypatch.setattr(AnomalyDetector, "refit", _unexpected_refit)
+    reads = []
+    collection_type = type(vectorstore._collection)
+    original_get = collection_type.get
+    monkeypatch.setattr(collection_type, "get", lambda self, *a, **k: reads.append(k) or original_get(self, *a, **k))
+
+    loaded = AnomalyDetector(vectorstore)
+    # Chargement en temps constant : la collection n'est pas relue
+    assert reads == []
+    assert loaded.scorer.threshold == detector.scorer.threshold
+    assert len(loaded.embeddings_data) == len(detector.embeddings_data)
+
+
+def test_artifact_is_loaded_without_refit_when_the_snapshot_is_missing(vectorstore, monkeypatch):
+    # Instantané des vecteurs indisponible (ex : répertoire non inscriptible)
+    monkeypatch.setattr(db_manager, "open_embedding_snapshot", lambda: None)
+    monkeypatch.setattr(db_manager, "write_embedding_snapshot", lambda *a, **k: None)
+    detector = AnomalyDetector(vectorstore)
+    assert os.path.exists(ANOMALY_MODEL_FILE)
+
+    monkeypatch.setattr(AnomalyDetector, "refit", _unexpected_refit)
+    loaded = AnomalyDetector(vectorstore)
+    assert loaded.scorer.threshold == detector.scorer.threshold
+
+def test_new_index_version_triggers_refit(vectorstore, monkeypatch):
+    AnomalyDetector(vectorstore)
+    db_manager.publish_index_version(vectorstore._collection)
+
+    refits = []
+    original_refit = AnomalyDetector.refit
+    monkeypatch.setattr(AnomalyDetector, "refit", lambda self: refits.append(1) or original_refit(self))
+    detector = AnomalyDetector(vectorstore)
+    assert refits == [1]
+    assert detector.fingerprint["index_version"] == db_manager.get_index_version()
+
+
+def test_background_refit_keeps_the_previous_model_serving(vectorstore):
+    previous = AnomalyDetector(vectorstore)
+    db_manager.publish_index_version(vectorstore._collection)
+
+    detector = AnomalyDetector(vectorstore, background_refit=True)
+    assert detector.refit_thread is not None
+    detector.refit_thread.join()
+    assert detector.scorer is not previous.scorer
+    assert detector.fingerprint["index_version"] == db_manager.get_index_version()
+
+
+def test_unreadable_artifact_is_refitted(vectorstore):
+    AnomalyDetector(vectorstore)
+    with open(ANOMALY_MODEL_FILE, "wb") as f:
+        f.write(b"pas un artefact joblib")
+    detector = AnomalyDetector(vectorstore)
+    assert detector.scorer is not None
+    assert anomaly_detector.joblib.load(ANOMALY_MODEL_FILE)["artifact_version"] == \
+        anomaly_detector.ANOMALY_ARTIFACT_VERSION
@@ -0,0 +1,99 @@
+# tests/test_anomaly_scorers.py
+
+import pickle
+
+import numpy as np
+import pytest
+
+from rag_core import anomaly_scorers
+from rag_core.anomaly_detector import CALIBRATION_QUERIES, AnomalyDetector
+from rag_core.anomaly_scorers import AnomalyScorer, NearestNeighbourScorer, make_scorer
+from rag_core.embedding_snapshot import EmbeddingSnapshot, quantize
+from rag_core.embeddings import get_embedding_service
+
+
+def _clusters(n_per_cluster=50, dim=16, seed=0) -> tuple[np.ndarray, np.ndarray]:
+    """Vecteurs normalisés groupés autour de quatre directions, et une requête par groupe."""
+    rng = np.random.default_rng(seed)
+    centers = np.eye(dim, dtype=np.float32)[:4]
+    base = np.concatenate([c + 0.1 * rng.standard_normal((n_per_cluster, dim)) for c in centers])
+    queries = centers + 0.1 * rng.standard_normal(centers.shape)
+    normalize = NearestNeighbourScorer._normalize
+    return normalize(base), normalize(queries)
+
+
+def _snapshot(vectors: np.ndarray, dtype: str) -> EmbeddingSnapshot:
+    matrix, scales = quantize(vectors, dtype)
+    ids = np.array([f"trip-{i}" for i in range(len(vectors))])
+    return EmbeddingSnapshot(matrix, ids, {"dtype": dtype, "count": len(vectors), "dim": vectors.shape[1]}, scales)
+
+
+def test_scorer_interface_is_abstract():
+    with pytest.raises(TypeError):
+        AnomalyScorer()
+    assert {make_scorer(name).name for name in ("isolation_forest", "knn", "centroids")} == \
+        {"isolation_forest", "knn", "centroids"}
+    with pytest.raises(ValueError):
+        make_scorer("lof")
+
+
+@pytest.mark.parametrize("name", ["knn", "centroids"])
+def test_neighbour_scorers_require_calibration(name):
+    base, _ = _clusters()
+    with pytest.raises(ValueError):
+        make_scorer(name).fit(base)
+
+
+@pytest.mark.parametrize("name", ["knn", "centroids"])
+def test_threshold_is_a_quantile_of_calibration_scores(name):
+    base, queries = _clusters()
+    scorer = make_scorer(name).fit(base, calibration_vectors=queries)
+
+    assert scorer.threshold == pytest.approx(np.quantile(scorer.score(queries), scorer.calibration_quantile))
+    # Une direction absente de la base est hors sujet, les requêtes du domaine non
+    outlier = np.eye(base.shape[1], dtype=np.float32)[-1:]
+    assert scorer.is_anomaly(outlier).all()
+    assert scorer.is_anomaly(queries).sum() <= 1
+
+
+def test_knn_score_is_the_mean_similarity_of_the_k_nearest():
+    base, queries = _clusters()
+    scorer = NearestNeighbourScorer(k=5).fit(base, calibration_vectors=queries)
+    expected = np.sort(queries @ base.T, axis=1)[:, -5:].mean(axis=1)
+    np.testing.assert_allclose(scorer.score(queries), expected, rtol=1e-5)
+
+
+def test_knn_reference_is_not_pickled():
+    base, queries = _clusters()
+    knn = NearestNeighbourScorer(k=5).fit(base, calibration_vectors=queries)
+    centroids = NearestNeighbourScorer(k=2, n_centroids=8).fit(base, calibration_vectors=queries)
+
+    assert pickle.loads(pickle.dumps(knn)).reference is None
+    assert pickle.loads(pickle.dumps(centroids)).reference.shape == (8, base.shape[1])
+    with pytest.raises(RuntimeError):
+        pickle.loads(pickle.dumps(knn)).score(queries)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_knn_scores_against_snapshot_blocks(dtype, monkeypatch):
+    base, queries = _clusters()
+    scorer = NearestNeighbourScorer(k=5).fit(base, calibration_vectors=queries)
+    expected = scorer.score(queries)
+
+    restored = pickle.loads(pickle.dumps(scorer))
+    restored.attach_reference(_snapshot(base, dtype))
+    # Plusieurs blocs de référence : le top-k est conservé d'un bloc à l'autre
+    monkeypatch.setattr(anomaly_scorers, "REFERENCE_BLOCK_SIZE", 30)
+    np.testing.assert_allclose(restored.score(queries), expected, atol=2e-2)
+
+
+def test_detector_reloads_knn_on_the_snapshot(vectorstore, monkeypatch):
+    detector = AnomalyDetector(vectorstore, scorer_name="knn")
+    assert isinstance(detector.scorer.reference, EmbeddingSnapshot)
+
+    monkeypatch.setattr(AnomalyDetector, "refit", lambda self: pytest.fail("ré-entraînement inattendu"))
+    reloaded = AnomalyDetector(vectorstore, scorer_name="knn")
+    assert isinstance(reloaded.scorer.reference, EmbeddingSnapshot)
+    calibration = get_embedding_service().encode(list(CALIBRATION_QUERIES))
+    np.testing.assert_allclose(reloaded.score_vectors(calibration), detector.score_vectors(calibration), rtol=1e-5)
+    assert reloaded.scorer.threshold == detector.scorer.threshold
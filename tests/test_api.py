@@ -0,0 +1,79 @@
+# tests/test_api.py
+
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from rag_core import api, llm_utils, resources
+from rag_core.pipeline import RAGPipeline
+
+REQUETE = "Je cherche un hôtel à Paris pour une semaine"
+
+
+@pytest.fixture
+def client(gemini, monkeypatch):
+    """Client HTTP de l'application, préchargée avec le client Gemini factice."""
+    monkeypatch.setattr(api, "_state", {"client": None, "warmup_error": None, "warmup_done": False})
+    monkeypatch.setattr(llm_utils, "get_gemini_client", lambda: gemini)
+    with TestClient(api.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def served(shared, monkeypatch):
+    """Le serveur utilise les ressources de test (détecteur au seuil abaissé)."""
+    monkeypatch.setattr(resources, "get_shared_resources", lambda: shared)
+    monkeypatch.setattr(resources, "is_current", lambda: True)
+    return shared
+
+
+def test_not_ready_without_index(workdir, client):
+    assert client.get("/health").json() == {"status": "ok"}
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert "Base vectorielle introuvable" in response.json()["warmup_error"]
+    assert client.post("/query", json={"query": REQUETE}).status_code == 503
+
+
+def test_query_returns_the_pipeline_result(served, client):
+    assert client.get("/ready").status_code == 200
+
+    response = client.post("/query", json={"query": REQUETE, "k": 2})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["statut"] == "ok"
+    assert result["normalisation"] == "locale"
+    assert result["reponse"] and result["resultats"]
+    assert "total" in result["durees"]
+
+    assert client.post("/query", json={"query": REQUETE}).json()["statut"] == "cache"
+    assert client.post("/query", json={"query": ""}).status_code == 422
+    assert "requests_total" in client.get("/metrics").text
+
+
+def test_arun_keeps_cpu_stages_off_the_event_loop(shared, gemini, monkeypatch):
+    threads = []
+    score_vectors = shared.detector.score_vectors
+
+    def recording_score_vectors(vectors):
+        threads.append(threading.current_thread().name)
+        return score_vectors(vectors)
+
+    monkeypatch.setattr(shared.detector, "score_vectors", recording_score_vectors)
+    result = asyncio.run(RAGPipeline(shared, gemini).arun(REQUETE))
+
+    assert result.statut == "ok"
+    assert threads and threads[0].startswith("rag-cpu")
+    assert set(result.durees) >= {"normalisation", "embedding", "anomalie", "recherche", "generation", "total"}
+
+
+def test_arun_reports_normalization_errors(shared, gemini, monkeypatch):
+    async def failing_generate_content(**kwargs):
+        raise ConnectionError("Gemini indisponible")
+
+    monkeypatch.setattr(gemini.aio.models, "generate_content", failing_generate_content)
+    result = asyncio.run(RAGPipeline(shared, gemini).arun("nheb nsafer l paris"))
+    assert (result.statut, result.normalisation) == ("erreur_normalisation", "gemini")
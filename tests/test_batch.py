@@ -0,0 +1,90 @@
+# tests/test_batch.py
+
+import asyncio
+import io
+import json
+
+import numpy as np
+import pytest
+
+from rag_core import batch, db_manager
+from rag_core.embeddings import get_embedding_service
+from rag_core.query_cache import QueryCache
+
+QUESTIONS = [
+    "Je cherche un hôtel à Paris pour une semaine",
+    "Quel est le coût moyen de l'hébergement ?",
+    "nheb nsafer l tokyo",
+]
+
+
+def _run(queries, shared, client, **kwargs) -> tuple[dict, list[dict]]:
+    output = io.StringIO()
+    stats = asyncio.run(batch.run_batch(queries, output, shared, client, **kwargs))
+    return stats, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_read_queries_accepts_every_key_and_skips_invalid_lines():
+    lines = [
+        '{"query": "Voyages à Paris", "id": "a"}',
+        '{"question": "Voyages à Tokyo", "request_id": 7}',
+        "",
+        "pas du json",
+        '{"id": "vide"}',
+        '{"body": "Voyages à Bali"}',
+    ]
+    assert batch.read_queries(lines) == [
+        batch.BatchQuery(id="a", requete="Voyages à Paris"),
+        batch.BatchQuery(id="7", requete="Voyages à Tokyo"),
+        batch.BatchQuery(id="6", requete="Voyages à Bali"),
+    ]
+
+
+def test_every_query_gets_one_result(shared, gemini):
+    queries = [batch.BatchQuery(id=str(i), requete=q) for i, q in enumerate(QUESTIONS)]
+    service = get_embedding_service()
+    calls_before = service.metrics["encode_calls"]
+
+    stats, results = _run(queries, shared, gemini, concurrency=2)
+
+    assert stats["queries"] == stats["answered"] == len(QUESTIONS)
+    assert stats["errors"] == stats["anomalies"] == 0
+    # Toutes les requêtes sont vectorisées en un seul appel par lots
+    assert service.metrics["encode_calls"] - calls_before == 1
+    by_id = {result["id"]: result for result in results}
+    assert set(by_id) == {"0", "1", "2"}
+    assert by_id["0"]["normalization"] == "locale" and by_id["0"]["hits"]
+    assert by_id["1"]["intent"] == "agregat"
+    assert by_id["2"]["normalization"] == "gemini"
+    assert all(result["answer"] and result["tokens"]["prompt"] for result in results)
+
+
+def test_queries_are_encoded_without_the_process_pool(shared, gemini, monkeypatch):
+    service = get_embedding_service()
+    monkeypatch.setattr(service, "encode_documents", lambda *a, **k: pytest.fail("pool d'indexation utilisé"))
+    stats, _ = _run([batch.BatchQuery(id="1", requete=QUESTIONS[0])], shared, gemini)
+    assert stats["answered"] == 1
+
+
+def test_queries_without_context_are_not_errors(shared, gemini, monkeypatch):
+    monkeypatch.setattr(db_manager, "search_db", lambda *a, **k: db_manager.SearchResult(context=""))
+    stats, results = _run([batch.BatchQuery(id="1", requete=QUESTIONS[0])], shared, gemini)
+
+    assert (stats["no_context"], stats["errors"], stats["answered"]) == (1, 0, 0)
+    assert results[0]["hits"] == [] and "answer" not in results[0]
+    assert gemini.calls == 0
+
+
+def test_anomalies_are_reported_without_generation(shared, gemini, monkeypatch):
+    monkeypatch.setattr(shared.detector.scorer, "threshold", np.inf)
+    stats, results = _run([batch.BatchQuery(id="1", requete=QUESTIONS[0])], shared, gemini)
+
+    assert stats["anomalies"] == 1
+    assert results[0]["is_anomaly"] and "answer" not in results[0]
+    assert gemini.calls == 0
+
+
+def test_answers_are_stored_in_the_given_cache(shared, gemini):
+    cache = QueryCache()
+    _run([batch.BatchQuery(id="1", requete=QUESTIONS[0])], shared, gemini, cache=cache)
+    assert cache.get_exact(QUESTIONS[0]) is not None
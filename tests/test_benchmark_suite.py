@@ -0,0 +1,66 @@
+# tests/test_benchmark_suite.py
+
+import asyncio
+import json
+from argparse import Namespace
+
+import pandas as pd
+
+from benchmarks import run_suite
+from benchmarks.fake_clients import FakeGeminiClient
+from benchmarks.synthetic_data import CSV_COLUMNS, generate_travel_dataframe
+from rag_core import llm_utils
+
+
+def test_synthetic_dataset_is_reproducible():
+    df = generate_travel_dataframe(50, seed=3)
+    assert list(df.columns) == CSV_COLUMNS
+    assert df["Trip ID"].is_unique
+    pd.testing.assert_frame_equal(df, generate_travel_dataframe(50, seed=3))
+    assert not df.equals(generate_travel_dataframe(50, seed=4))
+    assert run_suite.build_queries(30, seed=1) == run_suite.build_queries(30, seed=1)
+
+
+def test_fake_gemini_answers_like_the_real_client():
+    client = FakeGeminiClient(latency_s=0.0, first_token_s=0.0, chunks=3)
+    # Normalisation : la requête brute est renvoyée telle quelle
+    assert llm_utils.traiter_requete_multilingue(client, "nheb nsafer l paris") == "nheb nsafer l paris"
+
+    contexte = "trip_id | destination\n12 | Paris, France"
+    reponse = client.models.generate_content(model="m", contents=f"CONTEXTE :\n{contexte}\n\nQUESTION : ?")
+    assert "12 | Paris, France" in reponse.text
+    assert reponse.usage_metadata.prompt_token_count > 0
+
+    chunks = list(client.models.generate_content_stream(model="m", contents=f"CONTEXTE :\n{contexte}"))
+    assert len(chunks) == 3
+    assert "".join(c.text for c in chunks).strip() == reponse.text
+    assert chunks[-1].usage_metadata.candidates_token_count == reponse.usage_metadata.candidates_token_count
+
+    async def stream():
+        return [c.text async for c in await client.aio.models.generate_content_stream(model="m", contents="x")]
+    assert "".join(asyncio.run(stream())).strip() == client.models.generate_content(model="m", contents="x").text
+
+
+def test_suite_runs_end_to_end(workdir):
+    args = Namespace(rows=200, queries=12, users=[1, 4], embeddings="hashing", gemini_latency=0.0,
+                     gemini_first_token=0.0, gemini_jitter=0.0, gemini_rpm=0, seed=42)
+    report = run_suite.run(args)
+    results = report["results"]
+
+    assert results["ingest"]["indexed"] == results["index_load"]["vectors"] > 0
+    assert results["detector"]["scorer"]
+    assert results["query_latency"]["queries"] == 12
+    assert sum(results["query_latency"]["statuts"].values()) == 12
+    assert [c["users"] for c in results["concurrency"]] == [1, 4]
+    assert json.loads(json.dumps(report))["config"]["rows"] == 200
+
+
+def test_compare_reports_relative_changes(tmp_path, capsys):
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    a.write_text(json.dumps({"commit": "aaaa", "results": {"ingest": {"rows_per_s": 100.0}, "ok": True}}))
+    b.write_text(json.dumps({"commit": "bbbb", "results": {"ingest": {"rows_per_s": 150.0}, "ok": True}}))
+
+    run_suite.compare(str(a), str(b))
+    output = capsys.readouterr().out
+    assert "ingest.rows_per_s" in output and "+50.0%" in output
+    assert "ok" not in output.split("\n", 1)[1]
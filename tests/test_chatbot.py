@@ -0,0 +1,58 @@
+# tests/test_chatbot.py
+"""Étapes affichées par l'interface Streamlit (exécutées ici sans serveur, en mode « bare »)."""
+
+import pytest
+
+from rag_core import llm_utils
+from rag_core.pipeline import PipelineResult, RAGPipeline
+
+chatbot = pytest.importorskip("chatbot")
+
+REQUETE = "Je cherche un hôtel à Paris pour une semaine"
+
+
+def _afficher(shared, client, requete: str = REQUETE) -> PipelineResult:
+    pipeline = RAGPipeline(shared, client)
+    resultat = PipelineResult(requete=requete)
+    chatbot.afficher_etapes_pipeline(pipeline, resultat)
+    return resultat
+
+
+def test_streamed_answer_is_recorded_and_cached(shared, gemini):
+    resultat = _afficher(shared, gemini)
+
+    assert resultat.statut == "ok"
+    assert resultat.reponse and resultat.tokens["prompt_estime"]
+    assert shared.query_cache.get_exact(REQUETE).reponse == resultat.reponse
+    assert _afficher(shared, gemini).statut == "cache"
+
+
+def test_interrupted_stream_is_not_cached(shared, gemini, monkeypatch):
+    def failing_stream(**kwargs):
+        yield type("Chunk", (), {"text": "Voici ", "usage_metadata": None})()
+        raise ConnectionError("flux coupé")
+
+    monkeypatch.setattr(gemini.models, "generate_content_stream", failing_stream)
+    resultat = _afficher(shared, gemini)
+
+    assert resultat.statut == "erreur_generation"
+    assert resultat.reponse.endswith(llm_utils.MESSAGE_ERREUR_GENERATION)
+    assert shared.query_cache.get_exact(REQUETE) is None
+
+
+def test_failed_normalization_sets_the_status(shared, gemini, monkeypatch):
+    def failing_generate_content(**kwargs):
+        raise ConnectionError("Gemini indisponible")
+
+    monkeypatch.setattr(gemini.models, "generate_content", failing_generate_content)
+    assert _afficher(shared, gemini, "nheb nsafer l paris").statut == "erreur_normalisation"
+
+
+def test_off_topic_request_stops_before_search(shared, gemini, monkeypatch):
+    monkeypatch.setattr(shared.detector.scorer, "threshold", 1.0)
+    resultat = _afficher(shared, gemini)
+
+    assert resultat.statut == "hors_sujet"
+    assert resultat.score_anomalie is not None
+    assert not resultat.contexte and resultat.reponse is None
+    assert gemini.calls == 0
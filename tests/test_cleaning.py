@@ -0,0 +1,55 @@
+# tests/test_cleaning.py
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_travel_dataframe
+from rag_core import db_manager
+
+
+def _row(**overrides) -> dict:
+    row = {
+        "Trip ID": 1, "Destination": "Paris, France", "Start date": "5/1/2023", "End date": "5/8/2023",
+        "Duration (days)": 7.0, "Traveler name": "John Smith", "Traveler age": 35.0,
+        "Traveler gender": "Male", "Traveler nationality": "American",
+        "Accommodation type": "Hotel", "Accommodation cost": "$1,200 USD",
+        "Transportation type": "Flight", "Transportation cost": "600",
+    }
+    row.update(overrides)
+    return row
+
+
+def test_int_column_to_str_matches_int_to_str():
+    values = pd.Series([7, 7.9, "12", "abc", None, np.nan, "", -3.2], dtype=object)
+    expected = [db_manager.int_to_str(value) for value in values]
+    assert db_manager.int_column_to_str(values).tolist() == expected
+
+
+def test_summary_format_and_cost_cleaning():
+    df = db_manager.clean_and_combine_data(pd.DataFrame([_row()]))
+    assert df.loc[0, "trip_summary"] == (
+        "Voyage ID 1. Destination: Paris, France. Durée: 7 jours. "
+        "Hébergement: Hotel (Coût: 1200). Transport: Flight (Coût: 600). "
+        "Voyageur: John Smith (35 ans)."
+    )
+
+
+def test_missing_values_and_empty_destinations():
+    df = db_manager.clean_and_combine_data(pd.DataFrame([
+        _row(**{"Duration (days)": None, "Traveler age": None, "Transportation cost": "0"}),
+        _row(**{"Trip ID": 2, "Destination": None}),
+    ]))
+    assert len(df) == 1
+    summary = df.loc[0, "trip_summary"]
+    assert "Durée: Inconnue jours" in summary
+    assert "(Inconnu ans)" in summary
+    assert "Transport: Flight (Coût: Non spécifié)" in summary
+
+
+def test_documents_carry_filterable_metadata():
+    documents = db_manager.build_documents(db_manager.clean_and_combine_data(generate_travel_dataframe(30)))
+    assert len(documents) > 0
+    for doc in documents:
+        assert set(db_manager.METADATA_COLUMNS.values()) <= set(doc.metadata)
+        assert isinstance(doc.metadata["trip_id"], int) or doc.metadata["trip_id"] == ""
+        assert doc.page_content.startswith("Voyage ID ")
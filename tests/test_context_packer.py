@@ -0,0 +1,71 @@
+# tests/test_context_packer.py
+
+from langchain_core.documents import Document
+
+from rag_core import context_packer, llm_utils
+from rag_core.context_packer import estimate_tokens, pack_context
+
+
+def _hit(trip_id, destination="Paris, France", jours="7", hebergement="Hotel", cout="1200",
+         transport="Flight", voyageur="John Smith", age="35", score=0.9):
+    content = (f"Voyage ID {trip_id}. Destination: {destination}. Durée: {jours} jours. "
+               f"Hébergement: {hebergement} (Coût: {cout}). Transport: {transport} (Coût: 600). "
+               f"Voyageur: {voyageur} ({age} ans).")
+    return Document(page_content=content, metadata={"trip_id": trip_id}), score
+
+
+def test_estimate_tokens_counts_digits_one_by_one():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("1200") == 4
+    assert estimate_tokens("Coût 1200") == 4 + 2
+
+
+def test_identical_trips_are_merged():
+    packed = pack_context([_hit(1), _hit(2), _hit(3, voyageur="Jane Doe")], budget=1000)
+
+    assert packed.duplicates == 1
+    assert [doc.metadata["trip_id"] for doc, _ in packed.hits] == [1, 3]
+    assert "1/2|" in packed.text
+
+
+def test_common_columns_are_written_once():
+    packed = pack_context([_hit(1), _hit(2, voyageur="Jane Doe", age="41")], budget=1000)
+    lines = packed.text.splitlines()
+
+    assert "destination: Paris, France" in lines
+    assert "hébergement: Hotel" in lines
+    header = next(line for line in lines if context_packer.SEPARATOR in line)
+    assert header == "id|voyageur|âge"
+    assert lines[-2:] == ["1|John Smith|35", "2|Jane Doe|41"]
+    assert packed.tokens == estimate_tokens(packed.text)
+
+
+def test_budget_keeps_the_best_ranked_trips():
+    hits = [_hit(i, destination=f"Ville {i}, Pays") for i in range(1, 7)]
+    small = pack_context(hits, budget=60)
+    large = pack_context(hits, budget=1000)
+
+    assert 1 <= len(small.hits) < len(large.hits) == 6
+    assert small.over_budget == 6 - len(small.hits)
+    assert [doc.metadata["trip_id"] for doc, _ in small.hits] == list(range(1, len(small.hits) + 1))
+    # Au moins un voyage, même au-delà du budget
+    assert len(pack_context(hits, budget=1).hits) == 1
+
+
+def test_unknown_documents_are_kept_verbatim():
+    other = Document(page_content="Offre spéciale : -20 % sur Bali.")
+    packed = pack_context([_hit(1), (other, 0.5), (other, 0.4)], budget=1000)
+    assert packed.text.endswith("- Offre spéciale : -20 % sur Bali.")
+    assert packed.duplicates == 1
+
+
+def test_compact_prompt_is_smaller_than_the_original():
+    hits = [_hit(i, voyageur=f"Voyageur {i}") for i in range(1, 4)]
+    packed = pack_context(hits)
+    question = "Je cherche un hôtel à Paris"
+
+    assert llm_utils.estimer_tokens_prompt(question, packed.text) < \
+        llm_utils.estimer_tokens_prompt_complet(question, hits)
+    assert context_packer.legacy_context(hits).startswith("[1] Voyage ID 1.")
@@ -0,0 +1,76 @@
+# tests/test_embedding_snapshot.py
+
+import os
+
+import numpy as np
+import pytest
+
+from rag_core import db_manager, embedding_snapshot
+from rag_core.embedding_snapshot import EmbeddingSnapshot, check_accuracy, quantize
+
+
+def _vectors(n=200, dim=32, seed=0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dtype, itemsize, atol", [("float16", 2, 1e-3), ("int8", 1, 1e-2)])
+def test_quantize_round_trip(dtype, itemsize, atol):
+    vectors = _vectors()
+    matrix, scales = quantize(vectors, dtype)
+
+    assert matrix.itemsize == itemsize
+    restored = matrix.astype(np.float32) * (scales[:, None] if scales is not None else 1.0)
+    np.testing.assert_allclose(restored, vectors, atol=atol)
+    with pytest.raises(ValueError):
+        quantize(vectors, "float8")
+
+
+def test_int8_zero_rows_keep_a_unit_scale():
+    matrix, scales = quantize(np.zeros((2, 4), dtype=np.float32), "int8")
+    assert not matrix.any()
+    assert scales.tolist() == [1.0, 1.0]
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_snapshot_written_from_the_index_is_memory_mapped(vectorstore, dtype):
+    collection = vectorstore._collection
+    directory = f"snapshot-{dtype}"
+    meta = embedding_snapshot.write_snapshot(collection, directory, index_version="v1", dtype=dtype, page_size=64)
+    snapshot = EmbeddingSnapshot.open(directory)
+
+    assert meta["count"] == len(snapshot) == collection.count()
+    assert isinstance(snapshot.vectors, np.memmap)
+    assert snapshot.index_version == "v1"
+    assert meta["min_cosine"] > 0.99
+    assert not any(name.endswith(".tmp") for name in os.listdir(directory))
+
+    reference = embedding_snapshot.load_collection_embeddings(collection, page_size=64)
+    report = check_accuracy(snapshot, reference, n_queries=20)
+    assert report["recall_at_10"] >= 0.95
+    assert report["bytes"] < report["float32_bytes"]
+
+    # La recherche exacte retrouve le document lui-même en tête
+    ids, scores = snapshot.search(reference[5], k=3)
+    assert ids[0] == snapshot.ids[5]
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_incomplete_snapshot_is_ignored(workdir):
+    assert EmbeddingSnapshot.open("absent") is None
+    os.makedirs("vide")
+    with open(os.path.join("vide", embedding_snapshot.META_FILE), "w") as f:
+        f.write('{"format_version": 1, "count": 3, "dim": 4, "dtype": "float16"}')
+    assert EmbeddingSnapshot.open("vide") is None
+
+
+def test_index_snapshot_follows_the_index_version(vectorstore):
+    snapshot = db_manager.open_embedding_snapshot()
+    assert snapshot is not None
+    assert snapshot.index_version == db_manager.get_index_version()
+
+    db_manager.mark_index_updated()
+    # Instantané d'une version précédente : ignoré jusqu'à sa réécriture
+    assert db_manager.open_embedding_snapshot() is None
+    db_manager.publish_index_version(vectorstore._collection)
+    assert db_manager.open_embedding_snapshot().index_version == db_manager.get_index_version()
@@ -0,0 +1,54 @@
+# tests/test_embeddings.py
+
+import sys
+import threading
+import types
+
+import numpy as np
+
+from rag_core import db_manager
+from rag_core.embeddings import EmbeddingService, QueryContext, get_embedding_service
+
+
+def test_service_is_shared_by_the_process():
+    assert get_embedding_service() is get_embedding_service()
+    assert db_manager.get_multilingual_embeddings() is get_embedding_service()
+
+
+def test_model_is_loaded_once_under_concurrent_calls(monkeypatch):
+    loads = []
+
+    class FakeSentenceTransformer:
+        def __init__(self, *args, **kwargs):
+            loads.append(args)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer))
+    service = EmbeddingService()
+    threads = [threading.Thread(target=service.load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert service.is_loaded
+    assert service.metrics["load_time_s"] is not None
+
+
+def test_encode_returns_normalized_float32_matrix():
+    vectors = get_embedding_service().encode(["Hôtel à Paris", "Vol pour Tokyo"])
+    assert vectors.dtype == np.float32
+    assert vectors.shape[0] == 2
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+
+def test_query_context_encodes_once():
+    service = get_embedding_service()
+    before = service.metrics["encode_calls"]
+    context = QueryContext("Séjour à Bali")
+    first = context.vector
+    second = context.vector
+
+    assert first is second
+    assert service.metrics["encode_calls"] == before + 1
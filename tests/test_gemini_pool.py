@@ -0,0 +1,144 @@
+# tests/test_gemini_pool.py
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from google.genai.errors import ClientError, ServerError
+
+from benchmarks.fake_clients import FakeGeminiClient
+from rag_core import gemini_pool
+from rag_core.gemini_pool import PooledGeminiClient, TokenBucket, backoff_delay
+
+
+def _api_error(code: int, cls=ClientError):
+    return cls(code, {"error": {"code": code, "message": "erreur", "status": "ERREUR"}})
+
+
+class FlakyClient(FakeGeminiClient):
+    """Client factice dont les `failures` premiers appels échouent avec `error`."""
+
+    def __init__(self, failures: int, error: Exception):
+        super().__init__(latency_s=0.0, first_token_s=0.0, chunks=3)
+        self.failures = failures
+        self.error = error
+        self.attempts = 0
+        generate_content, stream = self.models.generate_content, self.models.generate_content_stream
+
+        def flaky(method):
+            def call(**kwargs):
+                self.attempts += 1
+                if self.attempts <= self.failures:
+                    raise self.error
+                return method(**kwargs)
+            return call
+
+        self.models.generate_content = flaky(generate_content)
+        self.models.generate_content_stream = flaky(stream)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """Nouveaux essais immédiats."""
+    monkeypatch.setattr(gemini_pool, "backoff_delay", lambda attempt, error=None: 0.0)
+
+
+def test_token_bucket_allows_a_burst_then_throttles():
+    bucket = TokenBucket(rate_per_s=10, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    # Les appelants suivants attendent leur tour
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+    assert TokenBucket(rate_per_s=0, capacity=1).reserve() == 0.0
+
+
+def test_retryable_errors():
+    assert gemini_pool.is_retryable(_api_error(429))
+    assert gemini_pool.is_retryable(_api_error(503, ServerError))
+    assert gemini_pool.is_retryable(ConnectionError())
+    assert not gemini_pool.is_retryable(_api_error(400))
+    assert not gemini_pool.is_retryable(ValueError())
+
+
+def test_backoff_honours_retry_after():
+    error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "3"}))
+    assert backoff_delay(0, error) == 3.0
+    assert backoff_delay(0, error, max_s=1.0) == 1.0
+    # Sans indication : gigue complète sous une borne exponentielle
+    assert all(0.0 <= backoff_delay(3, base_s=0.5, max_s=20.0) <= 4.0 for _ in range(50))
+
+
+def test_transient_errors_are_retried():
+    flaky = FlakyClient(failures=2, error=_api_error(429))
+    pool = PooledGeminiClient([flaky], rpm=0, max_retries=3)
+    assert pool.models.generate_content(model="m", contents="x").text
+    assert flaky.attempts == 3
+
+
+def test_permanent_errors_and_exhausted_retries_are_raised():
+    pool = PooledGeminiClient([FlakyClient(failures=1, error=_api_error(400))], rpm=0)
+    with pytest.raises(ClientError):
+        pool.models.generate_content(model="m", contents="x")
+
+    flaky = FlakyClient(failures=5, error=ConnectionError())
+    with pytest.raises(ConnectionError):
+        PooledGeminiClient([flaky], rpm=0, max_retries=2).models.generate_content(model="m", contents="x")
+    assert flaky.attempts == 3
+
+
+def test_stream_is_retried_only_before_the_first_chunk():
+    flaky = FlakyClient(failures=1, error=ConnectionError())
+    pool = PooledGeminiClient([flaky], rpm=0)
+    assert len(list(pool.models.generate_content_stream(model="m", contents="x"))) == 3
+
+    def broken_stream(**kwargs):
+        yield SimpleNamespace(text="Voici ")
+        raise ConnectionError()
+
+    client = FakeGeminiClient(latency_s=0.0, first_token_s=0.0)
+    client.models.generate_content_stream = broken_stream
+    stream = PooledGeminiClient([client], rpm=0).models.generate_content_stream(model="m", contents="x")
+    assert next(stream).text == "Voici "
+    with pytest.raises(ConnectionError):
+        next(stream)
+
+
+def test_calls_are_spread_over_the_pool():
+    clients = [FakeGeminiClient(latency_s=0.0) for _ in range(2)]
+    pool = PooledGeminiClient(clients, rpm=0)
+    for i in range(4):
+        pool.models.generate_content(model="m", contents=f"question {i}")
+    assert [client.calls for client in clients] == [2, 2]
+
+
+def test_identical_concurrent_calls_are_coalesced():
+    fake = FakeGeminiClient(latency_s=0.2)
+    pool = PooledGeminiClient([fake], rpm=0)
+    responses = []
+    threads = [
+        threading.Thread(target=lambda: responses.append(pool.models.generate_content(model="m", contents="x")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fake.calls == 1
+    assert len(responses) == 5 and len({id(response) for response in responses}) == 1
+    # Une fois l'appel terminé, la même question est de nouveau envoyée
+    pool.models.generate_content(model="m", contents="x")
+    assert fake.calls == 2
+
+
+def test_identical_concurrent_async_calls_are_coalesced():
+    fake = FakeGeminiClient(latency_s=0.1)
+    pool = PooledGeminiClient([fake], rpm=0)
+
+    async def burst():
+        return await asyncio.gather(*(pool.aio.models.generate_content(model="m", contents="x") for _ in range(5)))
+
+    assert len({response.text for response in asyncio.run(burst())}) == 1
+    assert fake.calls == 1
@@ -0,0 +1,66 @@
+# tests/test_incremental_index.py
+
+import pandas as pd
+from langchain_core.documents import Document
+
+from benchmarks.synthetic_data import generate_travel_dataframe
+from rag_core import db_manager
+
+
+def _document(trip_id, content="Voyage") -> Document:
+    metadata = {"trip_id": trip_id}
+    metadata["content_hash"] = db_manager.row_content_hash(content, metadata)
+    return Document(page_content=content, metadata=metadata)
+
+
+def test_document_ids_are_stable_and_unique():
+    documents = [_document(1), _document(2, "Autre"), _document(1, "Doublon"), _document("")]
+    ids = db_manager.assign_document_ids(documents)
+
+    assert ids[:2] == ["trip-1", "trip-2"]
+    assert ids[2] == f"trip-1-{documents[2].metadata['content_hash']}"
+    assert ids[3] == f"row-{documents[3].metadata['content_hash']}"
+    assert db_manager.assign_document_ids(documents) == ids
+
+
+def test_build_documents_hash_matches_row_content_hash():
+    documents = db_manager.build_documents(db_manager.clean_and_combine_data(generate_travel_dataframe(50)))
+    for doc in documents:
+        assert doc.metadata["content_hash"] == db_manager.row_content_hash(doc.page_content, doc.metadata)
+
+
+def test_unchanged_csv_is_not_reindexed(vectorstore, travel_csv):
+    version = db_manager.get_index_version()
+    count = vectorstore._collection.count()
+
+    _, stats = db_manager.ingest_csv_streaming(travel_csv, incremental=True, resume=False)
+
+    assert stats == {"added": 0, "updated": 0, "skipped": count, "deleted": 0}
+    assert db_manager.get_index_version() == version
+
+
+def test_only_modified_and_removed_rows_are_applied(vectorstore, travel_csv):
+    version = db_manager.get_index_version()
+    df = pd.read_csv(travel_csv)
+    df.loc[0, "Destination"] = "Reykjavik, Iceland"
+    removed_trip = df.loc[1, "Trip ID"]
+    df = df.drop(index=1)
+    df.to_csv(travel_csv, index=False)
+
+    encoded_before = db_manager.get_multilingual_embeddings().metrics["texts_encoded"]
+    db, stats = db_manager.ingest_csv_streaming(travel_csv, incremental=True, resume=False)
+
+    assert stats["updated"] == 1
+    assert stats["deleted"] == 1
+    assert stats["added"] == 0
+    # Seule la ligne modifiée est re-vectorisée
+    assert db_manager.get_multilingual_embeddings().metrics["texts_encoded"] - encoded_before == 1
+    assert db_manager.get_index_version() != version
+    assert not db.get(ids=[f"trip-{removed_trip}"])["ids"]
+    assert "Reykjavik" in db.get(ids=[f"trip-{df.loc[0, 'Trip ID']}"])["documents"][0]
+
+
+def test_full_rebuild_replaces_the_collection(vectorstore):
+    count = vectorstore._collection.count()
+    db = db_manager.create_vector_store(db_manager.load_csv_document())
+    assert db._collection.count() == count
@@ -0,0 +1,97 @@
+# tests/test_lexical_index.py
+
+import numpy as np
+import pytest
+
+from rag_core import db_manager, metrics
+from rag_core.lexical_index import TRIP_ID_PATTERN, LexicalIndex, build_index, tokenize
+from rag_core.nl_processor import normalize_text
+
+
+@pytest.mark.parametrize("query, trip_id", [
+    ("Voyage ID 42", "42"),
+    ("Détails du voyage n°7 ?", "7"),
+    ("trip #13", "13"),
+    ("Trip number 5 please", "5"),
+    ("voyage numéro: 21", "21"),
+])
+def test_trip_references_are_recognized(query, trip_id):
+    assert TRIP_ID_PATTERN.findall(normalize_text(query)) == [trip_id]
+
+
+@pytest.mark.parametrize("query", [
+    "Le numéro 3 des hôtels à Paris",
+    "Option no. 2 pour Tokyo",
+    "Un voyage de 7 jours",
+    "trip to Bali for 2",
+    "I have 2 trips",
+])
+def test_numbers_without_trip_reference_are_ignored(query):
+    assert TRIP_ID_PATTERN.findall(normalize_text(query)) == []
+
+
+@pytest.fixture
+def lexical(vectorstore) -> LexicalIndex:
+    build_index(vectorstore._collection, "lexical", index_version="v1", page_size=64)
+    return LexicalIndex.open("lexical")
+
+
+def _row_of(lexical: LexicalIndex, trip_id: int) -> int:
+    return int(np.flatnonzero(lexical.trip_ids == trip_id)[0])
+
+
+def test_index_covers_the_collection(vectorstore, lexical):
+    assert len(lexical) == vectorstore._collection.count()
+    assert lexical.index_version == "v1"
+    assert LexicalIndex.open("absent") is None
+
+
+def test_bm25_ranks_documents_containing_the_query_terms(vectorstore, lexical):
+    destination = db_manager.get_metadata_values(vectorstore)["destination"][0].split(",")[0]
+    rows, scores = lexical.search(f"hostel {destination}", k=10)
+
+    assert 0 < len(rows) <= 10
+    assert list(scores) == sorted(scores, reverse=True)
+    documents = vectorstore._collection.get(ids=lexical.ids_for(rows))["documents"]
+    terms = {"hostel", *tokenize(destination)}
+    assert all(terms & set(tokenize(document)) for document in documents)
+    assert lexical.search("xyzzy", k=10)[0].size == 0
+
+
+def test_bm25_respects_metadata_filters(vectorstore, lexical):
+    destination = db_manager.get_metadata_values(vectorstore)["destination"][0]
+    rows, _ = lexical.search("voyage hotel", k=50, filters={"destination": [destination]})
+    metadatas = vectorstore._collection.get(ids=lexical.ids_for(rows))["metadatas"]
+    assert metadatas and all(m["destination"] == destination for m in metadatas)
+
+
+def test_lookup_routes_trip_ids_and_traveler_names(vectorstore, lexical):
+    assert lexical.lookup("Détails du voyage ID 12").tolist() == [_row_of(lexical, 12)]
+
+    record = vectorstore._collection.get(ids=["trip-12"])
+    name = record["documents"][0].split("Voyageur: ")[1].split(" (")[0]
+    assert _row_of(lexical, 12) in lexical.lookup(f"Quel voyage a fait {name} ?").tolist()
+    assert lexical.lookup("Un hôtel pas cher") is None
+
+
+def test_lookup_defers_to_hybrid_search_when_filters_conflict(vectorstore, lexical):
+    destination = vectorstore._collection.get(ids=["trip-12"])["metadatas"][0]["destination"]
+    other = next(d for d in db_manager.get_metadata_values(vectorstore)["destination"] if d != destination)
+
+    assert lexical.lookup("voyage ID 12", {"destination": [destination]}).tolist() == [_row_of(lexical, 12)]
+    assert lexical.lookup("voyage ID 12", {"destination": [other]}) is None
+
+
+def test_search_db_routes(vectorstore, monkeypatch):
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+
+    result = db_manager.search_db("Voyage ID 12", vectorstore, k=3)
+    assert [doc.metadata["trip_id"] for doc, _ in result.hits] == [12]
+
+    result = db_manager.search_db("Un séjour en hostel", vectorstore, k=3)
+    assert len(result.hits) == 3
+
+    text = registry.to_prometheus()
+    assert 'rag_retrieval_route_total{route="reference"} 1' in text
+    assert 'rag_retrieval_route_total{route="hybride"} 1' in text
@@ -0,0 +1,56 @@
+# tests/test_local_normalization.py
+
+import asyncio
+
+import pytest
+
+from rag_core import llm_utils
+from rag_core.nl_processor import detect_language, normalisation_locale
+
+
+@pytest.mark.parametrize("requete, langue", [
+    ("Je cherche un hôtel à Paris pour une semaine", "fr"),
+    ("What is the average cost of a trip to Tokyo?", "en"),
+])
+def test_clean_french_and_english_are_handled_locally(requete, langue):
+    detection = detect_language(requete)
+    assert (detection.langue, detection.propre) == (langue, True)
+
+
+@pytest.mark.parametrize("requete, langue, raison", [
+    ("أريد السفر إلى باريس", "ar", "écriture arabe"),
+    ("nheb nsafer l paris", "derja", "arabizi"),
+    ("3andi budget chwaya", "derja", "arabizi"),
+    ("Je cherche un voyage à Paris!!!!", "fr", "répétitions"),
+    ("JE CHERCHE UN VOYAGE A PARIS", "fr", "majuscules"),
+    ("Paris Tokyo Bali", "inconnue", "langue indéterminée"),
+])
+def test_arabic_derja_and_noisy_queries_go_to_gemini(requete, langue, raison):
+    detection = detect_language(requete)
+    assert (detection.langue, detection.propre, detection.raison) == (langue, False, raison)
+    assert normalisation_locale(requete) is None
+
+
+def test_local_normalization_strips_courtesy_formulas():
+    assert normalisation_locale("Bonjour, je cherche un voyage à Paris  svp merci") == "je cherche un voyage à Paris"
+
+
+def test_only_unclean_queries_call_gemini(gemini):
+    assert llm_utils.normaliser_requete(gemini, "Je cherche un hôtel à Paris") == (
+        "Je cherche un hôtel à Paris", "locale"
+    )
+    assert gemini.calls == 0
+
+    requete, source = llm_utils.normaliser_requete(gemini, "nheb nsafer l paris")
+    assert (requete, source) == ("nheb nsafer l paris", "gemini")
+    assert gemini.calls == 1
+
+    # Sans la voie locale, toute requête passe par Gemini
+    assert llm_utils.normaliser_requete(gemini, "Je cherche un hôtel à Paris", locale=False)[1] == "gemini"
+    assert gemini.calls == 2
+
+
+def test_async_normalization_uses_the_same_routing(gemini):
+    assert asyncio.run(llm_utils.normaliser_requete_async(gemini, "What is the price of a trip to Bali?"))[1] == "locale"
+    assert asyncio.run(llm_utils.normaliser_requete_async(gemini, "أريد السفر إلى باريس"))[1] == "gemini"
+    assert gemini.calls == 1
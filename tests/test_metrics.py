@@ -0,0 +1,83 @@
+# tests/test_metrics.py
+
+import pytest
+
+from rag_core import metrics
+from rag_core.pipeline import RAGPipeline
+
+
+@pytest.fixture
+def registry(monkeypatch) -> metrics.MetricsRegistry:
+    """Registre vide à la place de celui du processus."""
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    return registry
+
+
+def _series(registry: metrics.MetricsRegistry, kind: str, name: str) -> dict:
+    """{étiquettes (tuple trié): entrée} d'une métrique de to_dict()."""
+    entries = registry.to_dict()[kind].get(name, [])
+    return {tuple(sorted(entry["labels"].items())): entry for entry in entries}
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = metrics.Histogram((1, 2, 4))
+    for value in (0.5, 1, 1.5, 3, 10):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert (histogram.count, histogram.sum) == (5, 16.0)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert metrics.Histogram((1, 2)).quantile(0.5) is None
+
+
+def test_prometheus_export(registry):
+    metrics.increment("requests_total", statut="ok")
+    metrics.increment("requests_total", 2, statut="ok")
+    metrics.observe("stage_seconds", 0.02, stage="recherche")
+
+    text = registry.to_prometheus()
+    assert "# TYPE rag_requests_total counter" in text
+    assert 'rag_requests_total{statut="ok"} 3' in text
+    assert 'rag_stage_seconds_bucket{stage="recherche",le="0.01"} 0' in text
+    assert 'rag_stage_seconds_bucket{stage="recherche",le="0.025"} 1' in text
+    assert 'rag_stage_seconds_bucket{stage="recherche",le="+Inf"} 1' in text
+    assert 'rag_stage_seconds_count{stage="recherche"} 1' in text
+
+
+def test_timed_accumulates_in_the_trace(registry):
+    trace = {}
+    for _ in range(2):
+        with metrics.timed("cache", trace):
+            pass
+    with pytest.raises(ValueError):
+        with metrics.timed("recherche", trace):
+            raise ValueError()
+
+    assert set(trace) == {"cache", "recherche"}
+    stages = _series(registry, "histograms", "stage_seconds")
+    assert stages[(("stage", "cache"),)]["count"] == 2
+    assert stages[(("stage", "recherche"),)]["count"] == 1
+
+
+def test_pipeline_run_records_every_stage(shared, gemini, registry):
+    result = RAGPipeline(shared, gemini).run("Je cherche un hôtel à Paris pour une semaine")
+
+    assert result.statut == "ok"
+    assert set(result.durees) >= {"cache", "normalisation", "embedding", "anomalie", "recherche", "generation",
+                                  "total"}
+    assert result.tokens["prompt_estime"] <= result.tokens["prompt_complet_estime"]
+    assert result.tokens["prompt"] and result.tokens["reponse"]
+
+    assert _series(registry, "counters", "requests_total")[(("statut", "ok"),)]["value"] == 1
+    assert _series(registry, "histograms", "stage_seconds")[(("stage", "total"),)]["count"] == 1
+    assert set(_series(registry, "histograms", "prompt_tokens")) == {(("format", "envoye"),),
+                                                                    (("format", "complet"),)}
+
+
+def test_early_exit_is_counted_with_its_status(shared, gemini, registry, monkeypatch):
+    monkeypatch.setattr(shared.detector.scorer, "threshold", 1.0)
+    result = RAGPipeline(shared, gemini).run("Je cherche un hôtel à Paris pour une semaine")
+
+    assert result.statut == "hors_sujet"
+    assert _series(registry, "counters", "requests_total")[(("statut", "hors_sujet"),)]["value"] == 1
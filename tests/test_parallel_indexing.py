@@ -0,0 +1,105 @@
+# tests/test_parallel_indexing.py
+
+import os
+
+import numpy as np
+import pytest
+
+from rag_core import db_manager, embeddings
+from rag_core.embeddings import EmbeddingService
+
+
+class RecordingModel:
+    """Modèle factice qui enregistre le pool reçu par encode()."""
+
+    def __init__(self):
+        self.calls = []
+        self.pool_env = []
+
+    def encode(self, texts, pool=None, **kwargs):
+        self.calls.append((len(texts), pool))
+        return np.ones((len(texts), 4), dtype=np.float32) / 2.0
+
+    def start_multi_process_pool(self, target_devices):
+        self.pool_env.append(os.environ.get("OMP_NUM_THREADS"))
+        return {"processes": target_devices}
+
+
+def _service(workers: int) -> EmbeddingService:
+    service = EmbeddingService(workers=workers, batch_size=2)
+    service._model = RecordingModel()
+    service._pool = {"processes": []}
+    return service
+
+
+def test_small_batches_are_encoded_in_process():
+    service = _service(workers=4)
+    service.encode_documents(["a", "b", "c"])
+    assert service._model.calls == [(3, None)]
+
+
+def test_large_batches_are_spread_over_the_process_pool():
+    service = _service(workers=2)
+    vectors = service.encode_documents([f"voyage {i}" for i in range(10)])
+
+    assert vectors.shape == (10, 4)
+    assert vectors.dtype == np.float32
+    assert service._model.calls == [(10, service._pool)]
+
+
+def test_pooled_encoding_does_not_block_query_encoding():
+    service = _service(workers=2)
+    held = []
+    encode = service._model.encode
+
+    def recording_encode(texts, pool=None, **kwargs):
+        held.append(service._encode_lock.locked())
+        return encode(texts, pool=pool, **kwargs)
+
+    service._model.encode = recording_encode
+
+    service.encode_documents([f"voyage {i}" for i in range(10)])
+    assert held == [False]
+
+
+@pytest.mark.parametrize("previous", ["8", None])
+def test_pool_threads_setting_is_restored(previous, monkeypatch):
+    monkeypatch.setattr(embeddings.atexit, "register", lambda function: None)
+    if previous is None:
+        monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    else:
+        monkeypatch.setenv("OMP_NUM_THREADS", previous)
+    service = EmbeddingService(workers=2, num_threads=3)
+    service._model = RecordingModel()
+
+    assert service._get_pool() == {"processes": ["cpu", "cpu"]}
+    # Les processus fils démarrent avec 3 threads, le processus courant garde son réglage
+    assert service._model.pool_env == ["3"]
+    assert os.environ.get("OMP_NUM_THREADS") == previous
+
+
+class FlakyCollection:
+    def __init__(self, fail_on: int | None = None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def upsert(self, **batch):
+        if len(self.batches) == self.fail_on:
+            raise RuntimeError("écriture refusée")
+        self.batches.append(batch)
+
+
+def test_writer_upserts_every_batch_in_order():
+    collection = FlakyCollection()
+    writer = db_manager._ChromaWriter(collection)
+    for i in range(5):
+        writer.put(ids=[f"trip-{i}"])
+    writer.close()
+    assert [batch["ids"] for batch in collection.batches] == [[f"trip-{i}"] for i in range(5)]
+
+
+def test_writer_propagates_write_errors():
+    writer = db_manager._ChromaWriter(FlakyCollection(fail_on=0))
+    writer.put(ids=["trip-1"])
+    with pytest.raises(RuntimeError, match="écriture refusée"):
+        writer.close()
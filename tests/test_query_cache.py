@@ -0,0 +1,132 @@
+# tests/test_query_cache.py
+
+import dataclasses
+
+import numpy as np
+
+from rag_core import db_manager, llm_utils
+from rag_core.embeddings import QueryContext
+from rag_core.pipeline import RAGPipeline
+from rag_core.query_cache import CachedAnswer, QueryCache
+
+
+def _vector(*values) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _answer(reponse="Réponse") -> CachedAnswer:
+    return CachedAnswer(requete_normalisee="Voyages à Paris", contexte="Voyage ID 1.", reponse=reponse)
+
+
+def test_exact_hit_ignores_whitespace():
+    cache = QueryCache()
+    answer = _answer()
+    cache.put("Voyages  à Paris ", _vector(1, 0), answer)
+
+    assert cache.get_exact("Voyages à Paris") is answer
+    assert cache.get_exact("Voyages à Lyon") is None
+    assert cache.stats["exact_hits"] == 1
+
+
+def test_semantic_hit_registers_the_raw_query():
+    cache = QueryCache(similarity_threshold=0.95)
+    answer = _answer()
+    cache.put("Voyages à Paris", _vector(1, 0), answer)
+
+    assert cache.get_semantic(_vector(1, 0.1), "voyages a paris ?") is answer
+    # La requête brute est ensuite servie au niveau 1
+    assert cache.get_exact("voyages a paris ?") is answer
+
+
+def test_semantic_miss_below_threshold():
+    cache = QueryCache(similarity_threshold=0.95)
+    cache.put("Voyages à Paris", _vector(1, 0), _answer())
+
+    assert cache.get_semantic(_vector(1, 1), "Voyages à Tokyo") is None
+    assert cache.get_exact("Voyages à Tokyo") is None
+    assert cache.stats["misses"] == 1
+
+
+def test_expired_entries_are_not_served():
+    cache = QueryCache(ttl_s=60)
+    answer = _answer()
+    cache.put("Voyages à Paris", _vector(1, 0), answer)
+    answer.created_at -= 61
+
+    assert cache.get_exact("Voyages à Paris") is None
+    assert cache.get_semantic(_vector(1, 0)) is None
+    assert len(cache) == 0
+
+
+def test_expired_best_match_falls_through_to_the_next_entry():
+    cache = QueryCache(ttl_s=60, similarity_threshold=0.9)
+    expired, valid = _answer("périmée"), _answer("valide")
+    cache.put("Voyages à Paris", _vector(1, 0), expired)
+    cache.put("Séjours à Paris", _vector(1, 0.2), valid)
+    expired.created_at -= 61
+
+    assert cache.get_semantic(_vector(1, 0)) is valid
+    assert len(cache) == 1
+
+
+def test_put_replaces_the_answer_of_the_same_query():
+    cache = QueryCache()
+    cache.put("Voyages à Paris", _vector(1, 0), _answer("ancienne"))
+    cache.put("Voyages  à Paris", _vector(1, 0), _answer("nouvelle"))
+
+    assert len(cache) == 1
+    assert cache.get_exact("Voyages à Paris").reponse == "nouvelle"
+    assert cache.get_semantic(_vector(1, 0)).reponse == "nouvelle"
+
+
+def test_semantic_hits_stay_within_the_same_scope():
+    cache = QueryCache(similarity_threshold=0.95)
+    answer = _answer()
+    cache.put("Voyage ID 12", _vector(1, 0), answer, scope=("12",))
+
+    assert cache.get_semantic(_vector(1, 0), "Voyage ID 21", scope=("21",)) is None
+    assert cache.get_semantic(_vector(1, 0), "voyage id 12 ?", scope=("12",)) is answer
+
+
+def test_lru_eviction_by_entry_count():
+    cache = QueryCache(max_entries=2)
+    for i, requete in enumerate(["a", "b", "c"]):
+        cache.put(requete, _vector(1, i), _answer(requete))
+
+    assert len(cache) == 2
+    assert cache.get_exact("a") is None
+    assert cache.get_exact("c").reponse == "c"
+    assert cache.stats["evictions"] == 1
+
+
+def test_query_scope_separates_references_and_filters(vectorstore):
+    destinations = db_manager.get_metadata_values(vectorstore)["destination"]
+    first, second = (destination.split(",")[0] for destination in destinations[:2])
+
+    assert db_manager.query_scope("Voyage ID 12", vectorstore) != db_manager.query_scope("Voyage ID 21", vectorstore)
+    assert db_manager.query_scope(f"hôtel à {first}", vectorstore) != \
+        db_manager.query_scope(f"hôtel à {second}", vectorstore)
+    assert db_manager.query_scope("hôtel", vectorstore, k=3) != db_manager.query_scope("hôtel", vectorstore, k=5)
+
+
+def test_pipeline_does_not_share_answers_across_trip_references(shared, gemini):
+    shared = dataclasses.replace(shared, query_cache=QueryCache(similarity_threshold=0.5))
+    assert RAGPipeline(shared, gemini).run("Détails du voyage ID 12").statut == "ok"
+
+    result = RAGPipeline(shared, gemini).run("Détails du voyage ID 21")
+    assert result.cache is None
+    assert [hit["trip_id"] for hit in result.resultats] == [21]
+    assert RAGPipeline(shared, gemini).run("détails du voyage id 12 ?").cache == "semantique"
+
+
+def test_pipeline_does_not_cache_generation_errors(shared):
+    cache = QueryCache()
+    pipeline = RAGPipeline(dataclasses.replace(shared, query_cache=cache), client=None)
+    contexte_requete = QueryContext("Voyages à Paris")
+
+    pipeline.remember("Voyages à Paris", contexte_requete, "Voyage ID 1.", llm_utils.MESSAGE_ERREUR_GENERATION)
+    assert len(cache) == 0
+
+    pipeline.remember("Voyages à Paris", contexte_requete, "Voyage ID 1.", "Trois voyages.")
+    assert cache.get_exact("Voyages à Paris").reponse == "Trois voyages."
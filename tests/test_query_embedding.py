@@ -0,0 +1,58 @@
+# tests/test_query_embedding.py
+
+import numpy as np
+import pytest
+
+from rag_core import db_manager
+from rag_core.anomaly_detector import AnomalyDetector
+from rag_core.embeddings import QueryContext, get_embedding_service
+from rag_core.pipeline import RAGPipeline
+
+REQUETE = "Je cherche un hôtel à Paris pour une semaine"
+
+
+def test_query_is_encoded_once_per_request(shared, gemini, monkeypatch):
+    vectors = []
+    search_db = db_manager.search_db
+
+    def recording_search_db(*args, query_vector=None, **kwargs):
+        vectors.append(query_vector)
+        return search_db(*args, query_vector=query_vector, **kwargs)
+
+    monkeypatch.setattr(db_manager, "search_db", recording_search_db)
+    service = get_embedding_service()
+    calls_before = service.metrics["encode_calls"]
+
+    result = RAGPipeline(shared, gemini).run(REQUETE)
+
+    assert result.statut == "ok"
+    assert service.metrics["encode_calls"] - calls_before == 1
+    # Le vecteur transmis à la recherche est celui mis en cache avec la réponse
+    assert len(vectors) == 1 and vectors[0] is not None
+    scope = db_manager.query_scope(result.requete_normalisee, shared.vectorstore)
+    cached = shared.query_cache.get_semantic(vectors[0], scope=scope)
+    assert cached is not None and cached.reponse == result.reponse
+
+
+def test_semantic_cache_hit_skips_detector_and_search(shared, gemini, monkeypatch):
+    RAGPipeline(shared, gemini).run(REQUETE)
+    monkeypatch.setattr(db_manager, "search_db", lambda *a, **k: pytest.fail("recherche relancée"))
+    monkeypatch.setattr(shared.detector, "score_vectors", lambda *a, **k: pytest.fail("score relancé"))
+
+    result = RAGPipeline(shared, gemini).run(REQUETE.lower() + " ?")
+    assert (result.statut, result.cache) == ("cache", "semantique")
+
+
+def test_search_by_vector_matches_search_by_text(vectorstore):
+    by_text = db_manager.search_db(REQUETE, vectorstore, k=3)
+    by_vector = db_manager.search_db(REQUETE, vectorstore, k=3, query_vector=QueryContext(REQUETE).vector)
+
+    assert [doc.page_content for doc, _ in by_vector.hits] == [doc.page_content for doc, _ in by_text.hits]
+    np.testing.assert_allclose([score for _, score in by_vector.hits], [score for _, score in by_text.hits],
+                               rtol=1e-4)
+
+
+def test_detector_scores_the_same_vector_space(vectorstore):
+    detector = AnomalyDetector(vectorstore)
+    vector = QueryContext(REQUETE).vector
+    assert detector.is_anomaly(REQUETE) == detector.is_anomaly(REQUETE, query_vector=vector)
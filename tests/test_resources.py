@@ -0,0 +1,28 @@
+# tests/test_resources.py
+
+from rag_core import db_manager, resources
+
+
+def test_no_resources_without_vector_store(workdir):
+    assert resources.get_shared_resources() is None
+
+
+def test_resources_are_shared_until_index_version_changes(vectorstore):
+    first = resources.get_shared_resources()
+    assert first is not None
+    assert resources.get_shared_resources() is first
+    assert resources.is_current()
+
+    db_manager.mark_index_updated()
+    assert not resources.is_current()
+    reloaded = resources.get_shared_resources()
+    assert reloaded is not first
+    assert reloaded.index_version == db_manager.get_index_version()
+    # Nouvelle version de l'index : cache de réponses vide
+    assert reloaded.query_cache is not first.query_cache
+
+
+def test_invalidate_forces_reload(vectorstore):
+    first = resources.get_shared_resources()
+    resources.invalidate_shared_resources()
+    assert resources.get_shared_resources() is not first
@@ -0,0 +1,71 @@
+# tests/test_search.py
+
+import pytest
+
+from rag_core import db_manager
+from rag_core.nl_processor import build_chroma_where, extract_metadata_filters
+
+KNOWN_VALUES = {
+    "destination": ["Bali, Indonesia", "Paris, France", "Tokyo, Japan"],
+    "accommodation_type": ["Airbnb", "Hostel", "Hotel"],
+    "transportation_type": ["Car rental", "Flight", "Plane", "Train"],
+    "traveler_nationality": ["American", "French"],
+}
+
+
+def test_filters_are_extracted_through_synonyms():
+    filters = extract_metadata_filters("Je cherche un hôtel à Paris, en avion", KNOWN_VALUES)
+    assert filters == {
+        "destination": ["Paris, France"],
+        "accommodation_type": ["Hotel"],
+        "transportation_type": ["Flight", "Plane"],
+    }
+    assert extract_metadata_filters("Un séjour au soleil", KNOWN_VALUES) == {}
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Des voyageurs French à Bali", {"destination": ["Bali, Indonesia"], "traveler_nationality": ["French"]}),
+    ("American travelers in Tokyo", {"destination": ["Tokyo, Japan"], "traveler_nationality": ["American"]}),
+    ("Un touriste de nationalité French", {"traveler_nationality": ["French"]}),
+    ("French cuisine tour in Paris", {"destination": ["Paris, France"]}),
+    ("a trip like the American dream", {}),
+])
+def test_nationality_needs_a_traveler_cue(query, expected):
+    assert extract_metadata_filters(query, KNOWN_VALUES) == expected
+
+
+def test_chroma_where_clause():
+    assert build_chroma_where({}) is None
+    assert build_chroma_where({"destination": ["Paris, France"]}) == {"destination": "Paris, France"}
+    assert build_chroma_where({"destination": ["Paris, France"], "transportation_type": ["Plane", "Flight"]}) == {
+        "$and": [{"destination": "Paris, France"}, {"transportation_type": {"$in": ["Flight", "Plane"]}}]
+    }
+
+
+@pytest.fixture
+def dense_only(monkeypatch):
+    """Recherche dense seule (sans index BM25 ni routeur), pour tester les filtres de Chroma."""
+    monkeypatch.setattr(db_manager, "HYBRID_SEARCH_ENABLED", False)
+
+
+def test_filters_are_pushed_into_chroma(vectorstore, dense_only):
+    destination = db_manager.get_metadata_values(vectorstore)["destination"][0]
+    result = db_manager.search_db(f"Un voyage à {destination.split(',')[0]}", vectorstore, k=5)
+
+    assert result
+    assert result.filters["destination"] == [destination]
+    assert all(doc.metadata["destination"] == destination for doc, _ in result.hits)
+    assert result.context
+
+
+def test_explicit_filters_without_match_fall_back_to_whole_collection(vectorstore, dense_only):
+    result = db_manager.search_db("Un voyage", vectorstore, k=3, filters={"destination": ["Atlantis"]})
+    assert result
+    assert result.filters == {}
+
+
+def test_metadata_values_are_read_once_per_index_version(vectorstore, monkeypatch):
+    first = db_manager.get_metadata_values(vectorstore)
+    collection_type = type(vectorstore._collection)
+    monkeypatch.setattr(collection_type, "get", lambda *a, **k: pytest.fail("collection relue"))
+    assert db_manager.get_metadata_values(vectorstore) is first
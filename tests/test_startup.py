@@ -0,0 +1,68 @@
+# tests/test_startup.py
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from rag_core import resources, startup
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_IMPORTS = ("sklearn", "chromadb", "langchain_community", "pandas", "google.genai",
+                 "sentence_transformers", "torch", "rag_core.db_manager")
+
+
+def test_ui_import_does_not_load_heavy_modules():
+    code = f"import json, sys, chatbot; print(json.dumps([m for m in {HEAVY_IMPORTS!r} if m in sys.modules]))"
+    completed = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True,
+                               env={**os.environ, "RAG_WARMUP": "0"}, check=True)
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
+
+
+def test_warmup_loads_index_and_detector(vectorstore, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    resources.invalidate_shared_resources()
+    warmup = startup.WarmUp()
+    warmup.run()
+
+    assert warmup.done and warmup.error is None
+    # Sans clé API, le client Gemini est créé à la première requête
+    assert list(warmup.durations) == ["imports", "modele_embedding", "index_detecteur"]
+    assert resources.is_current()
+
+
+def test_warmup_stops_at_the_first_failing_step(monkeypatch):
+    def failing_step():
+        raise RuntimeError("index illisible")
+
+    ran = []
+    warmup = startup.WarmUp()
+    monkeypatch.setattr(warmup, "steps", lambda: [("imports", lambda: ran.append("imports")),
+                                                  ("index_detecteur", failing_step),
+                                                  ("client_gemini", lambda: ran.append("client_gemini"))])
+    warmup.run()
+
+    assert ran == ["imports"]
+    assert warmup.error == "index_detecteur : index illisible"
+    assert warmup.done and warmup.current_step is None
+
+
+def test_warmup_thread_is_started_once(monkeypatch):
+    warmup = startup.WarmUp()
+    monkeypatch.setattr(warmup, "steps", lambda: [])
+    assert warmup.start() is warmup.start()
+    assert warmup.wait(5)
+    assert warmup._thread.name == "rag-warmup"
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_start_warmup_respects_the_setting(enabled, monkeypatch):
+    warmup = startup.WarmUp()
+    monkeypatch.setattr(warmup, "steps", lambda: [])
+    monkeypatch.setattr(startup, "_warmup", warmup)
+    monkeypatch.setattr(startup, "RAG_WARMUP_ENABLED", enabled)
+
+    assert startup.start_warmup() is warmup
+    assert (warmup._thread is not None) == enabled
@@ -0,0 +1,93 @@
+# tests/test_streaming_generation.py
+
+import asyncio
+
+from rag_core import llm_utils
+from benchmarks.fake_clients import FakeGeminiClient
+
+QUESTION = "Quels voyages à Paris ?"
+CONTEXTE = "1 | Paris, France | 7 | Hotel"
+
+
+def _failing_client(after: int) -> FakeGeminiClient:
+    """Client dont le flux s'interrompt après `after` fragments (sync et async)."""
+    client = FakeGeminiClient(latency_s=0.0, first_token_s=0.0, chunks=4)
+    stream, astream = client.models.generate_content_stream, client.aio.models.generate_content_stream
+
+    def generate_content_stream(**kwargs):
+        for i, chunk in enumerate(stream(**kwargs)):
+            if i == after:
+                raise ConnectionError("flux coupé")
+            yield chunk
+
+    async def agenerate_content_stream(**kwargs):
+        chunks = await astream(**kwargs)
+
+        async def interrupted():
+            i = 0
+            async for chunk in chunks:
+                if i == after:
+                    raise ConnectionError("flux coupé")
+                i += 1
+                yield chunk
+        return interrupted()
+
+    client.models.generate_content_stream = generate_content_stream
+    client.aio.models.generate_content_stream = agenerate_content_stream
+    return client
+
+
+async def _collect(stream) -> list[str]:
+    return [part async for part in stream]
+
+
+def test_stream_yields_the_whole_answer(gemini):
+    latence, usage = llm_utils.LatenceGeneration(), llm_utils.UsageGeneration()
+    parts = list(llm_utils.generer_reponse_rag_stream(gemini, QUESTION, CONTEXTE, latence=latence, usage=usage))
+
+    assert len(parts) > 1
+    assert "".join(parts).strip() == llm_utils.generer_reponse_rag(gemini, QUESTION, CONTEXTE)
+    assert latence.terminee
+    assert latence.premier_token_s is not None and latence.total_s >= latence.premier_token_s
+    # Le décompte de tokens est porté par le dernier fragment
+    assert usage.tokens_prompt and usage.tokens_reponse
+
+
+def test_interrupted_stream_is_not_marked_complete():
+    latence = llm_utils.LatenceGeneration()
+    parts = list(llm_utils.generer_reponse_rag_stream(_failing_client(after=2), QUESTION, CONTEXTE, latence=latence))
+
+    assert len(parts) == 3
+    assert parts[-1] == llm_utils.MESSAGE_ERREUR_GENERATION
+    assert not latence.terminee
+    assert latence.total_s is not None
+
+
+def test_async_stream_matches_sync_stream(gemini):
+    latence = llm_utils.LatenceGeneration()
+    parts = asyncio.run(_collect(llm_utils.generer_reponse_rag_stream_async(gemini, QUESTION, CONTEXTE,
+                                                                             latence=latence)))
+    assert parts == list(llm_utils.generer_reponse_rag_stream(gemini, QUESTION, CONTEXTE))
+    assert latence.terminee
+
+
+def test_interrupted_async_stream_is_not_marked_complete():
+    latence = llm_utils.LatenceGeneration()
+    parts = asyncio.run(_collect(llm_utils.generer_reponse_rag_stream_async(
+        _failing_client(after=1), QUESTION, CONTEXTE, latence=latence
+    )))
+    assert len(parts) == 2
+    assert parts[-1] == llm_utils.MESSAGE_ERREUR_GENERATION
+    assert not latence.terminee
+
+
+def test_async_generation_matches_sync_generation(gemini):
+    usage = llm_utils.UsageGeneration()
+    reponse = asyncio.run(llm_utils.generer_reponse_rag_async(gemini, QUESTION, CONTEXTE, usage=usage))
+    assert reponse == llm_utils.generer_reponse_rag(gemini, QUESTION, CONTEXTE)
+    assert usage.tokens_prompt
+
+
+def test_async_normalization_matches_sync_normalization(gemini):
+    assert asyncio.run(llm_utils.traiter_requete_multilingue_async(gemini, QUESTION)) == \
+        llm_utils.traiter_requete_multilingue(gemini, QUESTION)
@@ -0,0 +1,78 @@
+# tests/test_streaming_ingest.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from rag_core import db_manager
+
+CHUNK_SIZE = 100
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_after(rows: int):
+    """progress_callback qui simule un arrêt brutal une fois `rows` lignes traitées."""
+    def callback(done, total):
+        if done >= rows:
+            raise Crash()
+    return callback
+
+
+def test_chunked_ingestion_indexes_every_row(travel_csv):
+    progress = []
+    db, stats = db_manager.ingest_csv_streaming(
+        travel_csv, incremental=False, chunk_size=CHUNK_SIZE, resume=False,
+        progress_callback=lambda done, total: progress.append((done, total))
+    )
+    expected = len(db_manager.clean_and_combine_data(pd.read_csv(travel_csv)))
+
+    assert db._collection.count() == expected
+    assert stats["added"] == expected
+    assert [done for done, _ in progress] == [100, 200, 300]
+    assert not os.path.exists(db_manager.INGEST_CHECKPOINT_FILE)
+
+
+def test_resume_after_crash_skips_finished_chunks(travel_csv):
+    with pytest.raises(Crash):
+        db_manager.ingest_csv_streaming(travel_csv, incremental=False, chunk_size=CHUNK_SIZE,
+                                        progress_callback=crash_after(CHUNK_SIZE))
+    assert os.path.exists(db_manager.INGEST_CHECKPOINT_FILE)
+
+    service = db_manager.get_multilingual_embeddings()
+    encoded_before = service.metrics["texts_encoded"]
+    db, stats = db_manager.ingest_csv_streaming(travel_csv, incremental=False, chunk_size=CHUNK_SIZE)
+    expected = len(db_manager.clean_and_combine_data(pd.read_csv(travel_csv)))
+
+    # Le premier morceau n'est ni re-vectorisé ni ré-écrit
+    first_chunk = len(db_manager.clean_and_combine_data(pd.read_csv(travel_csv, nrows=CHUNK_SIZE)))
+    assert service.metrics["texts_encoded"] - encoded_before == expected - first_chunk
+    assert db._collection.count() == expected
+    assert stats["added"] == expected
+    assert not os.path.exists(db_manager.INGEST_CHECKPOINT_FILE)
+
+
+def test_checkpoint_of_another_csv_is_ignored(travel_csv):
+    with pytest.raises(Crash):
+        db_manager.ingest_csv_streaming(travel_csv, incremental=False, chunk_size=CHUNK_SIZE,
+                                        progress_callback=crash_after(CHUNK_SIZE))
+    # Le CSV change : le point de reprise ne lui correspond plus
+    df = pd.read_csv(travel_csv)
+    df.iloc[:-1].to_csv(travel_csv, index=False)
+
+    db, _ = db_manager.ingest_csv_streaming(travel_csv, incremental=False, chunk_size=CHUNK_SIZE)
+    assert db._collection.count() == len(db_manager.clean_and_combine_data(df.iloc[:-1]))
+
+
+def test_unchanged_csv_does_not_republish_the_index(travel_csv, monkeypatch):
+    db_manager.ingest_csv_streaming(travel_csv, incremental=False, chunk_size=CHUNK_SIZE, resume=False)
+    version = db_manager.get_index_version()
+    monkeypatch.setattr(db_manager, "publish_index_version", lambda *a, **k: pytest.fail("version republiée"))
+
+    _, stats = db_manager.ingest_csv_streaming(travel_csv, incremental=True, chunk_size=CHUNK_SIZE)
+    assert stats["added"] == stats["updated"] == stats["deleted"] == 0
+    assert db_manager.get_index_version() == version
+    assert not os.path.exists(db_manager.TRAVEL_STATS_SPILL_DIR)
@@ -0,0 +1,151 @@
+# tests/test_travel_stats.py
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_travel_dataframe
+from rag_core import db_manager
+from rag_core.nl_processor import AggregateIntent, extract_aggregate_intent
+from rag_core.pipeline import RAGPipeline
+from rag_core.travel_stats import TravelStats, TravelTableBuilder
+
+KNOWN_VALUES = {
+    "destination": ["Bali, Indonesia", "London, UK", "Paris, France", "Phuket, Thailand", "Tokyo, Japan"],
+    "accommodation_type": ["Hostel", "Hotel"],
+    "transportation_type": ["Flight", "Train"],
+    "traveler_nationality": ["American", "French"],
+}
+
+
+@pytest.mark.parametrize("query, operation, measure, filters, group_by", [
+    ("Quel est le coût moyen d'un hôtel à Paris ?", "avg", "accommodation_cost",
+     {"destination": ["Paris, France"], "accommodation_type": ["Hotel"]}, None),
+    ("Combien de voyages à Tokyo ?", "count", None, {"destination": ["Tokyo, Japan"]}, None),
+    ("Quel est le transport le moins cher pour Bali ?", "min", "transportation_cost",
+     {"destination": ["Bali, Indonesia"]}, None),
+    ("Durée moyenne des voyages par destination", "avg", "duration_days", {}, "destination"),
+    ("Combien de jours dure un voyage à Bali ?", "avg", "duration_days", {"destination": ["Bali, Indonesia"]}, None),
+    ("What is the average price of a trip by destination?", "avg", "total_cost", {}, "destination"),
+    ("Quel est l'âge maximum des voyageurs ?", "max", "traveler_age", {}, None),
+    # Exonymes et nationalités en français
+    ("Combien de voyages à Londres ?", "count", None, {"destination": ["London, UK"]}, None),
+    ("combien de voyages au Japon", "count", None, {"destination": ["Tokyo, Japan"]}, None),
+    ("Coût moyen d'un voyage en Thaïlande", "avg", "total_cost", {"destination": ["Phuket, Thailand"]}, None),
+    ("Combien de voyageurs français ?", "count", None, {"traveler_nationality": ["French"]}, None),
+])
+def test_analytic_questions_are_recognized(query, operation, measure, filters, group_by):
+    assert extract_aggregate_intent(query, KNOWN_VALUES) == AggregateIntent(
+        operation=operation, measure=measure, filters=filters, group_by=group_by
+    )
+
+
+@pytest.mark.parametrize("query", [
+    "Un moyen de transport pour Bali ?",
+    "Un moyen pas cher d'aller à Paris",
+    "Je cherche un hôtel à Paris",
+    "Le max de soleil à Bali",
+    "Combien coûte un voyage de plus de 7 jours ?",
+])
+def test_other_questions_are_not_aggregates(query):
+    assert extract_aggregate_intent(query, KNOWN_VALUES) is None
+
+
+@pytest.mark.parametrize("query", [
+    "Combien de voyages à Londres ?",
+    "combien de voyages au Japon",
+    "Coût moyen d'un voyage en Thaïlande",
+    "Combien de voyageurs français ?",
+    "Combien de voyages à Lisbonne ?",
+    "Âge moyen des voyageurs japonais",
+    "How many Japanese travelers?",
+])
+def test_unresolved_places_and_nationalities_fall_back_to_search(query):
+    # Lieu ou nationalité absents de la base : pas d'agrégat sur tout le dataset
+    known_values = {"destination": ["Bali, Indonesia", "Paris, France"], "traveler_nationality": ["American"]}
+    assert extract_aggregate_intent(query, known_values) is None
+
+
+@pytest.fixture(scope="module")
+def cleaned() -> pd.DataFrame:
+    return db_manager.clean_and_combine_data(generate_travel_dataframe(500, seed=11))
+
+
+@pytest.fixture(scope="module")
+def stats(cleaned) -> TravelStats:
+    builder = TravelTableBuilder()
+    # Deux morceaux, comme pendant l'ingestion en flux
+    builder.add(cleaned.iloc[:200])
+    builder.add(cleaned.iloc[200:])
+    return builder.build(index_version="v1")
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    return pd.to_numeric(df[column], errors="coerce")
+
+
+def test_global_aggregates_match_pandas(stats, cleaned):
+    summary, rows = stats.aggregate(measures=["accommodation_cost", "total_cost"])
+    assert rows == summary["count"] == len(cleaned)
+
+    accommodation = _numeric(cleaned, "Accommodation cost")
+    assert summary["accommodation_cost"]["n"] == accommodation.notna().sum()
+    assert summary["accommodation_cost"]["mean"] == pytest.approx(accommodation.mean(), abs=0.01)
+    assert summary["accommodation_cost"]["max"] == accommodation.max()
+    max_trip = cleaned.loc[accommodation.idxmax(), "Trip ID"]
+    assert summary["accommodation_cost"]["max_trip_id"] == max_trip
+
+    total = accommodation + _numeric(cleaned, "Transportation cost")
+    assert summary["total_cost"]["mean"] == pytest.approx(total.mean(), abs=0.01)
+
+
+def test_filtered_and_grouped_aggregates_match_pandas(stats, cleaned):
+    destination = cleaned["Destination"].iloc[0]
+    subset = cleaned[cleaned["Destination"] == destination]
+    summary, rows = stats.aggregate({"destination": [destination]}, measures=["duration_days"])
+    assert rows == len(subset)
+    assert summary["duration_days"]["mean"] == pytest.approx(_numeric(subset, "Duration (days)").mean(), abs=0.01)
+    assert summary["duration_days"]["min"] == _numeric(subset, "Duration (days)").min()
+
+    groups, _ = stats.aggregate(group_by="transportation_type")
+    expected = cleaned.groupby("Transportation type").size()
+    assert {name: group["count"] for name, group in groups.items()} == expected.to_dict()
+
+
+def test_store_round_trip_and_answer(stats, cleaned, tmp_path):
+    builder = TravelTableBuilder()
+    builder.add(cleaned)
+    builder.write(str(tmp_path), index_version="v2")
+    reopened = TravelStats.open(str(tmp_path))
+
+    assert len(reopened) == len(cleaned) and reopened.index_version == "v2"
+    assert reopened.aggregate()[0] == stats.aggregate()[0]
+
+    intent = AggregateIntent(operation="avg", measure="traveler_age", filters={"destination": ["Atlantis"]})
+    assert reopened.answer(intent) is None
+    answer = reopened.answer(AggregateIntent(operation="avg", measure="traveler_age", filters={}))
+    assert answer.rows == len(cleaned) and answer.facts
+
+
+def test_spilled_chunks_give_the_same_store(stats, cleaned, tmp_path):
+    builder = TravelTableBuilder(spill_dir=str(tmp_path / "parts"))
+    builder.add(cleaned.iloc[:200])
+    builder.add(cleaned.iloc[200:])
+    # Les colonnes des morceaux sont sur disque, pas en mémoire
+    assert all(isinstance(path, str) for chunk in builder._chunks for path in chunk.values())
+
+    builder.write(str(tmp_path / "store"), index_version="v3")
+    reopened = TravelStats.open(str(tmp_path / "store"))
+    assert len(reopened) == len(builder) == len(cleaned)
+    assert reopened.aggregate(group_by="destination")[0] == stats.aggregate(group_by="destination")[0]
+
+    builder.discard()
+    assert not (tmp_path / "parts").exists()
+
+
+def test_pipeline_answers_aggregates_without_search(shared, gemini, monkeypatch):
+    monkeypatch.setattr(db_manager, "search_db", lambda *a, **k: pytest.fail("recherche inutile"))
+    result = RAGPipeline(shared, gemini).run("Quel est le coût moyen de l'hébergement ?")
+
+    assert (result.statut, result.intention) == ("ok", "agregat")
+    assert result.contexte == db_manager.answer_aggregate_question("Quel est le coût moyen de l'hébergement ?").facts
+    assert "recherche" not in result.durees